@@ -0,0 +1,240 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+# Seconds the remote keeps the keys changed in a generation; a process that has not
+# synced for longer (or missed more than MAX_CHANGE_GAP generations) drops everything
+CHANGES_TIMEOUT = 5 * 60
+MAX_CHANGE_GAP = 100
+
+
+class _LocalStore:
+    """LRU entries of one TwoTierCache, shared by the threads of a process"""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # key -> (expires at, pickled value)
+        self.size = 0
+        self.lock = threading.Lock()
+        self.generation = None
+        self.checked_at = 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+# Django creates a backend instance per thread; the store is per process
+_stores = {}
+
+
+class TwoTierCache(BaseCache):
+    """
+    Cache backend keeping a bounded in-process LRU in front of another cache alias
+    (LOCATION, Redis in production, locmem locally), so repeated reads of hot keys
+    skip the network.
+
+    OPTIONS:
+        MAX_ENTRIES     local entries per process (default 300)
+        MAX_BYTES       local size limit, pickled (default 64 MB)
+        LOCAL_TIMEOUT   seconds a value is served locally without asking the remote (default 30)
+        CHECK_INTERVAL  seconds between reads of the shared generation (default 1)
+
+    Writes go to both tiers. delete() and incr() also bump a generation key in the
+    remote cache and record the changed keys under the new generation; every process
+    compares the generation at most every CHECK_INTERVAL seconds and drops the keys
+    changed since its last check (everything after clear() or when the record is gone).
+    A version bump thus leaves the other hot entries in place. A plain set() of a key that
+    other processes hold locally becomes visible there within LOCAL_TIMEOUT, so
+    overwritten keys should be versioned or followed by bump_generation([key]).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.remote_alias = location or DEFAULT_CACHE_ALIAS
+        self.max_bytes = options.get("MAX_BYTES", 64 * 1024 * 1024)
+        self.local_timeout = options.get("LOCAL_TIMEOUT", 30)
+        self.check_interval = options.get("CHECK_INTERVAL", 1.0)
+        self.generation_key = f"two-tier:{self.key_prefix}:generation"
+        self.changes_key = f"two-tier:{self.key_prefix}:changes:{{}}"
+        self._store = _stores.setdefault((self.remote_alias, self.key_prefix), _LocalStore())
+
+    @property
+    def remote(self):
+        return caches[self.remote_alias]
+
+    def _local_timeout(self, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return self.local_timeout if timeout is None else min(timeout, self.local_timeout)
+
+    def _sync(self):
+        """Drop the local entries changed by other processes since the last check"""
+        store = self._store
+        now = time.monotonic()
+        if now - store.checked_at < self.check_interval:
+            return
+        store.checked_at = now
+        generation = self.remote.get(self.generation_key)
+        if generation == store.generation:
+            return
+        changed = self._changed_since(store.generation, generation)
+        if changed is None:
+            store.clear()
+        else:
+            with store.lock:
+                for key in changed:
+                    self._pop_local(key)
+        store.generation = generation
+
+    def _changed_since(self, seen, generation):
+        """Local keys changed in generations seen+1..generation, None when unknown (drop all)"""
+        if not isinstance(seen, int) or not isinstance(generation, int):
+            return None
+        if not 0 < generation - seen <= MAX_CHANGE_GAP:
+            return None
+        keys = [self.changes_key.format(number) for number in range(seen + 1, generation + 1)]
+        records = self.remote.get_many(keys)
+        if len(records) < len(keys):
+            # Expired, or a clear() / full bump_generation()
+            return None
+        return {key for record in records.values() for key in record}
+
+    def _get_local(self, key):
+        store = self._store
+        with store.lock:
+            entry = store.entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, data = entry
+            if expires <= time.monotonic():
+                self._pop_local(key)
+                return _MISSING
+            store.entries.move_to_end(key)
+        return pickle.loads(data)
+
+    def _set_local(self, key, value, timeout):
+        if timeout is not None and timeout <= 0:
+            self._delete_local(key)
+            return
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        store = self._store
+        with store.lock:
+            self._pop_local(key)
+            if len(data) > self.max_bytes:
+                return
+            store.entries[key] = (time.monotonic() + timeout, data)
+            store.size += len(data)
+            while len(store.entries) > self._max_entries or store.size > self.max_bytes:
+                _, (_, evicted) = store.entries.popitem(last=False)
+                store.size -= len(evicted)
+
+    def _pop_local(self, key):
+        # Caller holds the lock
+        entry = self._store.entries.pop(key, None)
+        if entry is not None:
+            self._store.size -= len(entry[1])
+
+    def _delete_local(self, key):
+        with self._store.lock:
+            self._pop_local(key)
+
+    def bump_generation(self, keys=None, version=None):
+        """
+        Make every process drop these keys from its local entries (within
+        CHECK_INTERVAL), all of them when keys is None.
+        """
+        try:
+            generation = self.remote.incr(self.generation_key)
+        except ValueError:
+            # Missing generation: the jump makes every process drop everything
+            generation = time.time_ns()
+            self.remote.set(self.generation_key, generation, None)
+        if keys is None:
+            # No record of changed keys: processes reaching this generation drop everything
+            self._store.clear()
+            return
+        local_keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        self.remote.set(self.changes_key.format(generation), local_keys, CHANGES_TIMEOUT)
+        with self._store.lock:
+            for key in local_keys:
+                self._pop_local(key)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self._sync()
+        value = self._get_local(local_key)
+        if value is not _MISSING:
+            return value
+        value = self.remote.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            return default
+        self._set_local(local_key, value, self.local_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        self._sync()
+        found = {}
+        missing = []
+        for key in keys:
+            value = self._get_local(self.make_and_validate_key(key, version=version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            remote = self.remote.get_many(missing, version=version)
+            for key, value in remote.items():
+                self._set_local(self.make_key(key, version=version), value, self.local_timeout)
+            found.update(remote)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.remote.set(key, value, timeout=timeout, version=version)
+        self._set_local(local_key, value, self._local_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.remote.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._set_local(local_key, value, self._local_timeout(timeout))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.remote.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        deleted = self.remote.delete(key, version=version)
+        self._delete_local(local_key)
+        self.bump_generation([key], version=version)
+        return deleted
+
+    def delete_many(self, keys, version=None):
+        self.remote.delete_many(keys, version=version)
+        for key in keys:
+            self._delete_local(self.make_and_validate_key(key, version=version))
+        self.bump_generation(keys, version=version)
+
+    def has_key(self, key, version=None):
+        self._sync()
+        if self._get_local(self.make_and_validate_key(key, version=version)) is not _MISSING:
+            return True
+        return self.remote.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.remote.incr(key, delta, version=version)
+        self.bump_generation([key], version=version)
+        return value
+
+    def clear(self):
+        """Clears the remote cache too, it holds this cache's keys"""
+        self.remote.clear()
+        self.bump_generation()
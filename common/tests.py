@@ -0,0 +1,99 @@
+from unittest import mock
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from .cache import TwoTierCache, _LocalStore
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        caches["default"].clear()
+        # The very first bump creates the generation, which drops everything once
+        caches["default"].set("two-tier:test:generation", 1, None)
+
+    def make(self, **options):
+        """A cache with its own local store, like a separate process"""
+        params = {"KEY_PREFIX": "test", "OPTIONS": {"CHECK_INTERVAL": 0, **options}}
+        cache = TwoTierCache("default", params)
+        cache._store = _LocalStore()
+        # Knows the current generation, as a process that has served requests already
+        cache._sync()
+        return cache
+
+    def local_keys(self, cache):
+        return [key.rsplit(":", 1)[-1] for key in cache._store.entries]
+
+    def test_least_recently_used_entries_are_evicted_by_count(self):
+        cache = self.make(MAX_ENTRIES=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(self.local_keys(cache), ["a", "c"])
+        # Still in the remote tier
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(self.local_keys(cache), ["c", "b"])
+
+    def test_least_recently_used_entries_are_evicted_by_size(self):
+        cache = self.make(MAX_BYTES=2500)
+        for key in "abc":
+            cache.set(key, "x" * 1000)
+        self.assertEqual(self.local_keys(cache), ["b", "c"])
+        self.assertLessEqual(cache._store.size, 2500)
+
+        # Larger than the whole local tier: kept remotely only
+        cache.set("big", "x" * 3000)
+        self.assertNotIn("big", self.local_keys(cache))
+        self.assertEqual(cache.get("big"), "x" * 3000)
+
+    def test_incr_and_delete_drop_only_the_changed_keys_in_other_processes(self):
+        writer, reader = self.make(), self.make()
+        writer.set("version", 1)
+        writer.set("a", "a")
+        writer.set("b", "b")
+        self.assertEqual(reader.get_many(["version", "a", "b"]), {"version": 1, "a": "a", "b": "b"})
+
+        writer.incr("version")
+        self.assertEqual(reader.get("version"), 2)
+        self.assertIn("a", self.local_keys(reader))
+
+        writer.delete("a")
+        self.assertIsNone(reader.get("a"))
+        self.assertIn("b", self.local_keys(reader))
+
+    def test_clear_drops_everything_in_other_processes(self):
+        writer, reader = self.make(), self.make()
+        writer.set("a", "a")
+        reader.get("a")
+        writer.clear()
+        self.assertIsNone(reader.get("a"))
+
+    def test_lost_change_record_drops_everything(self):
+        writer, reader = self.make(), self.make()
+        writer.set("version", 1)
+        writer.set("a", "a")
+        reader.get_many(["version", "a"])
+
+        writer.incr("version")
+        caches["default"].delete(writer.changes_key.format(caches["default"].get(writer.generation_key)))
+        # Behind the local copy's back: only a full drop reveals it
+        caches["default"].set("a", "changed")
+        self.assertEqual(reader.get("a"), "changed")
+
+    def test_local_copy_is_served_for_local_timeout(self):
+        cache = self.make(LOCAL_TIMEOUT=30)
+        cache.set("a", "old")
+        # Another process overwrote the remote value without bumping the generation
+        caches["default"].set("a", "new")
+
+        with mock.patch("common.cache.time.monotonic", return_value=cache._store.entries["test:1:a"][0] - 1):
+            self.assertEqual(cache.get("a"), "old")
+        with mock.patch("common.cache.time.monotonic", return_value=cache._store.entries["test:1:a"][0]):
+            self.assertEqual(cache.get("a"), "new")
+
+    def test_shorter_timeout_caps_the_local_copy(self):
+        cache = self.make(LOCAL_TIMEOUT=30)
+        with mock.patch("common.cache.time.monotonic", return_value=1000.0):
+            cache.set("a", 1, timeout=5)
+        self.assertEqual(cache._store.entries["test:1:a"][0], 1005.0)
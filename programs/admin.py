@@ -1,4 +1,5 @@
 from django.contrib import admin
+from .caching import invalidate_on_commit
 from .models import (
     EducationalProgram,
     ProgramDiscipline,
@@ -15,12 +16,16 @@ from .models import (
     DisciplineModule,
     LoadType,
     DisciplineMarking,
-    SemesterControl
+    SemesterControl,
+    ImportManifest,
+    ImportJob,
+    ImportRun,
+    ProgramSummary,
 )
 
 @admin.register(EducationalProgram)
 class EducationalProgramAdmin(admin.ModelAdmin):
-    list_display = ('profile', 'direction', 'year', 'faculty')
+    list_display = ('profile', 'direction', 'year', 'faculty', 'updated_at')
     list_filter = ('year', 'faculty', 'education_level')
     search_fields = ('profile', 'direction__name')
 
@@ -31,7 +36,7 @@ class DisciplineAdmin(admin.ModelAdmin):
 
 @admin.register(ProgramDiscipline)
 class ProgramDisciplineAdmin(admin.ModelAdmin):
-    list_display = ('get_name', 'code', 'program', 'semester', 'load_type')
+    list_display = ('get_name', 'code', 'program', 'semester', 'load_type', 'updated_at')
     list_filter = ('semester', 'load_type', 'program__faculty')
     search_fields = ('discipline__name', 'code')
 
@@ -39,6 +44,42 @@ class ProgramDisciplineAdmin(admin.ModelAdmin):
         return obj.discipline.name
     get_name.short_description = 'Дисциплина'
 
+    # Deletions have no signal receiver (see programs.signals), saves do
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        invalidate_on_commit([obj.program_id])
+
+    def delete_queryset(self, request, queryset):
+        program_ids = set(queryset.values_list('program_id', flat=True))
+        super().delete_queryset(request, queryset)
+        invalidate_on_commit(program_ids)
+
+@admin.register(ImportManifest)
+class ImportManifestAdmin(admin.ModelAdmin):
+    list_display = ('path', 'program', 'year', 'size', 'imported_at')
+    search_fields = ('path', 'content_hash')
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'original_name', 'state', 'year', 'program', 'created_at', 'finished_at')
+    list_filter = ('state',)
+    # The uploaded workbook, up to megabytes per row
+    exclude = ('content',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer('content')
+
+@admin.register(ProgramSummary)
+class ProgramSummaryAdmin(admin.ModelAdmin):
+    list_display = ('program', 'total_zet', 'discipline_count', 'semester_count', 'updated_at')
+    list_select_related = ('program',)
+
+@admin.register(ImportRun)
+class ImportRunAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'source', 'program', 'succeeded', 'rows', 'total_time', 'queries', 'created_at')
+    list_filter = ('succeeded',)
+    search_fields = ('source',)
+
 # Register other models
 admin.site.register(Faculty)
 admin.site.register(Direction)
@@ -1,6 +1,8 @@
 import re
-from django.db.models import QuerySet
-from .models import ProgramDiscipline
+from collections import defaultdict
+from decimal import Decimal
+from django.db.models import Count, QuerySet, Sum
+from .models import EducationalProgram, ProgramDiscipline, ProgramSummary
 
 
 class CompetencyAnalyzer:
@@ -104,7 +106,7 @@ class CompetencyAnalyzer:
         total_zet = 0.0
 
         for pd_obj in disciplines:
-            zet_val = self._parse_zet(pd_obj.zet)
+            zet_val = float(pd_obj.zet_value or 0)
             if zet_val <= 0:
                 continue
 
@@ -138,12 +140,117 @@ class CompetencyAnalyzer:
             "total_analyzed_zet": total_zet,
         }
 
-    def _parse_zet(self, zet_str):
-        if not zet_str:
-            return 0.0
-        try:
-            # Replace comma with dot and handle non-numeric chars if necessary
-            clean_str = str(zet_str).replace(",", ".").strip()
-            return float(clean_str)
-        except ValueError:
-            return 0.0
+
+class ProgramTotals:
+    """
+    ZET, discipline count and amount totals of a program, overall and per semester,
+    block and load type. Amounts are summed per measurement unit (hours, weeks, ...).
+
+    All breakdowns come from a single GROUP BY over (semester, block, load type, unit)
+    on the numeric zet_value / amount_value columns; the result has few groups, so the
+    roll-ups are done in Python.
+    """
+
+    DIMENSIONS = (
+        ("semester", "semester__name"),
+        ("block", "block__name"),
+        ("load_type", "load_type__name"),
+    )
+
+    # Programs per query when summaries of the whole database are rebuilt
+    SUMMARY_BATCH_SIZE = 500
+
+    def compute(self, program_id) -> dict:
+        return self.compute_many([program_id])[program_id]
+
+    def compute_many(self, program_ids) -> dict:
+        """{program_id: totals} for several programs, still with a single query"""
+        groups = (
+            ProgramDiscipline.objects.filter(program_id__in=program_ids)
+            .values("program_id", *(field for _, field in self.DIMENSIONS), "measurement_unit")
+            .annotate(zet=Sum("zet_value"), amount=Sum("amount_value"), disciplines=Count("id"))
+            .order_by()
+        )
+
+        totals = {program_id: self._empty() for program_id in program_ids}
+        breakdowns = {
+            program_id: {name: defaultdict(self._empty) for name, _ in self.DIMENSIONS} for program_id in program_ids
+        }
+        for group in groups:
+            program_id = group["program_id"]
+            self._add(totals[program_id], group)
+            for name, field in self.DIMENSIONS:
+                self._add(breakdowns[program_id][name][group[field]], group)
+
+        return {program_id: self._result(totals[program_id], breakdowns[program_id]) for program_id in program_ids}
+
+    def refresh_summaries(self, program_ids=None) -> int:
+        """
+        Recompute ProgramSummary rows of the given programs (every program when None).
+        Returns the number of summaries written.
+        """
+        if program_ids is None:
+            program_ids = EducationalProgram.objects.order_by("pk").values_list("pk", flat=True).iterator()
+        program_ids = list(program_ids)
+
+        written = 0
+        for start in range(0, len(program_ids), self.SUMMARY_BATCH_SIZE):
+            batch = program_ids[start : start + self.SUMMARY_BATCH_SIZE]
+            summaries = [
+                self._summary(program_id, totals) for program_id, totals in self.compute_many(batch).items()
+            ]
+            ProgramSummary.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=["program"],
+                update_fields=[
+                    "total_zet",
+                    "discipline_count",
+                    "semester_count",
+                    "amount",
+                    "load_types",
+                    "semesters",
+                    "updated_at",
+                ],
+            )
+            written += len(summaries)
+        return written
+
+    @staticmethod
+    def _summary(program_id, totals):
+        return ProgramSummary(
+            program_id=program_id,
+            total_zet=Decimal(str(totals["total"]["zet"])),
+            discipline_count=totals["total"]["disciplines"],
+            semester_count=sum(1 for row in totals["by_semester"] if row["semester"] is not None),
+            amount=totals["total"]["amount"],
+            load_types=totals["by_load_type"],
+            semesters=totals["by_semester"],
+        )
+
+    def _result(self, total, breakdowns):
+        result = {"total": self._export(total)}
+        for name, _ in self.DIMENSIONS:
+            # None (no semester/block/load type) sorts last
+            keys = sorted(breakdowns[name], key=lambda key: (key is None, key or ""))
+            result[f"by_{name}"] = [{name: key, **self._export(breakdowns[name][key])} for key in keys]
+        return result
+
+    @staticmethod
+    def _empty():
+        return {"zet": 0, "disciplines": 0, "amount": defaultdict(int)}
+
+    @staticmethod
+    def _add(bucket, group):
+        bucket["zet"] += group["zet"] or 0
+        bucket["disciplines"] += group["disciplines"]
+        if group["amount"] is not None:
+            bucket["amount"][group["measurement_unit"] or ""] += group["amount"]
+
+    @staticmethod
+    def _export(bucket):
+        return {
+            "zet": float(bucket["zet"]),
+            "disciplines": bucket["disciplines"],
+            "amount": {unit: float(value) for unit, value in sorted(bucket["amount"].items())},
+        }
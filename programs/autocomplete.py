@@ -0,0 +1,168 @@
+import threading
+import time
+from django.db.models import Count
+from . import caching
+from .models import EducationalProgram, ProgramDiscipline, Discipline, Direction
+from .search import normalize_search_text
+
+
+class AutocompleteIndex:
+    """
+    In-process type-ahead index over discipline names, directions and program profiles.
+
+    Entries are kept with their normalized text (see programs.search.normalize_search_text)
+    and the number of programs using them, most used first, so an entry's position is
+    also its tie-break rank. Queries of three characters or more are answered from a
+    trigram index (the shortest posting list of the query's trigrams, verified as
+    substrings); one- and two-character queries from precomputed word-prefix lists. Ranking: whole-text prefix,
+    then word prefix, then any substring; ties by program count and name.
+    """
+
+    TYPE_DISCIPLINE = "discipline"
+    TYPE_DIRECTION = "direction"
+    TYPE_PROFILE = "profile"
+    TYPES = (TYPE_DISCIPLINE, TYPE_DIRECTION, TYPE_PROFILE)
+
+    # Distinct (query, limit, types) results remembered per index
+    RESULT_CACHE_SIZE = 1024
+
+    def __init__(self, entries, version=None):
+        # entries: [(type, id, label, program count)]; id is None for profiles
+        self.version = version
+        self.entries = sorted(entries, key=lambda entry: (-entry[3], entry[2]))
+        self.texts = [normalize_search_text(label) for _, _, label, _ in self.entries]
+        trigrams = {}
+        prefixes = {}
+        for position, text in enumerate(self.texts):
+            for trigram in self._trigrams(text):
+                trigrams.setdefault(trigram, set()).add(position)
+            for word in text.split(" "):
+                for length in (1, 2):
+                    if len(word) >= length:
+                        prefixes.setdefault(word[:length], set()).add(position)
+        # Posting lists in rank order
+        self.trigrams = {trigram: sorted(positions) for trigram, positions in trigrams.items()}
+        self.prefixes = {prefix: sorted(positions) for prefix, positions in prefixes.items()}
+        self.results = {}
+
+    @classmethod
+    def build(cls, version=None):
+        """Load the catalog from the database: four aggregate queries"""
+        discipline_programs = dict(
+            ProgramDiscipline.objects.values_list("discipline_id")
+            .annotate(programs=Count("program_id", distinct=True))
+            .order_by()
+        )
+        direction_programs = dict(
+            EducationalProgram.objects.values_list("direction_id").annotate(programs=Count("id")).order_by()
+        )
+
+        entries = [
+            (cls.TYPE_DISCIPLINE, pk, name, discipline_programs.get(pk, 0))
+            for pk, name in Discipline.objects.values_list("pk", "name").iterator()
+        ]
+        entries += [
+            (cls.TYPE_DIRECTION, pk, f"{code} {name}".strip(), direction_programs.get(pk, 0))
+            for pk, code, name in Direction.objects.values_list("pk", "code", "name")
+        ]
+        entries += [
+            (cls.TYPE_PROFILE, None, profile, programs)
+            for profile, programs in EducationalProgram.objects.values_list("profile")
+            .annotate(programs=Count("id"))
+            .order_by()
+        ]
+        return cls(entries, version=version)
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i : i + 3] for i in range(len(text) - 2)}
+
+    def _candidates(self, query):
+        """Positions of the entries containing query, in rank order"""
+        if len(query) < 3:
+            return self.prefixes.get(query, ())
+
+        # Every match is in each trigram's posting list; the shortest one is scanned lazily
+        shortest = min((self.trigrams.get(trigram, ()) for trigram in self._trigrams(query)), key=len)
+        texts = self.texts
+        return (position for position in shortest if query in texts[position])
+
+    def search(self, query, limit=10, types=None):
+        """Top `limit` entries matching query: [{"type", "id", "name", "programs"}]"""
+        query = normalize_search_text(query)
+        if not query or limit <= 0:
+            return []
+
+        key = (query, limit, frozenset(types) if types else None)
+        results = self.results.get(key)
+        if results is None:
+            results = self._search(query, limit, types)
+            if len(self.results) >= self.RESULT_CACHE_SIZE:
+                self.results.clear()
+            self.results[key] = results
+        return results
+
+    def _search(self, query, limit, types):
+        # Candidates come in rank order, so scanning can stop once `limit` whole-text prefix
+        # matches are found: nothing after them can outrank them
+        word_prefix = f" {query}"
+        buckets = ([], [], [])
+        for position in self._candidates(query):
+            entry = self.entries[position]
+            if types and entry[0] not in types:
+                continue
+            text = self.texts[position]
+            if text.startswith(query):
+                buckets[0].append(entry)
+                if len(buckets[0]) >= limit:
+                    break
+            elif word_prefix in text:
+                buckets[1].append(entry)
+            else:
+                buckets[2].append(entry)
+
+        return [
+            {"type": entry_type, "id": pk, "name": label, "programs": programs}
+            for entry_type, pk, label, programs in (buckets[0] + buckets[1] + buckets[2])[:limit]
+        ]
+
+
+class AutocompleteService:
+    """
+    Process-wide holder of the AutocompleteIndex: built on first use, rebuilt when the
+    shared program list version (programs.caching) changes. The version is read at most every
+    VERSION_CHECK_INTERVAL seconds so a lookup normally never leaves the process.
+    """
+
+    VERSION_CHECK_INTERVAL = 5.0
+
+    _index = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_index(cls):
+        index = cls._index
+        now = time.monotonic()
+        if index is not None and now - cls._checked_at < cls.VERSION_CHECK_INTERVAL:
+            return index
+
+        version = caching.list_version()
+        cls._checked_at = now
+        if index is not None and index.version == version:
+            return index
+
+        with cls._lock:
+            # Another thread may have rebuilt it while we waited for the lock
+            if cls._index is None or cls._index.version != version:
+                cls._index = AutocompleteIndex.build(version=version)
+            return cls._index
+
+    @classmethod
+    def search(cls, query, limit=10, types=None):
+        return cls.get_index().search(query, limit=limit, types=types)
+
+    @classmethod
+    def reset(cls):
+        """Drop this process' index, the next lookup rebuilds it"""
+        cls._index = None
@@ -0,0 +1,471 @@
+import gzip
+import hashlib
+import math
+import random
+import secrets
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from visualizer.routers import use_primary
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bumped whenever any program changes: list pages, autocomplete index
+LIST_VERSION_KEY = "programs:version:list"
+# Bumped when this program (or its disciplines) changes: detail, disciplines, totals
+PROGRAM_VERSION_KEY = "programs:version:program:{}"
+# Bumped when a faculty, semester, ... is renamed or removed: its name is in every program's responses
+LOOKUP_VERSION_KEY = "programs:version:lookups"
+
+# Lifetime of a list or lookup version seeded on first read (see versions()); reseeding
+# later only costs misses
+VERSION_SEED_TIMEOUT = 60 * 60 * 24
+
+# Shared ResponseCache counters: STATS_KEY_PREFIX + outcome
+STATS_KEY_PREFIX = "programs:response:stats:"
+# Seconds a process counts in memory before adding its counts to the shared counters
+STATS_FLUSH_INTERVAL = 10
+
+# {"ids", "lookups"} collected inside deferred_invalidation(), None outside of it
+_pending = ContextVar("pending_invalidations", default=None)
+
+
+def tiered_cache():
+    """
+    The "tiered" alias (common.cache.TwoTierCache: per-process LRU in front of Redis) for
+    versions and versioned entries, the default cache when it is not configured.
+    Locks and counters always use the default cache directly.
+    """
+    return caches["tiered"] if "tiered" in settings.CACHES else cache
+
+
+def _new_version():
+    """
+    A version value: "<time in ns>-<random>", unique without a shared counter and telling
+    when the data changed (see version_time()).
+    """
+    return f"{time.time_ns()}-{secrets.token_hex(4)}"
+
+
+def version_time(version):
+    """When a version was made (aware datetime, UTC), None for values without a time"""
+    try:
+        return datetime.fromtimestamp(int(str(version).split("-")[0]) / 1e9, timezone.utc)
+    except (ValueError, OverflowError, OSError):
+        return None
+
+
+def _bump(keys):
+    store = tiered_cache()
+    store.set_many({key: _new_version() for key in keys}, None)
+    # One generation bump drops the old values from every process's local tier
+    if hasattr(store, "bump_generation"):
+        store.bump_generation(keys)
+
+
+def program_pk(value):
+    """The program id of a URL kwarg as an int, None for anything else (no version key for it)"""
+    text = str(value)
+    return int(text) if text.isascii() and text.isdigit() else None
+
+
+def list_version():
+    return versions()[0]
+
+
+def versions(pk=None):
+    """
+    (list version, program version, lookup version), usually from process memory; the
+    program version is None without pk.
+
+    The list and lookup keys, when never bumped or evicted from the remote cache, are
+    seeded with a new version (add(): the first process wins), so they never repeat a
+    value that data cached earlier (or an ETag a client holds) was built from. A missing
+    program key is not seeded, so requests for made-up ids create no keys: the program
+    falls back to the list version, which every bump of the program changes as well.
+    """
+    keys = [LIST_VERSION_KEY, LOOKUP_VERSION_KEY]
+    if pk is not None:
+        keys.append(PROGRAM_VERSION_KEY.format(pk))
+    store = tiered_cache()
+    found = store.get_many(keys)
+    missing = [key for key in keys[:2] if key not in found]
+    if missing:
+        for key in missing:
+            store.add(key, _new_version(), VERSION_SEED_TIMEOUT)
+        found.update(store.get_many(missing))
+    program_v = None
+    if pk is not None:
+        program_v = found.get(keys[-1], f"list-{found[LIST_VERSION_KEY]}")
+    return found[LIST_VERSION_KEY], program_v, found[LOOKUP_VERSION_KEY]
+
+
+def version_scope(pk=None):
+    """
+    The versions a response depends on as a key part: a program and its actions show
+    the program's rows and lookup names, lists anything (the list version covers both).
+    pk must be a valid id, see program_pk().
+    """
+    list_v, program_v, lookup_v = versions(pk)
+    return f"program:{pk}:{program_v}:{lookup_v}" if pk is not None else f"list:{list_v}"
+
+
+def last_modified(pk=None):
+    """When the data of version_scope(pk) last changed, None if a version carries no time"""
+    list_v, program_v, lookup_v = versions(pk)
+    if pk is None:
+        return version_time(list_v)
+    times = [version_time(str(program_v).removeprefix("list-")), version_time(lookup_v)]
+    return None if None in times else max(times)
+
+
+def invalidate_programs(program_ids, lookups=False):
+    """
+    Make cached responses of these programs and of the program list stale, and with
+    lookups=True those of every program (a lookup name they show changed). Nothing is
+    deleted: the versions in their keys change and old entries expire on their own.
+    """
+    pending = _pending.get()
+    if pending is not None:
+        pending["ids"].update(program_ids)
+        pending["lookups"] = pending["lookups"] or lookups
+        return
+    keys = [PROGRAM_VERSION_KEY.format(pk) for pk in set(program_ids)]
+    if lookups:
+        keys.append(LOOKUP_VERSION_KEY)
+    keys.append(LIST_VERSION_KEY)
+    _bump(keys)
+
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Collect invalidate_programs() calls made inside the block and apply them once at the
+    end, e.g. a single list version bump for a whole import_all_data run. Nested blocks
+    hand their programs to the outermost one.
+    """
+    if _pending.get() is not None:
+        yield
+        return
+
+    # "lookups" is None until the first call: a block without calls bumps nothing
+    pending = {"ids": set(), "lookups": None}
+    token = _pending.set(pending)
+    try:
+        yield
+    finally:
+        _pending.reset(token)
+        if pending["lookups"] is not None:
+            invalidate_programs(pending["ids"], lookups=pending["lookups"])
+
+
+def invalidate_on_commit(program_ids, lookups=False, using=None):
+    """
+    invalidate_programs() once the current transaction commits (right away in autocommit),
+    for signal receivers: the programs of every call in one transaction are collected
+    and bumped by a single on_commit callback, however many rows changed.
+    """
+    connection = transaction.get_connection(using)
+    if not connection.in_atomic_block:
+        invalidate_programs(program_ids, lookups=lookups)
+        return
+    flush = getattr(connection, "_program_invalidation", None)
+    # Gone from run_on_commit: run already, or dropped by a rollback
+    if flush is None or not any(entry[1] is flush for entry in connection.run_on_commit):
+        pending = {"ids": set(), "lookups": False}
+
+        def flush():
+            connection._program_invalidation = None
+            invalidate_programs(pending["ids"], lookups=pending["lookups"])
+
+        flush.pending = pending
+        connection._program_invalidation = flush
+        transaction.on_commit(flush, using=using)
+    flush.pending["ids"].update(program_ids)
+    flush.pending["lookups"] = flush.pending["lookups"] or lookups
+
+
+def normalized_query(request):
+    """Query parameters sorted by name and value, empty values dropped: ?b=2&a=1&c= == ?a=1&b=2"""
+    return urlencode(
+        sorted((name, value) for name, values in request.GET.lists() for value in values if value != "")
+    )
+
+
+class _LocalCounts:
+    """Outcomes counted by this process since the last flush to the shared counters"""
+
+    def __init__(self):
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.flushed_at = time.monotonic()
+
+    def take(self, force=False):
+        """The counts to add to the shared counters (emptied here), {} until the interval is over"""
+        now = time.monotonic()
+        with self.lock:
+            if not force and now - self.flushed_at < STATS_FLUSH_INTERVAL:
+                return {}
+            counts = dict(self.counts)
+            self.counts.clear()
+            self.flushed_at = now
+        return counts
+
+
+_local_counts = _LocalCounts()
+
+
+def _count(name):
+    """
+    Count an outcome in process memory: a hit served from the local tier costs no
+    network call. The counts reach the shared counters every STATS_FLUSH_INTERVAL seconds.
+    """
+    with _local_counts.lock:
+        _local_counts.counts[name] += 1
+    flush_response_cache_stats(force=False)
+
+
+def flush_response_cache_stats(force=True):
+    """Add this process's counts to the shared counters"""
+    for name, delta in _local_counts.take(force).items():
+        key = f"{STATS_KEY_PREFIX}{name}"
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            if not cache.add(key, delta, None):
+                cache.incr(key, delta)
+
+
+def response_cache_stats(reset=False):
+    """
+    Shared hit / miss / ... counters of ResponseCache; every process adds its counts
+    at most STATS_FLUSH_INTERVAL seconds late.
+    """
+    flush_response_cache_stats()
+    keys = {f"{STATS_KEY_PREFIX}{name}": name for name in ResponseCache.OUTCOMES}
+    found = cache.get_many(keys)
+    if reset:
+        cache.delete_many(keys)
+    return {name: found.get(key, 0) for key, name in keys.items()}
+
+
+class ResponseCache:
+    """
+    Shared cache of rendered JSON responses of the read-only program and discipline views.
+
+    The key is the URL with the normalized query plus the data version (see versions()),
+    not the cookies: the data is public, so every client shares one entry. Because a
+    version change moves readers to new keys, an entry is never wrong, only old, and is
+    kept STALE_TTL seconds past its timeout for serving while it is rebuilt:
+
+    - a hit is refreshed early with probability growing towards expiry (XFetch: the
+      longer the rebuild took, the earlier), by the one worker holding the key's lock;
+      the others keep serving the entry;
+    - on a miss one worker rebuilds under the lock, the others wait up to LOCK_WAIT
+      seconds for its result before building it themselves.
+
+    Entries live in tiered_cache(), so hot ones are served from process memory. Bodies
+    are stored compressed once, gzip plus brotli when the brotli package is installed, and
+    sent as they are to clients whose Accept-Encoding allows it; only clients asking for
+    identity cost a decompression.
+    Outcomes (hit, stale, miss, rebuild, wait) are counted in the shared cache,
+    see response_cache_stats() and the response_cache_stats command.
+    """
+
+    STALE_TTL = 60
+    LOCK_TIMEOUT = 30
+    LOCK_WAIT = 5.0
+    POLL_INTERVAL = 0.05
+    # XFetch beta: above 1 favours earlier refreshes
+    EARLY_REFRESH_BETA = 1.0
+    STORED_HEADERS = ("Content-Type", "Vary", "Allow")
+    OUTCOMES = ("hit", "stale", "miss", "rebuild", "wait")
+    # Smaller bodies are stored as they are (same threshold as GZipMiddleware)
+    MIN_COMPRESS_BYTES = 200
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    @staticmethod
+    def is_cacheable(request):
+        """GET/HEAD asking for JSON; the browsable API renders per-user pages"""
+        if request.method not in ("GET", "HEAD"):
+            return False
+        requested_format = request.GET.get("format")
+        if requested_format:
+            return requested_format == "json"
+        return "text/html" not in request.META.get("HTTP_ACCEPT", "")
+
+    @staticmethod
+    def key(request, pk=None):
+        scope = version_scope(pk)
+        # Scheme and host too: pagination links in the body are absolute URLs
+        url = f"{request.build_absolute_uri(request.path)}?{normalized_query(request)}"
+        digest = hashlib.md5(url.encode()).hexdigest()
+        return f"programs:response:{scope}:{digest}"
+
+    def get_or_build(self, request, build, pk=None):
+        """Cached response for request, build() renders it on a miss or refresh"""
+        key = self.key(request, pk)
+        lock_key = f"{key}:lock"
+        entries = tiered_cache()
+        entry = entries.get(key)
+
+        if entry is not None:
+            if not self._refresh_due(entry):
+                return self._replay(entry, request, "hit")
+            if not cache.add(lock_key, 1, self.LOCK_TIMEOUT):
+                # Someone else is refreshing it, this one is still good to serve
+                return self._replay(entry, request, "stale")
+            return self._build(key, lock_key, build, request, "rebuild")
+
+        if cache.add(lock_key, 1, self.LOCK_TIMEOUT):
+            return self._build(key, lock_key, build, request, "miss")
+
+        # Another worker builds this entry right now: wait for it instead of piling on
+        deadline = time.monotonic() + self.LOCK_WAIT
+        while time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            entry = entries.get(key)
+            if entry is not None:
+                return self._replay(entry, request, "wait")
+            if cache.get(lock_key) is None:
+                # Released without storing (a 404, a 400, ...): nothing will come, build it now.
+                # The entry may have landed between the two reads
+                entry = entries.get(key)
+                if entry is not None:
+                    return self._replay(entry, request, "wait")
+                break
+        _count("miss")
+        return self._render(build())[0]
+
+    def _refresh_due(self, entry):
+        # XFetch: now - delta * beta * ln(rand) >= expiry, ln(rand) <= 0
+        early = -entry["delta"] * self.EARLY_REFRESH_BETA * math.log(1.0 - random.random())
+        return time.time() + early >= entry["expires"]
+
+    def _build(self, key, lock_key, build, request, outcome):
+        try:
+            started = time.perf_counter()
+            # Stored under the current version: a lagging replica could still hold the previous data
+            with use_primary():
+                response, cacheable = self._render(build())
+            if not cacheable:
+                _count(outcome)
+                return response
+            entry = {
+                "status": response.status_code,
+                "headers": [(name, response[name]) for name in self.STORED_HEADERS if response.has_header(name)],
+                **self._compress(response.content),
+            }
+            entry["expires"] = time.time() + self.timeout
+            entry["delta"] = time.perf_counter() - started
+            tiered_cache().set(key, entry, self.timeout + self.STALE_TTL)
+        finally:
+            cache.delete(lock_key)
+        return self._replay(entry, request, outcome)
+
+    def _compress(self, content):
+        """Stored body: {"content", "encoding"} (gzip or None) and "br" when brotli is available"""
+        if len(content) < self.MIN_COMPRESS_BYTES:
+            return {"content": content, "encoding": None, "br": None}
+        return {
+            "content": gzip.compress(content, compresslevel=self.GZIP_LEVEL, mtime=0),
+            "encoding": "gzip",
+            "br": brotli.compress(content, quality=self.BROTLI_QUALITY) if brotli is not None else None,
+        }
+
+    @staticmethod
+    def _render(response):
+        """Render a DRF/template response now; only successful JSON responses are stored"""
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+        cacheable = (
+            response.status_code == 200
+            and not response.streaming
+            and response.get("Content-Type", "").startswith("application/json")
+        )
+        return response, cacheable
+
+    @staticmethod
+    def accepted_encodings(request):
+        """Codings the client accepts (q > 0) from Accept-Encoding"""
+        accepted = set()
+        for part in request.META.get("HTTP_ACCEPT_ENCODING", "").split(","):
+            coding, _, params = part.strip().partition(";")
+            q = params.strip()
+            if q.startswith("q="):
+                try:
+                    if float(q[2:]) <= 0:
+                        continue
+                except ValueError:
+                    continue
+            if coding:
+                accepted.add(coding.strip().lower())
+        return accepted
+
+    @classmethod
+    def _replay(cls, entry, request, outcome):
+        _count(outcome)
+        content = entry["content"]
+        encoding = entry.get("encoding")
+        if encoding is not None:
+            accepted = cls.accepted_encodings(request)
+            if entry.get("br") is not None and "br" in accepted:
+                content, encoding = entry["br"], "br"
+            elif not accepted & {encoding, "*"}:
+                # Identity client: the only case that costs a decompression
+                content, encoding = gzip.decompress(content), None
+
+        response = HttpResponse(content, status=entry["status"])
+        for name, value in entry["headers"]:
+            response[name] = value
+        if entry.get("encoding") is not None:
+            patch_vary_headers(response, ("Accept-Encoding",))
+        if encoding is not None:
+            response["Content-Encoding"] = encoding
+        response["Content-Length"] = str(len(content))
+        response["X-Cache"] = outcome.upper()
+        return response
+
+
+class CachedResponseMixin:
+    """
+    For read-only viewsets: serve safe JSON requests through ResponseCache. Views with a
+    pk are keyed by that program's version and the lookup version, the rest by the list
+    version;
+    response_cache_skip_actions bypass the cache.
+    """
+
+    response_cache = ResponseCache(60 * 15)
+    response_cache_skip_actions = ()
+    # URL kwarg holding the program id, None when entries follow the list version only
+    response_cache_program_kwarg = "pk"
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower()) if getattr(self, "action_map", None) else None
+        if action in self.response_cache_skip_actions or not ResponseCache.is_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        pk = kwargs.get(self.response_cache_program_kwarg) if self.response_cache_program_kwarg else None
+        if pk is not None:
+            pk = program_pk(pk)
+            if pk is None:
+                # Not an id, a 404 nobody needs cached
+                return super().dispatch(request, *args, **kwargs)
+        dispatch = super().dispatch
+        return self.response_cache.get_or_build(request, lambda: dispatch(request, *args, **kwargs), pk=pk)
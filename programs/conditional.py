@@ -0,0 +1,34 @@
+import hashlib
+from django.views.decorators.http import condition
+from .caching import last_modified, program_pk, version_scope
+
+
+def _etag(request, *args, pk=None, **kwargs):
+    """
+    Weak ETag from the cache versions the response is built from (see
+    caching.version_scope()), the same ones ResponseCache keys use: anything that
+    invalidates a cached response changes it too. No database query is made.
+    """
+    if pk is not None:
+        pk = program_pk(pk)
+        if pk is None:
+            # Not an id: a 404, and no version key is looked up for it
+            return None
+    # The same data renders differently per query (filters, ?fields=) and format
+    parts = (version_scope(pk), request.get_full_path(), request.META.get("HTTP_ACCEPT", ""))
+    # Weak: the gzip, brotli and identity bodies of the response cache are the same resource
+    digest = hashlib.md5("|".join(parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def _last_modified(request, *args, pk=None, **kwargs):
+    """When the versions behind the ETag were made, see caching.last_modified()"""
+    if pk is not None:
+        pk = program_pk(pk)
+        if pk is None:
+            return None
+    return last_modified(pk)
+
+
+# View decorator: ETag / Last-Modified on program resources, 304 before the view runs
+program_condition = condition(etag_func=_etag, last_modified_func=_last_modified)
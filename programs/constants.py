@@ -1,3 +1,5 @@
+import re
+
 PROGRAM_SHEET_INDEX = 0
 DISCIPLINES_SHEET_INDEX = 1
 
@@ -24,3 +26,21 @@ COL_LOAD_TYPE = 'Нагрузка'
 COL_AMOUNT = 'Количество'
 COL_MEASUREMENT_UNIT = 'Ед. изм.'
 COL_ZET = 'ЗЕТ'
+
+# Discipline columns consumed by the importer; the streaming reader skips all others
+DISCIPLINE_COLUMNS = (
+    COL_BLOCK,
+    COL_CODE,
+    COL_PART,
+    COL_MODULE,
+    COL_RECORD_TYPE,
+    COL_DISCIPLINE_NAME,
+    COL_PERIOD,
+    COL_LOAD_TYPE,
+    COL_AMOUNT,
+    COL_MEASUREMENT_UNIT,
+    COL_ZET,
+)
+
+# Regex to match year folders like Fit_2023, Fit_2024
+YEAR_FOLDER_PATTERN = re.compile(r'Fit_(\d{4})')
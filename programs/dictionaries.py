@@ -0,0 +1,83 @@
+import hashlib
+import json
+import re
+from visualizer.routers import use_primary
+from . import caching
+from .models import (
+    Faculty,
+    Direction,
+    EducationLevel,
+    EducationType,
+    Qualification,
+    StandardType,
+    Semester,
+    DisciplineBlock,
+    DisciplinePart,
+    DisciplineModule,
+    LoadType,
+)
+
+# Entries follow the list version: every import (and every lookup change, see signals) bumps it
+DICTIONARIES_KEY = "programs:dictionaries:{}"
+
+
+def _natural_key(text):
+    """Sort key putting "Семестр 2" before "Семестр 10": digit runs compare as numbers"""
+    parts = re.split(r"(\d+)", text)
+    return [(0, int(part), "") if part.isdigit() else (1, 0, part.lower()) for part in parts]
+
+
+class Dictionaries:
+    """
+    The lookup tables of programs.models in one payload for filter dropdowns, one
+    values_list query per table (Discipline, with thousands of rows, is not a lookup).
+    Built once per list version and kept in tiered_cache(), so a request is usually
+    answered from process memory without touching the database.
+    """
+
+    # Response key -> model and columns; rows are sorted by the columns after id
+    TABLES = {
+        "faculties": (Faculty, ("id", "name")),
+        "directions": (Direction, ("id", "code", "name")),
+        "education_levels": (EducationLevel, ("id", "name")),
+        "education_types": (EducationType, ("id", "name")),
+        "qualifications": (Qualification, ("id", "name")),
+        "standard_types": (StandardType, ("id", "name")),
+        "semesters": (Semester, ("id", "name")),
+        "blocks": (DisciplineBlock, ("id", "name")),
+        "parts": (DisciplinePart, ("id", "name")),
+        "modules": (DisciplineModule, ("id", "name")),
+        "load_types": (LoadType, ("id", "name")),
+    }
+    # A safety net for lookups changed without signals (bulk or raw SQL); versions do the rest
+    TIMEOUT = 60 * 60 * 24
+
+    @classmethod
+    def compute(cls):
+        data = {}
+        for name, (model, columns) in cls.TABLES.items():
+            rows = [dict(zip(columns, row)) for row in model.objects.values_list(*columns)]
+            rows.sort(key=lambda row: _natural_key(" ".join(row[column] or "" for column in columns[1:])))
+            data[name] = rows
+        return data
+
+    @classmethod
+    def get(cls):
+        """{"data": payload, "digest": md5 of it}, built on the first request after a version change"""
+        key = DICTIONARIES_KEY.format(caching.list_version())
+        store = caching.tiered_cache()
+        entry = store.get(key)
+        if entry is None:
+            # Kept for a day under the current version: a lagging replica could hold the previous rows
+            with use_primary():
+                data = cls.compute()
+            digest = hashlib.md5(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+            entry = {"data": data, "digest": digest}
+            store.set(key, entry, cls.TIMEOUT)
+        return entry
+
+
+def dictionaries_etag(request, *args, **kwargs):
+    """Weak ETag of the payload; JSON and the browsable API render it differently"""
+    parts = (Dictionaries.get()["digest"], request.get_full_path(), request.META.get("HTTP_ACCEPT", ""))
+    return 'W/"{}"'.format(hashlib.md5("|".join(parts).encode()).hexdigest())
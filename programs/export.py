@@ -0,0 +1,159 @@
+import csv
+import json
+from openpyxl import Workbook
+from rest_framework.renderers import BaseRenderer
+from .models import ProgramDiscipline
+from .serializers import ProgramDisciplineRows
+
+
+class _Echo:
+    """File-like object for csv.writer: hands the formatted line back instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+class ExportRenderer(BaseRenderer):
+    """
+    Accepts any Accept header for the export action, whose body is not rendered by DRF;
+    errors of clients that do not accept JSON are still sent as JSON.
+    """
+
+    media_type = "*/*"
+    format = "export"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class ProgramExport:
+    """
+    All programs of a queryset with their disciplines, for bulk dumps (the export endpoint
+    and the export_programs command).
+
+    Programs are read in id order and disciplines in (program, id) order through two
+    server-side cursors (.iterator(chunk_size)), merged as they go: at most one chunk of
+    each plus the disciplines of the current program are in memory, however many
+    programs are exported. Passing the id of the last complete program as `after`
+    resumes an interrupted export where it stopped.
+
+    Formats:
+        ndjson  one JSON object per line and program, disciplines nested as in the API
+        csv     one row per discipline with the program columns repeated (a program
+                without disciplines is one row with empty discipline columns)
+        xlsx    the csv rows on one sheet, written by openpyxl in write-only mode
+    """
+
+    FORMATS = ("ndjson", "csv", "xlsx")
+    CONTENT_TYPES = {
+        "ndjson": "application/x-ndjson",
+        "csv": "text/csv; charset=utf-8",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+    CHUNK_SIZE = 2000
+
+    # Output key -> column, in EducationalProgramSerializer.Meta.fields order
+    PROGRAM_COLUMNS = {
+        "id": "id",
+        "education_type": "education_type__name",
+        "education_level": "education_level__name",
+        "direction_code": "direction__code",
+        "direction": "direction__name",
+        "qualification": "qualification__name",
+        "profile": "profile",
+        "standard_type": "standard_type__name",
+        "faculty": "faculty__name",
+        "year": "year",
+    }
+
+    def __init__(self, programs, after=None, chunk_size=None):
+        programs = programs.order_by("pk")
+        if after is not None:
+            programs = programs.filter(pk__gt=after)
+        # Resolve the database now: a streamed body is read after the view has returned
+        self.programs = programs.using(programs.db)
+        self.chunk_size = chunk_size or self.CHUNK_SIZE
+        # Id of the last program written, the `after` to resume from
+        self.position = after
+        self.count = 0
+
+    def __iter__(self):
+        """(program dict, list of discipline dicts) per program"""
+        program_keys = tuple(self.PROGRAM_COLUMNS)
+        discipline_keys = tuple(ProgramDisciplineRows.COLUMNS)
+        programs = self.programs.values_list(*self.PROGRAM_COLUMNS.values()).iterator(chunk_size=self.chunk_size)
+        disciplines = (
+            ProgramDiscipline.objects.using(self.programs.db)
+            .filter(program__in=self.programs.values("pk"))
+            .order_by("program_id", "pk")
+            .values_list("program_id", *ProgramDisciplineRows.COLUMNS.values())
+            .iterator(chunk_size=self.chunk_size)
+        )
+
+        pending = next(disciplines, None)
+        for values in programs:
+            program = dict(zip(program_keys, values))
+            # Same "code name" as the API's direction
+            program["direction"] = f"{program.pop('direction_code')} {program['direction']}"
+            rows = []
+            # The cursors are separate queries: disciplines of a program deleted (or
+            # created) between them have no program row here and are skipped
+            while pending is not None and pending[0] < program["id"]:
+                pending = next(disciplines, None)
+            while pending is not None and pending[0] == program["id"]:
+                rows.append(dict(zip(discipline_keys, pending[1:])))
+                pending = next(disciplines, None)
+            yield program, rows
+            self.position = program["id"]
+            self.count += 1
+
+    def ndjson(self):
+        """Lines of bytes, one per program"""
+        for program, rows in self:
+            program["disciplines"] = rows
+            yield json.dumps(program, ensure_ascii=False).encode() + b"\n"
+
+    def header(self):
+        # The program dicts of __iter__, with direction_code folded into direction
+        program_columns = ["program_id"]
+        program_columns += [key for key in self.PROGRAM_COLUMNS if key not in ("id", "direction_code")]
+        discipline_columns = ["discipline_id"]
+        discipline_columns += [key for key in ProgramDisciplineRows.COLUMNS if key != "id"]
+        return program_columns + discipline_columns
+
+    def rows(self):
+        """Flat rows for csv and xlsx, the header first"""
+        yield self.header()
+        empty = [None] * len(ProgramDisciplineRows.COLUMNS)
+        for program, disciplines in self:
+            head = list(program.values())
+            if not disciplines:
+                yield head + empty
+            for discipline in disciplines:
+                yield head + list(discipline.values())
+
+    def csv(self):
+        """Chunks of bytes, one per program; starts with a BOM so Excel reads the text as UTF-8"""
+        writer = csv.writer(_Echo())
+        rows = self.rows()
+        yield ("\ufeff" + writer.writerow(next(rows))).encode()
+
+        chunk = []
+        program_id = None
+        for row in rows:
+            if row[0] != program_id and chunk:
+                yield "".join(chunk).encode()
+                chunk = []
+            program_id = row[0]
+            chunk.append(writer.writerow(row))
+        if chunk:
+            yield "".join(chunk).encode()
+
+    def xlsx(self, file):
+        """Write the workbook to a path or binary file; rows go to disk as they are appended"""
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet("Disciplines")
+        for row in self.rows():
+            sheet.append(row)
+        workbook.save(file)
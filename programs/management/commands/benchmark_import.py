@@ -0,0 +1,196 @@
+import random
+import time
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from programs.models import (
+    EducationalProgram,
+    ProgramDiscipline,
+    Discipline,
+    Faculty,
+    Direction,
+    EducationLevel,
+    EducationType,
+    Qualification,
+    Semester,
+    DisciplineBlock,
+    DisciplinePart,
+    DisciplineModule,
+    LoadType,
+)
+from programs.services import ExcelParser, ProgramImporter
+from programs.constants import (
+    COL_BLOCK,
+    COL_CODE,
+    COL_PART,
+    COL_MODULE,
+    COL_RECORD_TYPE,
+    COL_DISCIPLINE_NAME,
+    COL_PERIOD,
+    COL_LOAD_TYPE,
+    COL_AMOUNT,
+    COL_MEASUREMENT_UNIT,
+    COL_ZET,
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+def legacy_save_disciplines(df, program):
+    """Reference row-by-row implementation that _save_disciplines replaced"""
+    new_program_disciplines = []
+    existing_disciplines = set(
+        ProgramDiscipline.objects.filter(program=program).values_list("semester__name", "discipline__name", "code")
+    )
+    caches = {}
+
+    def get_cached_obj(model, name):
+        if not name:
+            return None
+        cache = caches.setdefault(model, {})
+        if name not in cache:
+            cache[name], _ = model.objects.get_or_create(name=name)
+        return cache[name]
+
+    for _, row in df.iterrows():
+        row_data = {k: (v if pd.notnull(v) else None) for k, v in row.items()}
+
+        discipline_name = row_data.get(COL_DISCIPLINE_NAME)
+        if not discipline_name:
+            continue
+        discipline_name = str(discipline_name).strip()
+
+        code = row_data.get(COL_CODE)
+        semester_name = row_data.get(COL_PERIOD)
+        if (semester_name, discipline_name, code) in existing_disciplines:
+            continue
+
+        new_program_disciplines.append(
+            ProgramDiscipline(
+                program=program,
+                discipline=get_cached_obj(Discipline, discipline_name),
+                semester=get_cached_obj(Semester, semester_name),
+                block=get_cached_obj(DisciplineBlock, row_data.get(COL_BLOCK)),
+                part=get_cached_obj(DisciplinePart, row_data.get(COL_PART)),
+                module=get_cached_obj(DisciplineModule, row_data.get(COL_MODULE)),
+                load_type=get_cached_obj(LoadType, row_data.get(COL_LOAD_TYPE)),
+                code=code,
+                amount=row_data.get(COL_AMOUNT),
+                measurement_unit=row_data.get(COL_MEASUREMENT_UNIT),
+                zet=row_data.get(COL_ZET),
+            )
+        )
+        existing_disciplines.add((semester_name, discipline_name, code))
+
+    ProgramDiscipline.objects.bulk_create(new_program_disciplines)
+    return len(new_program_disciplines)
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the discipline import path on a synthetic sheet (database changes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000, help="Rows in the synthetic sheet")
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per implementation")
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        df = self.synthetic_sheet(options["rows"], options["seed"])
+
+        def vectorized_save_disciplines(df, program):
+            # Fresh importer per run: its registry must not outlive the rolled-back transaction
+            return ProgramImporter(ExcelParser())._save_disciplines(df, program)
+
+        implementations = [
+            ("legacy (iterrows)", legacy_save_disciplines),
+            ("vectorized", vectorized_save_disciplines),
+        ]
+        snapshots = {}
+        for label, save in implementations:
+            timings = []
+            for _ in range(options["repeat"]):
+                elapsed, snapshot = self.run_once(save, df)
+                timings.append(elapsed)
+            snapshots[label] = snapshot
+            self.stdout.write(
+                f"{label:<20} rows={len(snapshot):>6}  best={min(timings) * 1000:8.1f} ms  "
+                f"median={sorted(timings)[len(timings) // 2] * 1000:8.1f} ms"
+            )
+
+        if len({tuple(snapshot) for snapshot in snapshots.values()}) == 1:
+            self.stdout.write(self.style.SUCCESS("Database results are identical"))
+        else:
+            self.stdout.write(self.style.ERROR("Database results differ"))
+
+    def run_once(self, save, df):
+        """Import df into a throwaway program and return (seconds, stored rows)"""
+        result = {}
+        try:
+            with transaction.atomic():
+                program = self.make_program()
+                started = time.perf_counter()
+                save(df, program)
+                result["elapsed"] = time.perf_counter() - started
+                result["snapshot"] = sorted(
+                    ProgramDiscipline.objects.filter(program=program).values_list(
+                        "semester__name",
+                        "discipline__name",
+                        "code",
+                        "block__name",
+                        "part__name",
+                        "module__name",
+                        "load_type__name",
+                        "amount",
+                        "measurement_unit",
+                        "zet",
+                    ),
+                    key=repr,
+                )
+                raise Rollback()
+        except Rollback:
+            pass
+        return result["elapsed"], result["snapshot"]
+
+    def make_program(self):
+        return EducationalProgram.objects.create(
+            education_type=EducationType.objects.create(name="benchmark"),
+            education_level=EducationLevel.objects.create(name="benchmark"),
+            direction=Direction.objects.create(code="00.00.00", name="benchmark"),
+            qualification=Qualification.objects.create(name="benchmark"),
+            faculty=Faculty.objects.create(name="benchmark"),
+            profile="benchmark",
+        )
+
+    def synthetic_sheet(self, rows, seed):
+        """
+        Sheet shaped like a real curriculum: gaps, blank names, padded names and duplicates.
+        Whitespace-only names are left out because the legacy path crashes on them.
+        """
+        rnd = random.Random(seed)
+        rng = np.random.default_rng(seed)
+
+        names = [f"  Benchmark discipline {rnd.randint(0, rows // 4)} " for _ in range(rows)]
+        for index in rng.choice(rows, size=rows // 20, replace=False):
+            names[index] = rnd.choice([None, ""])
+
+        def with_gaps(values, ratio=0.1):
+            return [None if rnd.random() < ratio else value for value in values]
+
+        return pd.DataFrame(
+            {
+                COL_BLOCK: with_gaps([f"Блок {rnd.randint(1, 3)}" for _ in range(rows)]),
+                COL_CODE: with_gaps([f"Б1.О.{rnd.randint(1, 60):02d}" for _ in range(rows)]),
+                COL_PART: with_gaps([rnd.choice(["Обязательная часть", "Вариативная часть"]) for _ in range(rows)]),
+                COL_MODULE: with_gaps([f"Модуль {rnd.randint(1, 20)}" for _ in range(rows)], 0.3),
+                COL_RECORD_TYPE: "Дисциплина",
+                COL_DISCIPLINE_NAME: names,
+                COL_PERIOD: with_gaps([f"Семестр {rnd.randint(1, 8)}" for _ in range(rows)], 0.02),
+                COL_LOAD_TYPE: with_gaps([rnd.choice(["Лекции", "Практика", "Экзамен", "Зачет"]) for _ in range(rows)]),
+                COL_AMOUNT: with_gaps([float(rnd.choice([18, 36, 72, 108, 144])) for _ in range(rows)]),
+                COL_MEASUREMENT_UNIT: "Часы",
+                COL_ZET: with_gaps([rnd.choice(["1", "2", "3", "4,5"]) for _ in range(rows)], 0.2),
+            }
+        )
@@ -0,0 +1,140 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework import filters
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from programs.models import (
+    EducationalProgram,
+    ProgramDiscipline,
+    Discipline,
+    Faculty,
+    Direction,
+    EducationLevel,
+    EducationType,
+    Qualification,
+    Semester,
+)
+from programs.search import RankedSearchFilter, discipline_search_document
+from programs.views import DisciplineViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class LegacyView:
+    """search_fields the discipline list used before search_document"""
+
+    search_fields = ["discipline__name", "code", "program__profile", "semester__name"]
+
+
+WORDS = [
+    "основы",
+    "программирования",
+    "базы",
+    "данных",
+    "анализ",
+    "математический",
+    "информационные",
+    "системы",
+    "сети",
+    "безопасность",
+    "проектирование",
+    "алгоритмы",
+    "теория",
+    "вероятностей",
+    "физика",
+    "экономика",
+    "управление",
+    "машинное",
+    "обучение",
+    "практика",
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmarks ?search= on disciplines at growing row counts (database changes are rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rows", type=int, nargs="+", default=[1000, 10000, 50000], help="Row counts to measure at"
+        )
+        parser.add_argument("--repeat", type=int, default=5, help="Runs per query")
+        parser.add_argument(
+            "--query",
+            action="append",
+            dest="queries",
+            help="Search string (can be repeated)",
+        )
+        parser.add_argument("--seed", type=int, default=42)
+
+    def handle(self, *args, **options):
+        queries = options["queries"] or ["программирования", "базы данных", "семестр 3 анализ"]
+        self.stdout.write(f"Database: {connection.vendor}")
+        self.rnd = random.Random(options["seed"])
+
+        try:
+            with transaction.atomic():
+                self.setup_catalog()
+                for rows in sorted(options["rows"]):
+                    self.grow_to(rows)
+                    self.stdout.write(f"\n{ProgramDiscipline.objects.count()} program disciplines")
+                    for query in queries:
+                        legacy = self.measure(filters.SearchFilter(), LegacyView(), query, options["repeat"])
+                        ranked = self.measure(RankedSearchFilter(), DisciplineViewSet(), query, options["repeat"])
+                        self.stdout.write(
+                            f"  {query!r:<24} icontains {legacy[0] * 1000:8.1f} ms ({legacy[1]:>6} hits)   "
+                            f"search_document {ranked[0] * 1000:8.1f} ms ({ranked[1]:>6} hits)"
+                        )
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def measure(self, backend, view, query, repeat):
+        """Best time of count() plus the first page, as the paginated list endpoint does"""
+        request = Request(APIRequestFactory().get("/", {"search": query}))
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = backend.filter_queryset(request, DisciplineViewSet.queryset.all(), view)
+            count = queryset.count()
+            list(queryset[:20])
+            timings.append(time.perf_counter() - started)
+        return min(timings), count
+
+    def setup_catalog(self):
+        rnd = self.rnd
+        names = {" ".join(rnd.sample(WORDS, rnd.randint(2, 4))).capitalize() for _ in range(3000)}
+        self.disciplines = Discipline.objects.bulk_create([Discipline(name=f"{name} (бенчмарк)") for name in names])
+        self.semesters = [Semester.objects.get_or_create(name=f"Семестр {number}")[0] for number in range(1, 9)]
+        self.headers = dict(
+            education_type=EducationType.objects.create(name="benchmark"),
+            education_level=EducationLevel.objects.create(name="benchmark"),
+            direction=Direction.objects.create(code="00.00.00", name="benchmark"),
+            qualification=Qualification.objects.create(name="benchmark"),
+            faculty=Faculty.objects.create(name="benchmark"),
+        )
+        self.program_number = 0
+
+    def grow_to(self, rows, per_program=600):
+        """Add synthetic programs of per_program disciplines until the table has at least rows rows"""
+        while ProgramDiscipline.objects.count() < rows:
+            self.program_number += 1
+            profile = f"Бенчмарк {self.program_number}"
+            program = EducationalProgram.objects.create(profile=profile, year=2000, **self.headers)
+            objects = []
+            for discipline in self.rnd.sample(self.disciplines, per_program):
+                semester = self.rnd.choice(self.semesters)
+                code = f"Б1.О.{self.rnd.randint(1, 60):02d}"
+                objects.append(
+                    ProgramDiscipline(
+                        program=program,
+                        discipline=discipline,
+                        semester=semester,
+                        code=code,
+                        search_document=discipline_search_document(discipline.name, code, profile, semester.name),
+                    )
+                )
+            ProgramDiscipline.objects.bulk_create(objects)
@@ -0,0 +1,87 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Prefetch
+from rest_framework.renderers import JSONRenderer
+from programs.models import EducationalProgram, ProgramDiscipline
+from programs.serializers import EducationalProgramSerializer, ProgramDisciplineRows, ProgramDisciplineSerializer
+
+
+class LegacyProgramSerializer(EducationalProgramSerializer):
+    """Program detail as it was serialized before ProgramDisciplineRows: nested model serializer"""
+
+    disciplines = ProgramDisciplineSerializer(many=True, read_only=True)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares program detail and /disciplines/ serialization through model serializers and "
+        "through values_list rows, checks the JSON is identical"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--program", type=int, help="Program id (default: the one with most disciplines)")
+        parser.add_argument("--repeat", type=int, default=10, help="Runs per variant")
+
+    def handle(self, *args, **options):
+        program_id = options["program"]
+        if program_id is None:
+            program_id = (
+                EducationalProgram.objects.annotate(rows=Count("disciplines"))
+                .order_by("-rows")
+                .values_list("pk", flat=True)
+                .first()
+            )
+        if program_id is None:
+            raise CommandError("No programs in the database, import some first")
+
+        base = EducationalProgram.objects.select_related(
+            "education_type", "education_level", "direction", "qualification", "standard_type", "faculty"
+        )
+
+        def legacy_detail():
+            program = base.prefetch_related(
+                Prefetch(
+                    "disciplines",
+                    queryset=ProgramDiscipline.objects.select_related(
+                        "discipline", "semester", "block", "part", "module", "load_type"
+                    ).order_by(*EducationalProgramSerializer.DISCIPLINE_ORDERING),
+                )
+            ).get(pk=program_id)
+            return JSONRenderer().render(LegacyProgramSerializer(program).data)
+
+        def fast_detail():
+            return JSONRenderer().render(EducationalProgramSerializer(base.get(pk=program_id)).data)
+
+        def legacy_disciplines():
+            disciplines = ProgramDiscipline.objects.filter(program_id=program_id).select_related(
+                "semester", "block", "part", "module", "load_type", "discipline"
+            )
+            return JSONRenderer().render(ProgramDisciplineSerializer(disciplines, many=True).data)
+
+        def fast_disciplines():
+            disciplines = ProgramDiscipline.objects.filter(program_id=program_id)
+            return JSONRenderer().render(ProgramDisciplineRows.serialize(disciplines))
+
+        rows = ProgramDiscipline.objects.filter(program_id=program_id).count()
+        self.stdout.write(f"Program {program_id}: {rows} disciplines")
+        for label, legacy, fast in (
+            ("detail", legacy_detail, fast_detail),
+            ("disciplines", legacy_disciplines, fast_disciplines),
+        ):
+            if legacy() != fast():
+                raise CommandError(f"{label}: serialized output differs")
+            legacy_time = self.measure(legacy, options["repeat"])
+            fast_time = self.measure(fast, options["repeat"])
+            self.stdout.write(
+                f"  {label:<12} serializer {legacy_time * 1000:8.1f} ms   "
+                f"values_list {fast_time * 1000:8.1f} ms   x{legacy_time / fast_time:.1f}"
+            )
+
+    @staticmethod
+    def measure(function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - started)
+        return min(timings)
@@ -0,0 +1,78 @@
+import os
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from programs.export import ProgramExport
+from programs.filters import ProgramFilter
+from programs.models import EducationalProgram
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports programs with their disciplines as NDJSON, CSV or xlsx, reading them through "
+        "server-side cursors in constant memory; the filters are those of /api/programs/"
+    )
+
+    # Option -> ProgramFilter parameter
+    FILTERS = {
+        "year": "year",
+        "year_gte": "year__gte",
+        "year_lte": "year__lte",
+        "education_level": "education_level",
+        "faculty": "faculty",
+        "direction": "direction",
+        "profile": "profile",
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument("--file", help="Output file (default: stdout, not for xlsx)")
+        parser.add_argument(
+            "--output", choices=ProgramExport.FORMATS, help="Format (default: from the file extension, else ndjson)"
+        )
+        parser.add_argument("--after", type=int, help="Resume after this program id (printed by an earlier run)")
+        parser.add_argument("--chunk-size", type=int, default=ProgramExport.CHUNK_SIZE, help="Rows per cursor fetch")
+        parser.add_argument("--year", type=int)
+        parser.add_argument("--year-gte", type=int)
+        parser.add_argument("--year-lte", type=int)
+        parser.add_argument("--education-level")
+        parser.add_argument("--faculty")
+        parser.add_argument("--direction")
+        parser.add_argument("--profile")
+
+    def handle(self, *args, **options):
+        path = options["file"]
+        output = options["output"]
+        if output is None:
+            extension = os.path.splitext(path)[1].lstrip(".").lower() if path else ""
+            output = extension if extension in ProgramExport.FORMATS else "ndjson"
+        if output == "xlsx" and not path:
+            raise CommandError("xlsx needs --file")
+
+        data = QueryDict(mutable=True)
+        for option, name in self.FILTERS.items():
+            if options[option] is not None:
+                data[name] = options[option]
+        filterset = ProgramFilter(data, queryset=EducationalProgram.objects.all())
+        if not filterset.is_valid():
+            raise CommandError(filterset.errors.as_text())
+
+        export = ProgramExport(filterset.qs, after=options["after"], chunk_size=options["chunk_size"])
+        try:
+            if output == "xlsx":
+                export.xlsx(path)
+            elif path:
+                with open(path, "wb") as file:
+                    for chunk in getattr(export, output)():
+                        file.write(chunk)
+            else:
+                for chunk in getattr(export, output)():
+                    self.stdout.write(chunk.decode(), ending="")
+        finally:
+            # stderr: stdout may be the export itself
+            if export.position is not None:
+                self.stderr.write(
+                    f"{export.count} programs exported, last program id {export.position} "
+                    f"(--after {export.position} continues from there)",
+                    style_func=self.style.SUCCESS,
+                )
+            else:
+                self.stderr.write("No programs exported")
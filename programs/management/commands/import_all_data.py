@@ -1,16 +1,50 @@
 import os
-import re
+import time
+from concurrent.futures import ProcessPoolExecutor
 from django.core.management.base import BaseCommand
-from programs.services import ExcelParser, ProgramImporter
+from django.db import connections
+from programs.caching import deferred_invalidation
+from programs.services import ExcelParser, ProgramImporter, ImportTracker, year_from_path, is_ignored_path, is_workbook_name
+
+
+def parse_workbook(file_path):
+    """
+    Worker entry point: parse one workbook without touching the database.
+    Returns (payload, seconds, error) so a broken file doesn't abort the whole pool.
+    """
+    started = time.perf_counter()
+    try:
+        return ExcelParser().read_workbook(file_path), time.perf_counter() - started, None
+    except Exception as e:
+        return None, None, str(e)
+
 
 class Command(BaseCommand):
     help = 'Import all data from data/ directory'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Number of processes used to parse workbooks (database writes stay in this process)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-import every workbook, even if it is unchanged since the last import',
+        )
+        parser.add_argument(
+            '--sync',
+            action='store_true',
+            help='Make each program mirror its workbook: update changed disciplines and delete removed ones',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write("Starting import...")
         base_dir = os.path.join(os.getcwd(), 'data')
         self.stdout.write(f"Base dir: {base_dir}")
-        
+
         if not os.path.exists(base_dir):
             self.stdout.write(self.style.ERROR(f"Directory {base_dir} does not exist."))
             return
@@ -18,46 +52,120 @@ class Command(BaseCommand):
         parser = ExcelParser()
         importer = ProgramImporter(parser)
 
-        # Regex to match year folders like Fit_2023, Fit_2024
-        year_folder_pattern = re.compile(r'Fit_(\d{4})')
+        tracker = ImportTracker(force=options['force'])
+        files = []
+        statuses = {}
+        for file_path, year in self.collect_files(base_dir):
+            status, fingerprint = tracker.check(file_path)
+            statuses[file_path] = status
+            if status == ImportTracker.STATUS_UNCHANGED:
+                self.stdout.write(f"  Skipping {file_path} (unchanged)")
+            else:
+                files.append((file_path, year, fingerprint))
+
+        workers = max(1, options['workers'])
+        sync = options['sync']
+
+        if workers > 1:
+            results = self.import_parallel(importer, files, workers, sync)
+        else:
+            results = self.import_sequential(importer, files, sync)
 
         count_success = 0
         count_fail = 0
 
-        for root, dirs, files in os.walk(base_dir):
+        # results imports lazily; cached API responses are invalidated once, after the last file
+        with deferred_invalidation():
+            for file_path, year, fingerprint, program, created, error, counts in results:
+                if error:
+                    self.stdout.write(self.style.ERROR(f"Error importing {file_path}: {error}"))
+                    count_fail += 1
+                else:
+                    tracker.record(file_path, fingerprint, program, year)
+                    action = "Created" if created else "Updated"
+                    self.stdout.write(self.style.SUCCESS(
+                        f"{action}: {program} <- {file_path} "
+                        f"(+{counts['inserted']} ~{counts['updated']} -{counts['deleted']})"
+                    ))
+                    self.stdout.write(f"    {importer.profiler.summary()}")
+                    count_success += 1
+
+        self.stdout.write(self.style.SUCCESS(f"\nImport finished. Success: {count_success}, Failed: {count_fail}"))
+        self.write_report(statuses)
+
+    def write_report(self, statuses):
+        counts = {
+            ImportTracker.STATUS_NEW: 0,
+            ImportTracker.STATUS_CHANGED: 0,
+            ImportTracker.STATUS_UNCHANGED: 0,
+        }
+        for status in statuses.values():
+            counts[status] += 1
+        self.stdout.write(
+            f"Files: {counts[ImportTracker.STATUS_NEW]} new, "
+            f"{counts[ImportTracker.STATUS_CHANGED]} changed, "
+            f"{counts[ImportTracker.STATUS_UNCHANGED]} skipped (unchanged)"
+        )
+
+    def collect_files(self, base_dir):
+        """Walk base_dir in sorted order and return [(file_path, year)] for every workbook"""
+        files = []
+
+        for root, dirs, filenames in os.walk(base_dir):
             self.stdout.write(f"Visiting {root}")
             # Skip _OLD directories and any hidden directories
-            if '_OLD' in root or '.git' in root or '.DS_Store' in root:
+            if is_ignored_path(root):
                 self.stdout.write(f"Skipping {root} (filtered)")
                 continue
-            
+
             # Remove _OLD from dirs so we don't traverse into them
             if '_OLD' in dirs:
                 dirs.remove('_OLD')
-                
+            # Sorted traversal keeps the import order (and the summary) deterministic
+            dirs.sort()
+
             # Try to determine year from path
-            match = year_folder_pattern.search(root)
-            year = int(match.group(1)) if match else None
+            year = year_from_path(root)
             self.stdout.write(f"  Year detected: {year}")
-            
-            for file in files:
-                self.stdout.write(f"  Checking file: {file}")
-                if (file.endswith('.xlsx') or file.endswith('.xls')) and not file.startswith('~'):
-                    
-                    file_path = os.path.join(root, file)
-                    self.stdout.write(f"  Processing {file_path} (Year: {year})...")
-                    
-                    try:
-                        program, created, error = importer.import_from_file(file_path, year=year)
-                        if error:
-                            self.stdout.write(self.style.ERROR(f"Error importing {file}: {error}"))
-                            count_fail += 1
-                        else:
-                            action = "Created" if created else "Updated"
-                            self.stdout.write(self.style.SUCCESS(f"{action}: {program}"))
-                            count_success += 1
-                    except Exception as e:
-                        self.stdout.write(self.style.ERROR(f"Exception importing {file}: {e}"))
-                        count_fail += 1
 
-        self.stdout.write(self.style.SUCCESS(f"\nImport finished. Success: {count_success}, Failed: {count_fail}"))
+            for file in sorted(filenames):
+                if is_workbook_name(file):
+                    files.append((os.path.join(root, file), year))
+
+        return files
+
+    def import_sequential(self, importer, files, sync):
+        for file_path, year, fingerprint in files:
+            self.stdout.write(f"  Processing {file_path} (Year: {year})...")
+            try:
+                program, created, error, counts = importer.import_from_file(file_path, year=year, sync=sync)
+                yield file_path, year, fingerprint, program, created, error, counts
+            except Exception as e:
+                yield file_path, year, fingerprint, None, False, str(e), None
+
+    def import_parallel(self, importer, files, workers, sync):
+        """
+        Parse workbooks in a process pool and write them from this process in file order.
+        A single ordered writer keeps the result identical to a sequential run, including
+        when several files map to the same (direction, profile, year) program.
+        """
+        # Forked workers must not inherit open database sockets
+        connections.close_all()
+
+        paths = [file_path for file_path, _, _ in files]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            parsed = executor.map(parse_workbook, paths)
+            for (file_path, year, fingerprint), (payload, read_time, error) in zip(files, parsed):
+                if error:
+                    yield file_path, year, fingerprint, None, False, error, None
+                    continue
+
+                self.stdout.write(f"  Writing {file_path} (Year: {year})...")
+                program_data, discipline_rows = payload
+                try:
+                    program, created, error, counts = importer.import_parsed(
+                        program_data, discipline_rows, year=year, sync=sync, source=file_path, read_time=read_time
+                    )
+                    yield file_path, year, fingerprint, program, created, error, counts
+                except Exception as e:
+                    yield file_path, year, fingerprint, None, False, str(e), None
@@ -0,0 +1,65 @@
+import math
+from django.core.management.base import BaseCommand
+from programs.models import ImportRun
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return None
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+class Command(BaseCommand):
+    help = "Prints per-stage timing percentiles of recent imports (ImportRun rows)"
+
+    PERCENTILES = (0.5, 0.9, 0.99)
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=100, help="Number of most recent runs to analyze")
+        parser.add_argument("--failed", action="store_true", help="Include failed runs")
+
+    def handle(self, *args, **options):
+        runs = ImportRun.objects.order_by("-created_at")
+        if not options["failed"]:
+            runs = runs.filter(succeeded=True)
+        runs = list(runs[: options["limit"]])
+
+        if not runs:
+            self.stdout.write(self.style.WARNING("No import runs recorded yet."))
+            return
+
+        self.stdout.write(f"{len(runs)} runs, {runs[-1].created_at:%Y-%m-%d %H:%M} - {runs[0].created_at:%Y-%m-%d %H:%M}")
+
+        # Stages in the order they were executed by the latest run that has them
+        stage_names = []
+        for run in runs:
+            for name in run.stages:
+                if name not in stage_names:
+                    stage_names.append(name)
+
+        header = f"{'stage':<12}" + "".join(f"{f'p{round(p * 100)}':>10}" for p in self.PERCENTILES)
+        header += f"{'max':>10}{'queries p50':>13}"
+        self.stdout.write(header)
+
+        rows = [(name, [run.stages[name] for run in runs if name in run.stages]) for name in stage_names]
+        rows.append(("total", [{"time": run.total_time, "queries": run.queries} for run in runs]))
+        for name, stages in rows:
+            times = sorted(stage["time"] for stage in stages)
+            queries = sorted(stage["queries"] for stage in stages)
+            line = f"{name:<12}" + "".join(f"{percentile(times, p):>9.3f}s" for p in self.PERCENTILES)
+            line += f"{times[-1]:>9.3f}s{percentile(queries, 0.5):>13}"
+            self.stdout.write(line)
+
+        row_counts = sorted(run.rows for run in runs)
+        self.stdout.write(f"Rows per file: p50 {percentile(row_counts, 0.5)}, max {row_counts[-1]}")
+
+        memory = sorted(run.peak_memory for run in runs if run.peak_memory is not None)
+        if memory:
+            self.stdout.write(
+                f"Peak memory: p50 {percentile(memory, 0.5) / (1024 * 1024):.1f} MiB, "
+                f"max {memory[-1] / (1024 * 1024):.1f} MiB"
+            )
+        else:
+            self.stdout.write("Peak memory: not traced (set IMPORT_TRACE_MEMORY=1)")
@@ -1,12 +1,24 @@
 import os
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from programs.services import ExcelParser, ProgramImporter
+from programs.services import ExcelParser, ProgramImporter, ImportTracker
 
 
 class Command(BaseCommand):
     help = "Parses Excel files from the data directory and populates the database"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Re-import every workbook, even if it is unchanged since the last import",
+        )
+        parser.add_argument(
+            "--sync",
+            action="store_true",
+            help="Make each program mirror its workbook: update changed disciplines and delete removed ones",
+        )
+
     def handle(self, *args, **options):
         data_dir = os.path.join(settings.BASE_DIR, "data")
 
@@ -16,15 +28,35 @@ class Command(BaseCommand):
 
         parser = ExcelParser()
         importer = ProgramImporter(parser)
+        tracker = ImportTracker(force=options["force"])
+        self.report = {
+            ImportTracker.STATUS_NEW: [],
+            ImportTracker.STATUS_CHANGED: [],
+            ImportTracker.STATUS_UNCHANGED: [],
+        }
 
         for root, dirs, files in os.walk(data_dir):
             for file in files:
                 if file.endswith(".xlsx") and not file.startswith("~$"):
                     file_path = os.path.join(root, file)
-                    self.process_file(importer, file_path, root)
+                    self.process_file(importer, tracker, file_path, root, options["sync"])
+
+        for status, label in (
+            (ImportTracker.STATUS_NEW, "New"),
+            (ImportTracker.STATUS_CHANGED, "Changed"),
+            (ImportTracker.STATUS_UNCHANGED, "Skipped (unchanged)"),
+        ):
+            self.stdout.write(f"{label}: {len(self.report[status])}")
+            for file_path in self.report[status]:
+                self.stdout.write(f"  {file_path}")
 
-    def process_file(self, importer, file_path, root):
+    def process_file(self, importer, tracker, file_path, root, sync=False):
         try:
+            status, fingerprint = tracker.check(file_path)
+            self.report[status].append(file_path)
+            if status == ImportTracker.STATUS_UNCHANGED:
+                return
+
             # Extract year from folder name (e.g., Fit_2023 -> 2023)
             folder_name = os.path.basename(root)
             year = None
@@ -34,14 +66,21 @@ class Command(BaseCommand):
                 except (IndexError, ValueError):
                     pass
 
-            program, created, error = importer.import_from_file(file_path, year)
+            program, created, error, counts = importer.import_from_file(file_path, year, sync=sync)
 
             if error:
                 self.stdout.write(self.style.WARNING(f"Skipping {file_path}: {error}"))
                 return
 
+            tracker.record(file_path, fingerprint, program, year)
             action = "Created" if created else "Updated"
-            self.stdout.write(self.style.SUCCESS(f"{action} program: {program}"))
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{action} program: {program} "
+                    f"(inserted {counts['inserted']}, updated {counts['updated']}, deleted {counts['deleted']})"
+                )
+            )
+            self.stdout.write(f"  {importer.profiler.summary()}")
 
         except Exception as e:
             self.stdout.write(self.style.ERROR(f"Error processing {file_path}: {e}"))
@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from programs.workbook_cache import ParsedWorkbookCache
+
+
+class Command(BaseCommand):
+    help = "Evicts least recently used entries from the parsed-workbook cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-bytes",
+            type=int,
+            default=None,
+            help="Size to shrink the cache to (defaults to PARSED_WORKBOOK_CACHE_MAX_BYTES)",
+        )
+        parser.add_argument("--clear", action="store_true", help="Remove every entry")
+
+    def handle(self, *args, **options):
+        cache = ParsedWorkbookCache.from_settings()
+        if cache is None:
+            self.stdout.write(self.style.WARNING("PARSED_WORKBOOK_CACHE_DIR is not set, nothing to prune."))
+            return
+
+        if options["clear"]:
+            max_bytes = 0
+        elif options["max_bytes"] is not None:
+            max_bytes = options["max_bytes"]
+        else:
+            max_bytes = settings.PARSED_WORKBOOK_CACHE_MAX_BYTES
+
+        removed_files, removed_bytes = cache.prune(max_bytes)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Removed {removed_files} entries ({removed_bytes} bytes). "
+                f"Cache size: {cache.total_size()} bytes in {cache.directory}"
+            )
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from programs.models import EducationalProgram, ProgramDiscipline
+from programs.search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = "Recomputes the search_document columns used by ?search= (e.g. after changes made with update() or raw SQL)"
+
+    def handle(self, *args, **options):
+        programs = rebuild_search_documents(EducationalProgram, ProgramDiscipline)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search documents of {programs} programs and their disciplines"))
@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from programs.analysis import ProgramTotals
+
+
+class Command(BaseCommand):
+    help = "Recomputes ProgramSummary rows (totals shown in program listings)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--program",
+            type=int,
+            nargs="+",
+            dest="programs",
+            help="IDs of the programs to rebuild (default: all programs)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = ProgramTotals().refresh_summaries(options["programs"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt {written} program summaries in {time.perf_counter() - started:.2f}s")
+        )
@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from programs.models import (
     EducationalProgram,
     ProgramDiscipline,
@@ -15,7 +16,8 @@ from programs.models import (
     DisciplineModule,
     LoadType,
     DisciplineMarking,
-    SemesterControl
+    SemesterControl,
+    ImportManifest,
 )
 
 class Command(BaseCommand):
@@ -24,24 +26,27 @@ class Command(BaseCommand):
     def handle(self, *args, **options):
         self.stdout.write(self.style.WARNING('Deleting all data...'))
         
-        # Delete dependent models first
-        DisciplineMarking.objects.all().delete()
-        SemesterControl.objects.all().delete()
-        ProgramDiscipline.objects.all().delete()
-        Discipline.objects.all().delete()
-        EducationalProgram.objects.all().delete()
-        
-        # Delete dictionaries
-        Faculty.objects.all().delete()
-        Direction.objects.all().delete()
-        EducationLevel.objects.all().delete()
-        EducationType.objects.all().delete()
-        Qualification.objects.all().delete()
-        StandardType.objects.all().delete()
-        Semester.objects.all().delete()
-        DisciplineBlock.objects.all().delete()
-        DisciplinePart.objects.all().delete()
-        DisciplineModule.objects.all().delete()
-        LoadType.objects.all().delete()
+        # One transaction: the cache versions are bumped once, after the commit
+        with transaction.atomic():
+            # Delete dependent models first
+            ImportManifest.objects.all().delete()
+            DisciplineMarking.objects.all().delete()
+            SemesterControl.objects.all().delete()
+            ProgramDiscipline.objects.all().delete()
+            Discipline.objects.all().delete()
+            EducationalProgram.objects.all().delete()
+
+            # Delete dictionaries
+            Faculty.objects.all().delete()
+            Direction.objects.all().delete()
+            EducationLevel.objects.all().delete()
+            EducationType.objects.all().delete()
+            Qualification.objects.all().delete()
+            StandardType.objects.all().delete()
+            Semester.objects.all().delete()
+            DisciplineBlock.objects.all().delete()
+            DisciplinePart.objects.all().delete()
+            DisciplineModule.objects.all().delete()
+            LoadType.objects.all().delete()
 
         self.stdout.write(self.style.SUCCESS('Successfully deleted all data.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from programs.caching import response_cache_stats
+
+
+class Command(BaseCommand):
+    help = "Shows the shared hit / miss / rebuild counters of the API response cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them")
+
+    def handle(self, *args, **options):
+        stats = response_cache_stats(reset=options["reset"])
+        served = sum(stats.values())
+        # hit, stale and wait answers came from the cache without rendering
+        cached = stats["hit"] + stats["stale"] + stats["wait"]
+        for outcome, count in stats.items():
+            self.stdout.write(f"{outcome:<8} {count:>10}")
+        if served:
+            self.stdout.write(f"Served from cache: {cached / served:.1%} of {served} requests")
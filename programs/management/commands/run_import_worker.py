@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from programs.services import ImportQueue
+
+
+class Command(BaseCommand):
+    help = "Processes uploaded workbooks queued as ImportJob rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Seconds to wait before checking an empty queue again",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Process the jobs that are pending now and exit",
+        )
+
+    def handle(self, *args, **options):
+        # One queue for the lifetime of the worker; its lookup registry is reset per job
+        queue = ImportQueue()
+        self.stdout.write("Import worker started")
+
+        while True:
+            close_old_connections()
+            job = queue.claim_next()
+            if job is None:
+                if options["once"]:
+                    break
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Processing job {job.pk} ({job.original_name})...")
+            job = queue.process(job)
+            if job.error:
+                self.stdout.write(self.style.ERROR(f"Job {job.pk} failed: {job.error}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Job {job.pk} imported {job.program}"))
+            self.stdout.write(f"  {queue.importer.profiler.summary()}")
+
+        self.stdout.write("Import worker stopped")
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-17 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0003_remove_discipline_amount_remove_discipline_block_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportManifest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(max_length=1024, unique=True, verbose_name='Путь к файлу')),
+                ('size', models.BigIntegerField(verbose_name='Размер файла')),
+                ('mtime_ns', models.BigIntegerField(blank=True, null=True, verbose_name='Время изменения (нс)')),
+                ('content_hash', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256 содержимого')),
+                ('year', models.IntegerField(blank=True, null=True, verbose_name='Год набора')),
+                ('imported_at', models.DateTimeField(auto_now=True, verbose_name='Дата импорта')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='manifests', to='programs.educationalprogram', verbose_name='Программа')),
+            ],
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 18:52
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_program_disciplines(apps, schema_editor):
+    """Keep the oldest row of every (program, semester, discipline, code) group"""
+    ProgramDiscipline = apps.get_model("programs", "ProgramDiscipline")
+    duplicates = (
+        ProgramDiscipline.objects.values("program", "semester", "discipline", "code")
+        .annotate(keep_id=Min("id"), total=Count("id"))
+        .filter(total__gt=1)
+    )
+    for group in duplicates:
+        ProgramDiscipline.objects.filter(
+            program=group["program"],
+            semester=group["semester"],
+            discipline=group["discipline"],
+            code=group["code"],
+        ).exclude(id=group["keep_id"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0004_import_manifest'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_program_disciplines, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='programdiscipline',
+            constraint=models.UniqueConstraint(fields=('program', 'semester', 'discipline', 'code'), name='unique_program_discipline'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-17 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0005_programdiscipline_natural_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('state', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('succeeded', 'Выполнено'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=20, verbose_name='Состояние')),
+                ('file_path', models.CharField(max_length=1024, verbose_name='Путь к файлу')),
+                ('original_name', models.CharField(blank=True, max_length=255, verbose_name='Имя файла')),
+                ('content_hash', models.CharField(blank=True, max_length=64, verbose_name='SHA-256 содержимого')),
+                ('year', models.IntegerField(blank=True, null=True, verbose_name='Год набора')),
+                ('sync', models.BooleanField(default=False, verbose_name='Синхронизация')),
+                ('created', models.BooleanField(default=False, verbose_name='Программа создана')),
+                ('counts', models.JSONField(blank=True, null=True, verbose_name='Изменения дисциплин')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начало обработки')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Окончание обработки')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_jobs', to='programs.educationalprogram', verbose_name='Программа')),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-17 18:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0007_import_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(blank=True, max_length=1024, verbose_name='Источник')),
+                ('year', models.IntegerField(blank=True, null=True, verbose_name='Год набора')),
+                ('succeeded', models.BooleanField(default=True, verbose_name='Успешно')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('rows', models.IntegerField(default=0, verbose_name='Строк дисциплин')),
+                ('total_time', models.FloatField(verbose_name='Время, с')),
+                ('queries', models.IntegerField(default=0, verbose_name='Запросов к БД')),
+                ('peak_memory', models.BigIntegerField(blank=True, null=True, verbose_name='Пик памяти, байт')),
+                ('stages', models.JSONField(default=dict, verbose_name='Этапы')),
+                ('counts', models.JSONField(blank=True, null=True, verbose_name='Изменения дисциплин')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Дата')),
+                ('program', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='import_runs', to='programs.educationalprogram', verbose_name='Программа')),
+            ],
+            options={
+                'verbose_name': 'Запуск импорта',
+                'verbose_name_plural': 'Запуски импорта',
+            },
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='run',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job', to='programs.importrun', verbose_name='Статистика импорта'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-17 19:01
+
+from django.db import migrations, models
+from programs.numbers import parse_decimal
+
+
+def backfill_numeric_values(apps, schema_editor):
+    """One UPDATE per distinct text value: there are far fewer of those than rows"""
+    ProgramDiscipline = apps.get_model("programs", "ProgramDiscipline")
+    for text_field, value_field in (("amount", "amount_value"), ("zet", "zet_value")):
+        values = ProgramDiscipline.objects.exclude(**{f"{text_field}__isnull": True}).values_list(text_field, flat=True)
+        for text in values.distinct().order_by():
+            number = parse_decimal(text)
+            if number is not None:
+                ProgramDiscipline.objects.filter(**{text_field: text}).update(**{value_field: number})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0008_import_run'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='programdiscipline',
+            name='amount_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='Количество (число)'),
+        ),
+        migrations.AddField(
+            model_name='programdiscipline',
+            name='zet_value',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='ЗЕТ (число)'),
+        ),
+        migrations.RunPython(backfill_numeric_values, migrations.RunPython.noop),
+    ]
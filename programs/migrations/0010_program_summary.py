@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-17 19:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0009_programdiscipline_numeric_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgramSummary',
+            fields=[
+                ('program', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='programs.educationalprogram', verbose_name='Программа')),
+                ('total_zet', models.DecimalField(decimal_places=2, default=0, max_digits=10, verbose_name='Всего ЗЕТ')),
+                ('discipline_count', models.IntegerField(default=0, verbose_name='Количество дисциплин')),
+                ('semester_count', models.IntegerField(default=0, verbose_name='Количество семестров')),
+                ('amount', models.JSONField(default=dict, verbose_name='Количество по единицам измерения')),
+                ('load_types', models.JSONField(default=list, verbose_name='По видам нагрузки')),
+                ('semesters', models.JSONField(default=list, verbose_name='По семестрам')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Сводка программы',
+                'verbose_name_plural': 'Сводки программ',
+            },
+        ),
+    ]
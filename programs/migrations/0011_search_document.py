@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-17 19:05
+
+from django.db import migrations, models
+from programs.search import rebuild_search_documents, search_indexes
+
+INDEXED_MODELS = (("EducationalProgram", "program"), ("ProgramDiscipline", "discipline"))
+
+
+def backfill_search_documents(apps, schema_editor):
+    rebuild_search_documents(apps.get_model("programs", "EducationalProgram"), apps.get_model("programs", "ProgramDiscipline"))
+
+
+def add_postgres_search_indexes(apps, schema_editor):
+    """Trigram and full-text GIN indexes exist on PostgreSQL only, other databases scan the column"""
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for model_name, prefix in INDEXED_MODELS:
+        model = apps.get_model("programs", model_name)
+        for index in search_indexes(prefix):
+            schema_editor.add_index(model, index)
+
+
+def remove_postgres_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for model_name, prefix in INDEXED_MODELS:
+        model = apps.get_model("programs", model_name)
+        for index in search_indexes(prefix):
+            schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0010_program_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='educationalprogram',
+            name='search_document',
+            field=models.TextField(blank=True, default='', verbose_name='Текст для поиска'),
+        ),
+        migrations.AddField(
+            model_name='programdiscipline',
+            name='search_document',
+            field=models.TextField(blank=True, default='', verbose_name='Текст для поиска'),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(add_postgres_search_indexes, remove_postgres_search_indexes),
+    ]
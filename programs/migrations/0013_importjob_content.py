@@ -0,0 +1,23 @@
+# Generated by Django 6.0 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('programs', '0012_timestamps'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='content',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Содержимое файла'),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='file_path',
+            field=models.CharField(blank=True, max_length=1024, verbose_name='Путь к файлу'),
+        ),
+    ]
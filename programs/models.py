@@ -1,4 +1,7 @@
 from django.db import models
+from common.mixins import TimeStampedMixin
+from .numbers import parse_decimal
+from .search import discipline_search_document, program_search_document, rebuild_search_documents
 
 
 class Faculty(models.Model):
@@ -49,7 +52,7 @@ class StandardType(models.Model):
         return self.name
 
 
-class EducationalProgram(models.Model):
+class EducationalProgram(TimeStampedMixin):
     education_type = models.ForeignKey(
         EducationType, on_delete=models.CASCADE, verbose_name="Вид образования"
     )
@@ -72,6 +75,8 @@ class EducationalProgram(models.Model):
     faculty = models.ForeignKey(Faculty, on_delete=models.CASCADE, verbose_name="Факультет")
     profile = models.CharField(max_length=255, verbose_name="Профиль (специализация)", db_index=True)
     year = models.IntegerField(verbose_name="Год набора", null=True, blank=True, db_index=True)
+    # Normalized profile, direction and faculty for ?search=, see programs.search
+    search_document = models.TextField(verbose_name="Текст для поиска", blank=True, default="")
 
     # Type hint for reverse relation
     disciplines: models.Manager["Discipline"]
@@ -79,6 +84,30 @@ class EducationalProgram(models.Model):
     def __str__(self):
         return f"{self.direction.code} - {self.profile} ({self.year})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # The profile is in the search_document of the disciplines too, see save()
+        instance._loaded_profile = instance.__dict__.get("profile")
+        return instance
+
+    def save(self, *args, **kwargs):
+        direction = self.direction if self.direction_id else None
+        self.search_document = program_search_document(
+            self.profile,
+            direction and direction.code,
+            direction and direction.name,
+            self.faculty.name if self.faculty_id else None,
+        )
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "search_document"}
+        super().save(*args, **kwargs)
+        loaded_profile = getattr(self, "_loaded_profile", None)
+        if loaded_profile is not None and loaded_profile != self.profile:
+            rebuild_search_documents(type(self), ProgramDiscipline, programs=None, disciplines=models.Q(program=self))
+        self._loaded_profile = self.profile
+
 
 class Semester(models.Model):
     name = models.CharField(max_length=100, verbose_name="Семестр/Период", unique=True)
@@ -122,7 +151,7 @@ class Discipline(models.Model):
         return self.name
 
 
-class ProgramDiscipline(models.Model):
+class ProgramDiscipline(TimeStampedMixin):
     program = models.ForeignKey(
         EducationalProgram, on_delete=models.CASCADE, related_name="disciplines"
     )
@@ -174,9 +203,44 @@ class ProgramDiscipline(models.Model):
     )
     zet = models.CharField(max_length=50, verbose_name="ЗЕТ", null=True, blank=True)
 
+    # Numeric copies of amount and zet (see programs.numbers.parse_decimal), derived in save()
+    # and on import so totals can be aggregated in the database
+    amount_value = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Количество (число)", null=True, blank=True
+    )
+    zet_value = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="ЗЕТ (число)", null=True, blank=True)
+
+    # Normalized name, code, program profile and semester for ?search=, see programs.search
+    search_document = models.TextField(verbose_name="Текст для поиска", blank=True, default="")
+
+    class Meta:
+        constraints = [
+            # Natural key used by re-imports. Rows with a NULL semester or code are not
+            # covered by the index; ProgramImporter deduplicates those itself.
+            models.UniqueConstraint(
+                fields=["program", "semester", "discipline", "code"],
+                name="unique_program_discipline",
+            ),
+        ]
+
     def __str__(self):
         return f"{self.code} - {self.discipline.name}"
 
+    def save(self, *args, **kwargs):
+        # Imports write rows in bulk and fill these themselves (ProgramImporter._diff_disciplines)
+        self.amount_value = parse_decimal(self.amount)
+        self.zet_value = parse_decimal(self.zet)
+        self.search_document = discipline_search_document(
+            self.discipline.name if self.discipline_id else None,
+            self.code,
+            self.program.profile if self.program_id else None,
+            self.semester.name if self.semester_id else None,
+        )
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "amount_value", "zet_value", "search_document"}
+        super().save(*args, **kwargs)
+
 
 class DisciplineMarking(models.Model):
     discipline = models.ForeignKey(ProgramDiscipline, on_delete=models.CASCADE, related_name="markings")
@@ -195,3 +259,163 @@ class SemesterControl(models.Model):
 
     def __str__(self):
         return f"{self.control_type} ({self.semester})"
+
+
+class ProgramSummary(models.Model):
+    """
+    Precomputed totals of a program for listings, kept up to date by ProgramImporter
+    and rebuilt with `manage.py rebuild_summaries`. See programs.analysis.ProgramTotals.
+    """
+
+    program = models.OneToOneField(
+        EducationalProgram,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name="Программа",
+        related_name="summary",
+    )
+    total_zet = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Всего ЗЕТ")
+    discipline_count = models.IntegerField(default=0, verbose_name="Количество дисциплин")
+    semester_count = models.IntegerField(default=0, verbose_name="Количество семестров")
+    # {unit: amount}, e.g. {"Часы": 8640.0}
+    amount = models.JSONField(default=dict, verbose_name="Количество по единицам измерения")
+    # [{"load_type": name, "zet": n, "disciplines": n, "amount": {unit: n}}]
+    load_types = models.JSONField(default=list, verbose_name="По видам нагрузки")
+    # [{"semester": name, "zet": n, "disciplines": n, "amount": {unit: n}}]
+    semesters = models.JSONField(default=list, verbose_name="По семестрам")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Сводка программы"
+        verbose_name_plural = "Сводки программ"
+
+    def __str__(self):
+        return f"Summary of {self.program_id}"
+
+
+class ImportManifest(models.Model):
+    """Fingerprint of the last imported version of a workbook"""
+
+    path = models.CharField(max_length=1024, verbose_name="Путь к файлу", unique=True)
+    size = models.BigIntegerField(verbose_name="Размер файла")
+    mtime_ns = models.BigIntegerField(verbose_name="Время изменения (нс)", null=True, blank=True)
+    content_hash = models.CharField(max_length=64, verbose_name="SHA-256 содержимого", db_index=True)
+    year = models.IntegerField(verbose_name="Год набора", null=True, blank=True)
+    program = models.ForeignKey(
+        EducationalProgram,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Программа",
+        related_name="manifests",
+    )
+    imported_at = models.DateTimeField(auto_now=True, verbose_name="Дата импорта")
+
+    def __str__(self):
+        return self.path
+
+
+class ImportRun(models.Model):
+    """Timings of one ProgramImporter run, see programs.profiling.ImportProfiler"""
+
+    source = models.CharField(max_length=1024, verbose_name="Источник", blank=True)
+    year = models.IntegerField(verbose_name="Год набора", null=True, blank=True)
+    program = models.ForeignKey(
+        EducationalProgram,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Программа",
+        related_name="import_runs",
+    )
+    succeeded = models.BooleanField(default=True, verbose_name="Успешно")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    rows = models.IntegerField(default=0, verbose_name="Строк дисциплин")
+    total_time = models.FloatField(verbose_name="Время, с")
+    queries = models.IntegerField(default=0, verbose_name="Запросов к БД")
+    peak_memory = models.BigIntegerField(null=True, blank=True, verbose_name="Пик памяти, байт")
+    # {stage: {"time": seconds, "queries": n, "rows": n}}
+    stages = models.JSONField(default=dict, verbose_name="Этапы")
+    counts = models.JSONField(null=True, blank=True, verbose_name="Изменения дисциплин")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата", db_index=True)
+
+    class Meta:
+        verbose_name = "Запуск импорта"
+        verbose_name_plural = "Запуски импорта"
+
+    def __str__(self):
+        return f"Import run {self.pk} ({self.total_time:.2f}s)"
+
+
+class ImportBatch(models.Model):
+    """Archive of workbooks uploaded at once; each workbook becomes an ImportJob"""
+
+    original_name = models.CharField(max_length=255, verbose_name="Имя архива", blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+
+    # Type hint for reverse relation
+    jobs: models.Manager["ImportJob"]
+
+    def __str__(self):
+        return f"Import batch {self.pk} ({self.original_name})"
+
+
+class ImportJob(models.Model):
+    """Uploaded workbook waiting for (or processed by) run_import_worker"""
+
+    STATE_PENDING = "pending"
+    STATE_RUNNING = "running"
+    STATE_SUCCEEDED = "succeeded"
+    STATE_FAILED = "failed"
+    STATE_CHOICES = (
+        (STATE_PENDING, "В очереди"),
+        (STATE_RUNNING, "Выполняется"),
+        (STATE_SUCCEEDED, "Выполнено"),
+        (STATE_FAILED, "Ошибка"),
+    )
+
+    state = models.CharField(
+        max_length=20, choices=STATE_CHOICES, default=STATE_PENDING, verbose_name="Состояние", db_index=True
+    )
+    batch = models.ForeignKey(
+        ImportBatch,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        verbose_name="Пакет",
+        related_name="jobs",
+    )
+    # Jobs queued before uploads were kept in the database still point to a file on disk
+    file_path = models.CharField(max_length=1024, verbose_name="Путь к файлу", blank=True)
+    # The uploaded workbook: the web and worker processes do not share a filesystem.
+    # Cleared once the job succeeded, kept for failed jobs to be able to inspect them.
+    content = models.BinaryField(null=True, blank=True, verbose_name="Содержимое файла")
+    original_name = models.CharField(max_length=255, verbose_name="Имя файла", blank=True)
+    content_hash = models.CharField(max_length=64, verbose_name="SHA-256 содержимого", blank=True)
+    year = models.IntegerField(verbose_name="Год набора", null=True, blank=True)
+    sync = models.BooleanField(default=False, verbose_name="Синхронизация")
+    program = models.ForeignKey(
+        EducationalProgram,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Программа",
+        related_name="import_jobs",
+    )
+    created = models.BooleanField(default=False, verbose_name="Программа создана")
+    counts = models.JSONField(null=True, blank=True, verbose_name="Изменения дисциплин")
+    error = models.TextField(blank=True, verbose_name="Ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало обработки")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание обработки")
+    run = models.OneToOneField(
+        ImportRun,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name="Статистика импорта",
+        related_name="job",
+    )
+
+    def __str__(self):
+        return f"Import job {self.pk} ({self.state})"
@@ -0,0 +1,24 @@
+from decimal import Decimal, InvalidOperation
+
+# Matches the DecimalField(max_digits=10, decimal_places=2) columns of ProgramDiscipline
+DECIMAL_PLACES = Decimal("0.01")
+DECIMAL_LIMIT = Decimal(10) ** 8
+
+
+def parse_decimal(value):
+    """
+    Numeric value of a workbook cell stored as text ("2", "3,5", "108.0"), or None.
+    Used for ProgramDiscipline.zet_value / amount_value, both at import time and by the backfill migration.
+    """
+    if value is None:
+        return None
+    text = str(value).replace(",", ".").replace("\xa0", "").replace(" ", "")
+    if not text:
+        return None
+    try:
+        number = Decimal(text)
+    except InvalidOperation:
+        return None
+    if not number.is_finite() or abs(number) >= DECIMAL_LIMIT:
+        return None
+    return number.quantize(DECIMAL_PLACES)
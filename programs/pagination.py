@@ -0,0 +1,146 @@
+import json
+from django.db import connections
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def estimate_count(queryset):
+    """
+    Planner row estimate of the queryset on PostgreSQL (EXPLAIN, nothing is scanned);
+    an exact COUNT(*) on other databases.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().values("pk").query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class KeysetCursorPagination(pagination.CursorPagination):
+    """
+    Cursor pages ordered on the primary key: each page is `WHERE id > last ORDER BY id LIMIT n`,
+    served by the primary key index however deep the client is.
+    """
+
+    ordering = "id"
+    # ?ordering= values the cursor accepts; other keys are not unique and would need OFFSET
+    orderings = ("id", "-id")
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(api_settings.ORDERING_PARAM)
+        if not ordering:
+            return (self.ordering,)
+        if ordering not in self.orderings:
+            allowed = ", ".join(self.orderings)
+            raise ValidationError(
+                {api_settings.ORDERING_PARAM: f"With cursor pagination ordering must be one of: {allowed}"}
+            )
+        return (ordering,)
+
+    def decode_cursor(self, request):
+        # An empty ?cursor= asks for the first page
+        if not request.query_params.get(self.cursor_query_param):
+            return None
+        return super().decode_cursor(request)
+
+
+class DisciplinePagination(pagination.PageNumberPagination):
+    """
+    Page numbers as before by default, plus:
+
+    - ?cursor= switches to keyset pages (KeysetCursorPagination), constant time per page;
+    - ?count=none skips the COUNT(*), ?count=estimate takes the planner's estimate instead.
+
+    Cursor pages are not counted unless ?count= asks for it.
+    """
+
+    cursor_query_param = "cursor"
+    count_query_param = "count"
+
+    COUNT_EXACT = "exact"
+    COUNT_ESTIMATE = "estimate"
+    COUNT_NONE = "none"
+    COUNT_MODES = (COUNT_EXACT, COUNT_ESTIMATE, COUNT_NONE)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.cursor = None
+        self.count_mode = request.query_params.get(self.count_query_param)
+        if self.count_mode is not None and self.count_mode not in self.COUNT_MODES:
+            raise ValidationError({self.count_query_param: f"Must be one of: {', '.join(self.COUNT_MODES)}"})
+
+        if self.cursor_query_param in request.query_params:
+            self.cursor = KeysetCursorPagination()
+            self.count = self.get_count(queryset, self.count_mode or self.COUNT_NONE)
+            return self.cursor.paginate_queryset(queryset, request, view)
+
+        self.count_mode = self.count_mode or self.COUNT_EXACT
+        if self.count_mode == self.COUNT_EXACT:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.count = self.get_count(queryset, self.count_mode)
+        return self.paginate_uncounted(queryset, request)
+
+    def get_count(self, queryset, mode):
+        if mode == self.COUNT_EXACT:
+            return queryset.count()
+        if mode == self.COUNT_ESTIMATE:
+            return estimate_count(queryset)
+        return None
+
+    def paginate_uncounted(self, queryset, request):
+        """The requested page plus one row to tell whether there is a next page"""
+        page_size = self.get_page_size(request)
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            self.number = int(page_number)
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message="Not an integer"))
+        if self.number < 1:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message="Less than 1"))
+
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset : offset + page_size + 1])
+        if not rows and self.number > 1:
+            raise NotFound(
+                self.invalid_page_message.format(page_number=page_number, message="That page contains no results")
+            )
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_paginated_response(self, data):
+        if self.count_mode == self.COUNT_EXACT and self.cursor is None:
+            return super().get_paginated_response(data)
+
+        if self.cursor is not None:
+            links = {"next": self.cursor.get_next_link(), "previous": self.cursor.get_previous_link()}
+        else:
+            links = {"next": self.get_uncounted_next_link(), "previous": self.get_uncounted_previous_link()}
+
+        response = {}
+        if self.count is not None:
+            response["count"] = self.count
+            response["count_estimated"] = self.count_mode == self.COUNT_ESTIMATE
+        return Response({**response, **links, "results": data})
+
+    def get_uncounted_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.page_query_param, self.number + 1)
+
+    def get_uncounted_previous_link(self):
+        if self.number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
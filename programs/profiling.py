@@ -0,0 +1,80 @@
+import time
+import tracemalloc
+from contextlib import contextmanager
+from django.db import connections
+
+
+class ImportProfiler:
+    """
+    Collects per-stage wall time, database query counts and row counts of one import.
+
+    Queries are counted with a connection execute wrapper, so DEBUG does not need to be on.
+    Peak memory is measured with tracemalloc, which slows allocation-heavy code down
+    noticeably; it is therefore only traced when trace_memory is set.
+    """
+
+    def __init__(self, trace_memory=False, using="default"):
+        self.trace_memory = trace_memory
+        self.using = using
+        # {stage: {"time": seconds, "queries": n, "rows": n}}, in execution order
+        self.stages = {}
+        self.queries = 0
+        self.total_time = 0.0
+        self.peak_memory = None
+        self._started = None
+        self._wrapper = None
+        self._owns_tracemalloc = False
+
+    def _count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def running(self):
+        """Measure everything executed inside the block"""
+        connection = connections[self.using]
+        if self.trace_memory:
+            # Leave tracemalloc alone if something else (e.g. a profiler) already started it
+            self._owns_tracemalloc = not tracemalloc.is_tracing()
+            if self._owns_tracemalloc:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+        self._started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._count_query):
+                yield self
+        finally:
+            self.total_time += time.perf_counter() - self._started
+            if self.trace_memory:
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+                if self._owns_tracemalloc:
+                    tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name):
+        """Add the time and queries spent inside the block to the named stage"""
+        started = time.perf_counter()
+        queries = self.queries
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"time": 0.0, "queries": 0, "rows": None})
+            stage["time"] += time.perf_counter() - started
+            stage["queries"] += self.queries - queries
+
+    def add_stage(self, name, seconds, rows=None):
+        """Record a stage measured elsewhere, e.g. parsing done in a worker process; it counts to the total"""
+        self.stages[name] = {"time": seconds, "queries": 0, "rows": rows}
+        self.total_time += seconds
+
+    def set_rows(self, name, rows):
+        self.stages.setdefault(name, {"time": 0.0, "queries": 0, "rows": None})["rows"] = rows
+
+    def summary(self):
+        """One-line report, e.g. for command output"""
+        parts = [f"{name} {stage['time']:.3f}s/{stage['queries']}q" for name, stage in self.stages.items()]
+        line = f"{self.total_time:.3f}s, {self.queries} queries"
+        if self.peak_memory is not None:
+            line += f", peak {self.peak_memory / (1024 * 1024):.1f} MiB"
+        return f"{line} [{', '.join(parts)}]"
@@ -0,0 +1,123 @@
+import re
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+WHITESPACE = re.compile(r"\s+")
+
+# Text search configuration of the PostgreSQL full-text index
+SEARCH_CONFIG = "russian"
+
+
+def normalize_search_text(*parts):
+    """
+    Lowercased, whitespace-collapsed text with ё folded to е, as stored in the
+    search_document columns. Search terms go through the same function.
+    """
+    text = " ".join(str(part) for part in parts if part not in (None, ""))
+    return WHITESPACE.sub(" ", text.casefold().replace("ё", "е")).strip()
+
+
+def program_search_document(profile, direction_code, direction_name, faculty_name):
+    return normalize_search_text(profile, direction_code, direction_name, faculty_name)
+
+
+def discipline_search_document(name, code, profile, semester_name):
+    return normalize_search_text(name, code, profile, semester_name)
+
+
+def rebuild_search_documents(program_model, discipline_model, batch_size=2000, programs=Q(), disciplines=Q()):
+    """
+    Recompute search_document of the programs and program disciplines matching the
+    filters (every row by default, None skips the table), e.g. the rows showing a
+    renamed lookup. Returns the number of programs.
+    Takes the models as arguments so the backfill migration can pass historical ones.
+    """
+    updated = []
+    if programs is not None:
+        for pk, profile, code, name, faculty in (
+            program_model.objects.filter(programs)
+            .values_list("pk", "profile", "direction__code", "direction__name", "faculty__name")
+            .iterator()
+        ):
+            updated.append(
+                program_model(pk=pk, search_document=program_search_document(profile, code, name, faculty))
+            )
+        program_model.objects.bulk_update(updated, ["search_document"], batch_size=batch_size)
+    if disciplines is None:
+        return len(updated)
+
+    rows = (
+        discipline_model.objects.filter(disciplines)
+        .values_list("pk", "discipline__name", "code", "program__profile", "semester__name")
+        .order_by("pk")
+    )
+    batch = []
+    for pk, name, code, profile, semester in rows.iterator(chunk_size=batch_size):
+        batch.append(
+            discipline_model(pk=pk, search_document=discipline_search_document(name, code, profile, semester))
+        )
+        if len(batch) >= batch_size:
+            discipline_model.objects.bulk_update(batch, ["search_document"])
+            batch = []
+    if batch:
+        discipline_model.objects.bulk_update(batch, ["search_document"])
+    return len(updated)
+
+
+def search_indexes(prefix):
+    """
+    PostgreSQL indexes over a search_document column: trigram (LIKE '%term%' and similarity)
+    and Russian full-text. Imported lazily, django.contrib.postgres needs psycopg.
+    """
+    from django.contrib.postgres.indexes import GinIndex
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        GinIndex(fields=["search_document"], opclasses=["gin_trgm_ops"], name=f"{prefix}_search_trgm"),
+        GinIndex(SearchVector("search_document", config=SEARCH_CONFIG), name=f"{prefix}_search_fts"),
+    ]
+
+
+class RankedSearchFilter(filters.SearchFilter):
+    """
+    ?search= over the view's search_document column instead of icontains across joins.
+
+    Every term must occur in the document (LIKE '%term%' on the normalized text). On
+    PostgreSQL this is served by a trigram GIN index, documents matching the Russian
+    full-text query (stemmed, e.g. "дисциплины" finds "дисциплина") are included
+    too, and results are ordered by ts_rank plus trigram similarity unless ?ordering=
+    is given. Other databases (SQLite locally) scan the one denormalized column (no
+    index helps LIKE '%term%' there) and keep the default order.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, "search_document_field", None)
+        if field is None:
+            return super().filter_queryset(request, queryset, view)
+
+        terms = [normalize_search_text(term) for term in self.get_search_terms(request)]
+        terms = [term for term in terms if term]
+        if not terms:
+            return queryset
+
+        contains = Q()
+        for term in terms:
+            contains &= Q(**{f"{field}__contains": term})
+
+        if connections[queryset.db].vendor != "postgresql":
+            return queryset.filter(contains)
+
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+
+        text = " ".join(terms)
+        query = SearchQuery(text, config=SEARCH_CONFIG)
+        queryset = queryset.annotate(
+            search_vector=SearchVector(field, config=SEARCH_CONFIG),
+            search_rank=SearchRank(F("search_vector"), query) + TrigramSimilarity(field, text),
+        ).filter(contains | Q(search_vector=query))
+
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            queryset = queryset.order_by("-search_rank", "pk")
+        return queryset
@@ -8,6 +8,9 @@ from .models import (
     DisciplinePart,
     DisciplineModule,
     LoadType,
+    ImportJob,
+    ImportBatch,
+    ImportRun,
 )
 
 
@@ -36,13 +39,92 @@ class ProgramDisciplineSerializer(serializers.ModelSerializer):
         ]
 
 
-class EducationalProgramListSerializer(serializers.ModelSerializer):
+class ProgramDisciplineRows:
+    """
+    Read-only counterpart of ProgramDisciplineSerializer for long discipline lists: one
+    values_list query with the related names joined in SQL, turned into the same dicts
+    without building model instances or calling __str__ per related object.
+    """
+
+    # Output key -> column, in ProgramDisciplineSerializer.Meta.fields order
+    COLUMNS = {
+        "id": "id",
+        "block": "block__name",
+        "code": "code",
+        "part": "part__name",
+        "module": "module__name",
+        "name": "discipline__name",
+        "semester": "semester__name",
+        "load_type": "load_type__name",
+        "amount": "amount",
+        "measurement_unit": "measurement_unit",
+        "zet": "zet",
+    }
+
+    @classmethod
+    def serialize(cls, queryset):
+        keys = tuple(cls.COLUMNS)
+        return [dict(zip(keys, row)) for row in queryset.values_list(*cls.COLUMNS.values())]
+
+    @classmethod
+    def attach(cls, programs, ordering=()):
+        """Set discipline_rows on every program from a single query over all of them"""
+        keys = tuple(cls.COLUMNS)
+        by_program = {program.pk: [] for program in programs}
+        rows = (
+            ProgramDiscipline.objects.filter(program__in=list(by_program))
+            .order_by(*ordering)
+            .values_list("program_id", *cls.COLUMNS.values())
+        )
+        for program_id, *values in rows:
+            by_program[program_id].append(dict(zip(keys, values)))
+        for program in programs:
+            program.discipline_rows = by_program[program.pk]
+
+
+class SparseFieldsMixin:
+    """
+    Keeps only the fields named in context["fields"] (all when it is None). Fields listed in
+    Meta.expandable_fields are left out unless named in context["expand"].
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get("expand") or ()
+        dropped = {name for name in getattr(self.Meta, "expandable_fields", ()) if name not in expand}
+        fields = self.context.get("fields")
+        if fields is not None:
+            dropped.update(name for name in self.fields if name not in fields)
+        for name in dropped:
+            self.fields.pop(name, None)
+
+
+class ProgramDisciplinesMixin:
+    # Same order as the nested ProgramDisciplineSerializer list used to have
+    DISCIPLINE_ORDERING = ("semester__name", "discipline__name", "pk")
+
+    def get_disciplines(self, obj):
+        # Rows attached for a whole page by ProgramDisciplineRows.attach, else one query
+        rows = getattr(obj, "discipline_rows", None)
+        if rows is None:
+            rows = ProgramDisciplineRows.serialize(obj.disciplines.order_by(*self.DISCIPLINE_ORDERING))
+        return rows
+
+
+class EducationalProgramListSerializer(SparseFieldsMixin, ProgramDisciplinesMixin, serializers.ModelSerializer):
     education_type = serializers.StringRelatedField()
     education_level = serializers.StringRelatedField()
     direction = serializers.StringRelatedField()
     qualification = serializers.StringRelatedField()
     standard_type = serializers.StringRelatedField()
     faculty = serializers.StringRelatedField()
+    # From ProgramSummary, null until the summary is built (select_related("summary") in the view)
+    total_zet = serializers.FloatField(source="summary.total_zet", read_only=True, allow_null=True)
+    discipline_count = serializers.IntegerField(source="summary.discipline_count", read_only=True, allow_null=True)
+    semester_count = serializers.IntegerField(source="summary.semester_count", read_only=True, allow_null=True)
+    amount = serializers.JSONField(source="summary.amount", read_only=True, allow_null=True)
+    load_types = serializers.JSONField(source="summary.load_types", read_only=True, allow_null=True)
+    disciplines = serializers.SerializerMethodField()
 
     class Meta:
         model = EducationalProgram
@@ -56,17 +138,25 @@ class EducationalProgramListSerializer(serializers.ModelSerializer):
             "standard_type",
             "faculty",
             "year",
+            "total_zet",
+            "discipline_count",
+            "semester_count",
+            "amount",
+            "load_types",
+            "disciplines",
         ]
+        # Only with ?expand=disciplines
+        expandable_fields = ["disciplines"]
 
 
-class EducationalProgramSerializer(serializers.ModelSerializer):
+class EducationalProgramSerializer(SparseFieldsMixin, ProgramDisciplinesMixin, serializers.ModelSerializer):
     education_type = serializers.StringRelatedField()
     education_level = serializers.StringRelatedField()
     direction = serializers.StringRelatedField()
     qualification = serializers.StringRelatedField()
     standard_type = serializers.StringRelatedField()
     faculty = serializers.StringRelatedField()
-    disciplines = ProgramDisciplineSerializer(many=True, read_only=True)
+    disciplines = serializers.SerializerMethodField()
 
     class Meta:
         model = EducationalProgram
@@ -83,3 +173,101 @@ class EducationalProgramSerializer(serializers.ModelSerializer):
             "disciplines",
         ]
 
+
+class ImportRunSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportRun
+        fields = [
+            "rows",
+            "total_time",
+            "queries",
+            "peak_memory",
+            "stages",
+        ]
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    program = serializers.PrimaryKeyRelatedField(read_only=True)
+    duration = serializers.SerializerMethodField()
+    stats = ImportRunSerializer(source="run", read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            "id",
+            "state",
+            "original_name",
+            "year",
+            "sync",
+            "program",
+            "created",
+            "counts",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+            "duration",
+            "stats",
+        ]
+
+    def get_duration(self, obj):
+        """Processing time in seconds, once the job has finished"""
+        if obj.started_at and obj.finished_at:
+            return (obj.finished_at - obj.started_at).total_seconds()
+        return None
+
+
+class ImportBatchSerializer(serializers.ModelSerializer):
+    jobs = ImportJobSerializer(many=True, read_only=True)
+    state = serializers.SerializerMethodField()
+    states = serializers.SerializerMethodField()
+    finished_at = serializers.SerializerMethodField()
+    duration = serializers.SerializerMethodField()
+    processing_time = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportBatch
+        fields = [
+            "id",
+            "original_name",
+            "state",
+            "states",
+            "created_at",
+            "finished_at",
+            "duration",
+            "processing_time",
+            "jobs",
+        ]
+
+    def get_state(self, obj):
+        """running while any job is pending or running, then finished"""
+        active = (ImportJob.STATE_PENDING, ImportJob.STATE_RUNNING)
+        return "running" if any(job.state in active for job in obj.jobs.all()) else "finished"
+
+    def get_states(self, obj):
+        """Number of jobs per state"""
+        states = {state: 0 for state, _ in ImportJob.STATE_CHOICES}
+        for job in obj.jobs.all():
+            states[job.state] += 1
+        return states
+
+    def get_finished_at(self, obj):
+        if self.get_state(obj) != "finished":
+            return None
+        finished = [job.finished_at for job in obj.jobs.all() if job.finished_at]
+        return max(finished, default=obj.created_at)
+
+    def get_duration(self, obj):
+        """Wall-clock seconds from upload to the last finished job"""
+        finished_at = self.get_finished_at(obj)
+        if finished_at is None:
+            return None
+        return (finished_at - obj.created_at).total_seconds()
+
+    def get_processing_time(self, obj):
+        """Sum of the per-file import durations, in seconds"""
+        return sum(
+            (job.finished_at - job.started_at).total_seconds()
+            for job in obj.jobs.all()
+            if job.started_at and job.finished_at
+        )
@@ -1,6 +1,16 @@
+import hashlib
+import io
+import logging
+import os
+import zipfile
 import pandas as pd
 import re
+from contextlib import contextmanager
+from datetime import timedelta
+from openpyxl import load_workbook
+from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 from .models import (
     EducationalProgram,
     ProgramDiscipline,
@@ -16,7 +26,17 @@ from .models import (
     DisciplinePart,
     DisciplineModule,
     LoadType,
+    ImportManifest,
+    ImportJob,
+    ImportBatch,
+    ImportRun,
 )
+from .analysis import ProgramTotals
+from .caching import deferred_invalidation, invalidate_programs
+from .numbers import parse_decimal
+from .profiling import ImportProfiler
+from .search import discipline_search_document
+from .workbook_cache import ParsedWorkbookCache
 from .constants import (
     PROGRAM_SHEET_INDEX,
     DISCIPLINES_SHEET_INDEX,
@@ -40,8 +60,28 @@ from .constants import (
     COL_AMOUNT,
     COL_MEASUREMENT_UNIT,
     COL_ZET,
+    DISCIPLINE_COLUMNS,
+    YEAR_FOLDER_PATTERN,
 )
 
+logger = logging.getLogger(__name__)
+
+
+def year_from_path(path):
+    """Admission year from a Fit_YYYY folder anywhere in the path, or None"""
+    match = YEAR_FOLDER_PATTERN.search(path)
+    return int(match.group(1)) if match else None
+
+
+def is_ignored_path(path):
+    """Directories skipped by bulk imports: _OLD copies and VCS/system folders"""
+    return "_OLD" in path or ".git" in path or ".DS_Store" in path
+
+
+def is_workbook_name(name):
+    """Excel files, excluding Office lock files (~$name.xlsx)"""
+    return (name.endswith(".xlsx") or name.endswith(".xls")) and not name.startswith("~")
+
 
 class InvalidProgramError(Exception):
     """Raised when program data is invalid (e.g., profile is 'nan')"""
@@ -55,6 +95,10 @@ class ExcelParser:
     Follows SRP: Only knows how to read the file format.
     """
 
+    def __init__(self, use_cache=True):
+        # Parsed workbooks are reused by content hash when PARSED_WORKBOOK_CACHE_DIR is set
+        self.cache = ParsedWorkbookCache.from_settings() if use_cache else None
+
     def parse_program_data(self, file_path):
         try:
             df = pd.read_excel(file_path, sheet_name=PROGRAM_SHEET_INDEX, header=None)
@@ -85,6 +129,188 @@ class ExcelParser:
         except Exception as e:
             raise ValueError(f"Failed to parse disciplines data: {e}")
 
+    @contextmanager
+    def open_workbook(self, source, streaming=True):
+        """
+        Open a workbook (path or file object) once and yield (program_data, discipline_rows).
+
+        program_data is the key/value header from the program sheet. With streaming=True
+        the workbook is read with openpyxl in read-only mode and discipline_rows is a lazy
+        iterator of dicts restricted to DISCIPLINE_COLUMNS (empty cells are None);
+        streaming=False uses the pandas reader and yields a DataFrame with those columns.
+        Apart from the container, the only difference is that pandas upcasts integer
+        columns with gaps to float.
+        When the parsed-workbook cache is enabled, a workbook seen before is not decoded
+        at all: the cached header and a DataFrame of strings (see to_string_frame) are
+        yielded regardless of the reader.
+        Rows must be consumed inside the with-block.
+        """
+        if streaming and not self._is_legacy_xls(source):
+            reader = self._stream_workbook
+        else:
+            reader = self._read_workbook_pandas
+
+        if self.cache is None:
+            with reader(source) as workbook:
+                yield workbook
+            return
+
+        content_hash = file_content_hash(source)
+        cached = self.cache.get(content_hash)
+        if cached is not None:
+            yield cached
+            return
+
+        with reader(source) as (program_data, discipline_rows):
+            frame = self.to_string_frame(discipline_rows)
+        try:
+            self.cache.put(content_hash, program_data, frame)
+        except Exception:
+            # The cache only saves decoding next time: a full disk or a bad directory must not fail the import
+            logger.warning("Could not cache parsed workbook %s", content_hash, exc_info=True)
+        yield program_data, frame
+
+    def read_workbook(self, source, streaming=True):
+        """
+        Read a workbook fully into (program_data, disciplines DataFrame).
+        The result is plain picklable data, so it can be produced in a worker process.
+        """
+        with self.open_workbook(source, streaming=streaming) as (program_data, discipline_rows):
+            return program_data, self.to_frame(discipline_rows)
+
+    def to_frame(self, discipline_rows):
+        """DataFrame with exactly DISCIPLINE_COLUMNS from either reader's output"""
+        if isinstance(discipline_rows, pd.DataFrame):
+            return discipline_rows.reindex(columns=list(DISCIPLINE_COLUMNS))
+        return pd.DataFrame.from_records(discipline_rows, columns=list(DISCIPLINE_COLUMNS))
+
+    def to_string_frame(self, discipline_rows):
+        """
+        to_frame() with every value as the string the CharFields would store and
+        NaN/empty cells as None. Columns are uniformly typed, so the frame is also
+        what the parsed-workbook cache stores.
+        """
+        df = self.to_frame(discipline_rows).astype(object)
+        df = df.where(df.isna(), df.astype(str))
+        return df.where(df.notna() & (df != ""), None)
+
+    def _is_legacy_xls(self, source):
+        """openpyxl cannot read the old binary format, those files go through pandas"""
+        name = source if isinstance(source, str) else getattr(source, "name", None)
+        return isinstance(name, str) and name.lower().endswith(".xls")
+
+    @contextmanager
+    def _stream_workbook(self, source):
+        try:
+            workbook = load_workbook(source, read_only=True, data_only=True)
+        except Exception as e:
+            raise ValueError(f"Failed to open workbook: {e}")
+
+        try:
+            try:
+                program_sheet = workbook.worksheets[PROGRAM_SHEET_INDEX]
+                program_data = {}
+                for row in program_sheet.iter_rows(max_col=2, values_only=True):
+                    if row:
+                        program_data[row[0]] = row[1] if len(row) > 1 else None
+            except Exception as e:
+                raise ValueError(f"Failed to parse program data: {e}")
+
+            try:
+                disciplines_sheet = workbook.worksheets[DISCIPLINES_SHEET_INDEX]
+            except Exception as e:
+                raise ValueError(f"Failed to parse disciplines data: {e}")
+
+            yield program_data, self._iter_sheet_rows(disciplines_sheet)
+        finally:
+            workbook.close()
+
+    def _iter_sheet_rows(self, sheet):
+        """Yield discipline rows from a read-only worksheet, keyed by header title"""
+        try:
+            rows = sheet.iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+
+            # First occurrence wins, same as the column pandas keeps unmangled
+            positions = {}
+            for index, title in enumerate(header):
+                if title in DISCIPLINE_COLUMNS and title not in positions:
+                    positions[title] = index
+
+            for values in rows:
+                yield {
+                    column: values[index] if index < len(values) else None
+                    for column, index in positions.items()
+                }
+        except Exception as e:
+            raise ValueError(f"Failed to parse disciplines data: {e}")
+
+    @contextmanager
+    def _read_workbook_pandas(self, source):
+        try:
+            with pd.ExcelFile(source) as xls:
+                program_df = xls.parse(PROGRAM_SHEET_INDEX, header=None)
+                disciplines_df = xls.parse(DISCIPLINES_SHEET_INDEX)
+        except Exception as e:
+            raise ValueError(f"Failed to parse workbook: {e}")
+
+        yield dict(zip(program_df[0], program_df[1])), self.to_frame(disciplines_df)
+
+
+class DictionaryRegistry:
+    """
+    Maps names to rows of the name-keyed dictionary tables (Faculty, Semester, LoadType, ...).
+    Unknown names are resolved in bulk: one SELECT, one bulk_create(ignore_conflicts=True)
+    and one re-select per table. Resolved rows are kept for the lifetime of the registry,
+    so an importer reused across files only queries for names it hasn't seen yet.
+    """
+
+    def __init__(self):
+        self._cache = {}
+
+    @staticmethod
+    def key(name):
+        """Lookup key for a raw cell value; empty cells have no dictionary row"""
+        if name is None or (isinstance(name, float) and pd.isna(name)) or name == "":
+            return None
+        return str(name)
+
+    def resolve(self, model, names):
+        """Make sure every name exists in model's table; returns the {key: obj} mapping"""
+        cache = self._cache.setdefault(model, {})
+        missing = {self.key(name) for name in names} - cache.keys() - {None}
+        if not missing:
+            return cache
+
+        found = {obj.name: obj for obj in model.objects.filter(name__in=missing)}
+        to_create = missing - found.keys()
+        if to_create:
+            # Another importer may insert the same names concurrently, hence the re-select
+            model.objects.bulk_create([model(name=name) for name in to_create], ignore_conflicts=True)
+            found.update((obj.name, obj) for obj in model.objects.filter(name__in=to_create))
+
+        cache.update(found)
+        return cache
+
+    def get(self, model, name):
+        key = self.key(name)
+        if key is None:
+            return None
+        return self.resolve(model, [key]).get(key)
+
+    def get_or_add(self, model, key, load):
+        """Cache a row of a table that isn't keyed by name (e.g. Direction by code)"""
+        cache = self._cache.setdefault(model, {})
+        if key not in cache:
+            cache[key] = load()
+        return cache[key]
+
+    def clear(self):
+        """Forget everything, e.g. after a rollback that may have discarded created rows"""
+        self._cache.clear()
+
 
 class ProgramImporter:
     """
@@ -92,8 +318,32 @@ class ProgramImporter:
     Follows SRP: Only knows how to save data to models.
     """
 
-    def __init__(self, parser: ExcelParser):
+    # Columns a sync re-import compares and overwrites on an existing ProgramDiscipline
+    SYNC_FIELDS = [
+        "block_id",
+        "part_id",
+        "module_id",
+        "load_type_id",
+        "amount",
+        "measurement_unit",
+        "zet",
+        "amount_value",
+        "zet_value",
+    ]
+
+    # Columns _normalize_disciplines adds with the numeric amount and zet
+    AMOUNT_VALUE = "amount_value"
+    ZET_VALUE = "zet_value"
+
+    def __init__(self, parser: ExcelParser, registry: DictionaryRegistry | None = None, record_runs=True):
         self.parser = parser
+        # Shared by every file imported with this importer
+        self.registry = registry or DictionaryRegistry()
+        # Save an ImportRun with the stage timings of every import
+        self.record_runs = record_runs
+        self.profiler = ImportProfiler()
+        # ImportRun of the latest import (None when record_runs is off)
+        self.last_run = None
 
     def _validate_profile(self, profile):
         """Validate that profile is not 'nan' or empty"""
@@ -135,17 +385,104 @@ class ProgramImporter:
             # Proceeding with empty code might violate DB constraints if not null
             pass
 
-        # Use filter().first() to avoid MultipleObjectsReturned if duplicates exist
-        # and create if not found.
-        direction = Direction.objects.filter(code=code).first()
-        if not direction:
-            direction = Direction.objects.create(code=code, name=name)
+        def load():
+            # Use filter().first() to avoid MultipleObjectsReturned if duplicates exist
+            # and create if not found.
+            direction = Direction.objects.filter(code=code).first()
+            if not direction:
+                direction = Direction.objects.create(code=code, name=name)
+            return direction
+
+        return self.registry.get_or_add(Direction, code, load)
+
+    def import_from_file(self, file_path, year=None, streaming=True, sync=False):
+        return self._import_workbook(file_path, year, streaming, sync)
 
-        return direction
+    def import_from_uploaded_file(self, file_obj, year=None, streaming=True, sync=False):
+        """Import program from an uploaded file object"""
+        return self._import_workbook(file_obj, year, streaming, sync)
+
+    def import_parsed(self, program_data, discipline_rows, year=None, sync=False, source="", read_time=None):
+        """
+        Import data already read by ExcelParser (e.g. parsed in a worker process).
+        Returns (program, created, error, counts), counts being the inserted/updated/deleted
+        discipline rows. Without sync only new rows are inserted, see _save_disciplines.
+        read_time is the time the caller spent parsing the workbook, recorded as the read stage.
+        """
+        with self._profiled(source, year) as profiler:
+            if read_time is not None:
+                profiler.add_stage("read", read_time)
+            return self._import(program_data, discipline_rows, year, sync)
+
+    def _import_workbook(self, source, year, streaming, sync):
+        with self._profiled(self._source_name(source), year) as profiler:
+            # The workbook is opened once: header first, then discipline rows from the same handle.
+            # Rows are collected inside the read stage so it covers the whole decoding.
+            with profiler.stage("read"):
+                with self.parser.open_workbook(source, streaming=streaming) as (program_data, discipline_rows):
+                    discipline_rows = self.parser.to_frame(discipline_rows)
+            return self._import(program_data, discipline_rows, year, sync)
+
+    def _import(self, program_data, discipline_rows, year, sync):
+        try:
+            # One cache version bump per import (per run in bulk mode), after the commit
+            with deferred_invalidation(), transaction.atomic():
+                with self.profiler.stage("program"):
+                    program, created = self._save_program(program_data, year)
+                counts = self._save_disciplines(discipline_rows, program, sync=sync)
+                # Only the imported program's summary is recomputed, and only if its disciplines changed
+                if created or any(counts.values()):
+                    with self.profiler.stage("summary"):
+                        ProgramTotals().refresh_summaries([program.pk])
+                transaction.on_commit(lambda: invalidate_programs([program.pk]))
+        except Exception:
+            # Rows created in the rolled-back transaction must not stay cached
+            self.registry.clear()
+            raise
+
+        self.profiler.program = program
+        self.profiler.counts = counts
+        return program, created, None, counts
+
+    @staticmethod
+    def _source_name(source):
+        return source if isinstance(source, (str, os.PathLike)) else getattr(source, "name", "")
+
+    @contextmanager
+    def _profiled(self, source, year):
+        """Measure the import run inside the block and store it as an ImportRun"""
+        profiler = self.profiler = ImportProfiler(trace_memory=settings.IMPORT_TRACE_MEMORY)
+        profiler.program = None
+        profiler.counts = None
+        self.last_run = None
+        error = ""
+        try:
+            with profiler.running():
+                yield profiler
+        except Exception as e:
+            error = str(e)
+            raise
+        finally:
+            if self.record_runs:
+                self.last_run = self._record_run(profiler, str(source)[:1024], year, error)
+
+    def _record_run(self, profiler, source, year, error):
+        read = profiler.stages.get("read", {})
+        return ImportRun.objects.create(
+            source=source,
+            year=year,
+            program=profiler.program,
+            succeeded=not error,
+            error=error,
+            rows=read.get("rows") or 0,
+            total_time=profiler.total_time,
+            queries=profiler.queries,
+            peak_memory=profiler.peak_memory,
+            stages=profiler.stages,
+            counts=profiler.counts,
+        )
 
-    @transaction.atomic
-    def import_from_file(self, file_path, year=None):
-        program_data = self.parser.parse_program_data(file_path)
+    def _save_program(self, program_data, year):
         # Assuming AUP is still used to identify the file/program locally, but not stored on the model as primary key
         # Wait, prompt said "Remove aup_number from EducationalProgram".
         # But we might still use it to uniquely identify during import? Or identifying by profile/direction/year?
@@ -157,22 +494,15 @@ class ProgramImporter:
         self._validate_profile(profile)
 
         # Get or create related models
-        faculty_name = program_data.get(COL_FACULTY)
-        faculty, _ = Faculty.objects.get_or_create(name=faculty_name)
+        registry = self.registry
+        faculty = registry.get(Faculty, program_data.get(COL_FACULTY))
 
         direction = self._get_or_create_direction(program_data)
 
-        edu_level_name = program_data.get(COL_EDUCATION_LEVEL)
-        edu_level, _ = EducationLevel.objects.get_or_create(name=edu_level_name)
-
-        edu_type_name = program_data.get(COL_EDUCATION_TYPE)
-        edu_type, _ = EducationType.objects.get_or_create(name=edu_type_name)
-
-        qualification_name = program_data.get(COL_QUALIFICATION)
-        qualification, _ = Qualification.objects.get_or_create(name=qualification_name)
-
-        standard_type_name = program_data.get(COL_STANDARD_TYPE)
-        standard_type, _ = StandardType.objects.get_or_create(name=standard_type_name)
+        edu_level = registry.get(EducationLevel, program_data.get(COL_EDUCATION_LEVEL))
+        edu_type = registry.get(EducationType, program_data.get(COL_EDUCATION_TYPE))
+        qualification = registry.get(Qualification, program_data.get(COL_QUALIFICATION))
+        standard_type = registry.get(StandardType, program_data.get(COL_STANDARD_TYPE))
 
         # Update or Create Program based on Direction, Profile, Year
         program, created = EducationalProgram.objects.update_or_create(
@@ -188,143 +518,484 @@ class ProgramImporter:
             },
         )
 
-        self._import_disciplines(file_path, program)
+        return program, created
 
-        return program, created, None
-
-    @transaction.atomic
-    def import_from_uploaded_file(self, file_obj, year=None):
-        """Import program from an uploaded file object"""
-        program_data = self.parser.parse_program_data_from_file(file_obj)
-
-        # Validate profile
-        profile = program_data.get(COL_PROFILE)
-        self._validate_profile(profile)
+    def _normalize_disciplines(self, discipline_rows):
+        """
+        Column-wise cleanup of the discipline sheet before any model objects are built:
+        values become strings as stored by the CharFields, NaN and empty cells become None,
+        names are stripped, rows without a name dropped and in-file duplicates on
+        (period, name, code) removed, first occurrence wins. Numeric amount and zet are
+        added as the AMOUNT_VALUE / ZET_VALUE columns.
+        """
+        df = self.parser.to_string_frame(discipline_rows)
 
-        # Get or create related models
-        faculty_name = program_data.get(COL_FACULTY)
-        faculty, _ = Faculty.objects.get_or_create(name=faculty_name)
+        df = df[df[COL_DISCIPLINE_NAME].notna()].copy()
+        df[COL_DISCIPLINE_NAME] = df[COL_DISCIPLINE_NAME].str.strip()
+        df = df[df[COL_DISCIPLINE_NAME] != ""]
 
-        direction = self._get_or_create_direction(program_data)
+        df = df.drop_duplicates(subset=[COL_PERIOD, COL_DISCIPLINE_NAME, COL_CODE], keep="first")
 
-        edu_level_name = program_data.get(COL_EDUCATION_LEVEL)
-        edu_level, _ = EducationLevel.objects.get_or_create(name=edu_level_name)
+        # Parse each distinct value once, a sheet only has a handful of them
+        for column, value_column in ((COL_AMOUNT, self.AMOUNT_VALUE), (COL_ZET, self.ZET_VALUE)):
+            numbers = {text: parse_decimal(text) for text in df[column].dropna().unique()}
+            df[value_column] = df[column].map(numbers).astype(object)
+            df[value_column] = df[value_column].where(df[value_column].notna(), None)
+        return df
 
-        edu_type_name = program_data.get(COL_EDUCATION_TYPE)
-        edu_type, _ = EducationType.objects.get_or_create(name=edu_type_name)
+    def _save_disciplines(self, discipline_rows, program, sync=False):
+        """
+        Save discipline rows (DataFrame or dicts keyed by COL_* titles) to database.
 
-        qualification_name = program_data.get(COL_QUALIFICATION)
-        qualification, _ = Qualification.objects.get_or_create(name=qualification_name)
+        Rows are matched to the stored ones on the natural key (semester, discipline, code).
+        New rows are always inserted; with sync=True rows whose values changed are updated
+        and stored rows missing from the file are deleted, so the program mirrors the file.
+        Returns {"inserted": n, "updated": n, "deleted": n}.
+        """
+        profiler = self.profiler
+        with profiler.stage("normalize"):
+            rows_read = len(discipline_rows) if isinstance(discipline_rows, pd.DataFrame) else None
+            df = self._normalize_disciplines(discipline_rows)
+        if rows_read is not None:
+            profiler.set_rows("read", rows_read)
+        profiler.set_rows("normalize", len(df))
+
+        # Resolve every distinct name of a column at once (a few queries per table, not per name)
+        registry = self.registry
+        with profiler.stage("lookups"):
+            disciplines = registry.resolve(Discipline, df[COL_DISCIPLINE_NAME].unique())
+            semesters = registry.resolve(Semester, df[COL_PERIOD].unique())
+            blocks = registry.resolve(DisciplineBlock, df[COL_BLOCK].unique())
+            parts = registry.resolve(DisciplinePart, df[COL_PART].unique())
+            modules = registry.resolve(DisciplineModule, df[COL_MODULE].unique())
+            load_types = registry.resolve(LoadType, df[COL_LOAD_TYPE].unique())
+
+        with profiler.stage("diff"):
+            to_insert, to_update, existing, seen = self._diff_disciplines(
+                df, program, sync, disciplines, semesters, blocks, parts, modules, load_types
+            )
 
-        standard_type_name = program_data.get(COL_STANDARD_TYPE)
-        standard_type, _ = StandardType.objects.get_or_create(name=standard_type_name)
+        with profiler.stage("write"):
+            if to_insert:
+                # The natural key constraint turns a concurrent import of the same rows into an update
+                ProgramDiscipline.objects.bulk_create(
+                    to_insert,
+                    update_conflicts=True,
+                    unique_fields=["program", "semester", "discipline", "code"],
+                    update_fields=self.SYNC_FIELDS + ["search_document", "updated_at"],
+                )
+            if to_update:
+                # bulk_update does not fill auto_now fields, _diff_disciplines sets updated_at
+                ProgramDiscipline.objects.bulk_update(to_update, self.SYNC_FIELDS + ["updated_at"])
+
+            deleted = 0
+            if sync:
+                stale = [values[0] for natural_key, values in existing.items() if natural_key not in seen]
+                if stale:
+                    ProgramDiscipline.objects.filter(pk__in=stale).delete()
+                    deleted = len(stale)
+        profiler.set_rows("write", len(to_insert) + len(to_update) + deleted)
+
+        return {"inserted": len(to_insert), "updated": len(to_update), "deleted": deleted}
+
+    def _diff_disciplines(self, df, program, sync, disciplines, semesters, blocks, parts, modules, load_types):
+        """
+        Build ProgramDiscipline objects from the normalized rows and compare them with the stored ones.
+        Returns (to_insert, to_update, existing, seen), existing mapping natural keys to
+        (pk, *SYNC_FIELDS values) of the stored rows and seen holding the keys found in the file.
+        """
+        key = self.registry.key
+
+        # natural key -> (pk, *SYNC_FIELDS values)
+        existing = {
+            (semester_id, discipline_id, code): values
+            for semester_id, discipline_id, code, *values in ProgramDiscipline.objects.filter(
+                program=program
+            ).values_list("semester_id", "discipline_id", "code", "pk", *self.SYNC_FIELDS)
+        }
+
+        columns = [
+            COL_DISCIPLINE_NAME,
+            COL_PERIOD,
+            COL_BLOCK,
+            COL_PART,
+            COL_MODULE,
+            COL_LOAD_TYPE,
+            COL_CODE,
+            COL_AMOUNT,
+            COL_MEASUREMENT_UNIT,
+            COL_ZET,
+            self.AMOUNT_VALUE,
+            self.ZET_VALUE,
+        ]
+        to_insert = []
+        to_update = []
+        seen = set()
+        now = timezone.now()
+        for (
+            name,
+            semester_name,
+            block_name,
+            part_name,
+            module_name,
+            load_type_name,
+            code,
+            amount,
+            measurement_unit,
+            zet,
+            amount_value,
+            zet_value,
+        ) in df[columns].itertuples(index=False, name=None):
+            pd_obj = ProgramDiscipline(
+                program=program,
+                discipline=disciplines[name],
+                semester=semesters.get(key(semester_name)),
+                block=blocks.get(key(block_name)),
+                part=parts.get(key(part_name)),
+                module=modules.get(key(module_name)),
+                load_type=load_types.get(key(load_type_name)),
+                code=code,
+                amount=amount,
+                measurement_unit=measurement_unit,
+                zet=zet,
+                amount_value=amount_value,
+                zet_value=zet_value,
+                search_document=discipline_search_document(name, code, program.profile, semester_name),
+            )
+            natural_key = (pd_obj.semester_id, pd_obj.discipline_id, code)
+            seen.add(natural_key)
+
+            stored = existing.get(natural_key)
+            if stored is None:
+                to_insert.append(pd_obj)
+            elif sync and stored[1:] != [getattr(pd_obj, field) for field in self.SYNC_FIELDS]:
+                pd_obj.pk = stored[0]
+                pd_obj.updated_at = now
+                to_update.append(pd_obj)
+
+        return to_insert, to_update, existing, seen
+
+
+def file_content_hash(source, chunk_size=1024 * 1024):
+    """SHA-256 of a file on disk or an uploaded file object (rewound afterwards)"""
+    digest = hashlib.sha256()
+
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    source.seek(0)
+    if hasattr(source, "chunks"):
+        for chunk in source.chunks(chunk_size):
+            digest.update(chunk)
+    else:
+        for chunk in iter(lambda: source.read(chunk_size), b""):
+            digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+
+class ImportTracker:
+    """
+    Decides which workbooks need importing, based on ImportManifest.
+    A file whose size and mtime match the manifest is skipped without being read;
+    otherwise its content hash decides between unchanged and changed.
+    """
 
-        program, created = EducationalProgram.objects.update_or_create(
-            direction=direction,
-            profile=profile,
-            year=year,
+    STATUS_NEW = "new"
+    STATUS_CHANGED = "changed"
+    STATUS_UNCHANGED = "unchanged"
+
+    def __init__(self, force=False):
+        self.force = force
+        # One query per run instead of one per file
+        self.manifests = {m.path: m for m in ImportManifest.objects.all()}
+
+    def check(self, file_path):
+        """Return (status, fingerprint); fingerprint is passed back to record()"""
+        stat = os.stat(file_path)
+        fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "content_hash": None}
+
+        manifest = self.manifests.get(file_path)
+        # A manifest whose program was deleted (e.g. reset_db_data) can't be trusted
+        if manifest is None or manifest.program_id is None:
+            return self.STATUS_NEW, fingerprint
+
+        if manifest.size == stat.st_size and manifest.mtime_ns == stat.st_mtime_ns:
+            status = self.STATUS_UNCHANGED
+        else:
+            fingerprint["content_hash"] = file_content_hash(file_path)
+            if fingerprint["content_hash"] == manifest.content_hash:
+                # Touched but identical: remember the new stat so the next run is O(stat) again
+                ImportManifest.objects.filter(pk=manifest.pk).update(
+                    size=stat.st_size, mtime_ns=stat.st_mtime_ns
+                )
+                status = self.STATUS_UNCHANGED
+            else:
+                status = self.STATUS_CHANGED
+
+        if self.force:
+            return self.STATUS_CHANGED, fingerprint
+        return status, fingerprint
+
+    def record(self, file_path, fingerprint, program, year=None):
+        """Store the fingerprint of a successfully imported file"""
+        content_hash = fingerprint["content_hash"] or file_content_hash(file_path)
+        manifest, _ = ImportManifest.objects.update_or_create(
+            path=file_path,
             defaults={
-                "education_type": edu_type,
-                "education_level": edu_level,
-                "qualification": qualification,
-                "standard_type": standard_type,
-                "faculty": faculty,
+                "size": fingerprint["size"],
+                "mtime_ns": fingerprint["mtime_ns"],
+                "content_hash": content_hash,
+                "year": year,
+                "program": program,
             },
         )
+        self.manifests[file_path] = manifest
+        return manifest
+
+    @staticmethod
+    def record_upload(content_hash, size, program, year=None):
+        """Uploads have no path on disk, so they are keyed by content and year"""
+        manifest, _ = ImportManifest.objects.update_or_create(
+            path=f"upload:{year}:{content_hash}",
+            defaults={"size": size, "content_hash": content_hash, "year": year, "program": program},
+        )
+        return manifest
+
+    @staticmethod
+    def find_program(content_hash, year=None):
+        """Program already produced by a file with this content and year, if any"""
+        manifest = (
+            ImportManifest.objects.filter(content_hash=content_hash, year=year, program__isnull=False)
+            .select_related("program")
+            .first()
+        )
+        return manifest.program if manifest else None
 
-        # Reset file position for reading disciplines
-        file_obj.seek(0)
-        self._import_disciplines_from_file(file_obj, program)
-
-        return program, created, None
-
-    def _import_disciplines(self, file_path, program):
-        df = self.parser.parse_disciplines_data(file_path)
-        return self._save_disciplines(df, program)
-
-    def _import_disciplines_from_file(self, file_obj, program):
-        """Import disciplines from an uploaded file object"""
-        df = self.parser.parse_disciplines_data_from_file(file_obj)
-        return self._save_disciplines(df, program)
-
-    def _save_disciplines(self, df, program):
-        """Save disciplines from DataFrame to database"""
-        # Optimized implementation to reduce DB queries
 
-        created_count = 0
-        new_program_disciplines = []
+class ImportQueue:
+    """
+    Database-backed queue of uploaded workbooks.
+    The web process only stores an ImportJob row holding the file; run_import_worker claims
+    pending jobs with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run.
+    The file travels in the row (ImportJob.content), so the worker does not need access
+    to the web process's disk.
+    """
 
-        # Pre-fetch existing disciplines to avoid N+1 queries
-        existing_disciplines = set(
-            ProgramDiscipline.objects.filter(program=program).values_list("semester__name", "discipline__name", "code")
+    def __init__(self, importer: ProgramImporter | None = None):
+        self.importer = importer or ProgramImporter(ExcelParser())
+
+    # Archive entries larger than this are rejected instead of being extracted
+    MAX_ARCHIVE_ENTRY_SIZE = 100 * 1024 * 1024
+    # Archives whose workbooks add up to more are rejected as a whole: every job is written in one transaction
+    MAX_ARCHIVE_SIZE = 500 * 1024 * 1024
+    CHUNK_SIZE = 1024 * 1024
+
+    @staticmethod
+    def read(chunks):
+        """Collect chunks into the bytes stored on the job; returns (content, content_hash)"""
+        digest = hashlib.sha256()
+        # Grown in place: no list of chunks next to a joined copy of them
+        content = bytearray()
+        for chunk in chunks:
+            digest.update(chunk)
+            content += chunk
+        return content, digest.hexdigest()
+
+    @classmethod
+    def enqueue(cls, file_obj, year=None, sync=False, batch=None):
+        """Create the pending job of an uploaded file, the file stored in the job row"""
+        file_obj.seek(0)
+        content, content_hash = cls.read(file_obj.chunks(cls.CHUNK_SIZE))
+        return ImportJob.objects.create(
+            batch=batch,
+            content=content,
+            original_name=file_obj.name[:255],
+            content_hash=content_hash,
+            year=year,
+            sync=sync,
         )
 
-        # Local caches for dictionary lookups
-        semesters_cache = {}
-        blocks_cache = {}
-        parts_cache = {}
-        modules_cache = {}
-        load_types_cache = {}
-        discipline_catalog_cache = {}
+    @classmethod
+    def enqueue_archive(cls, archive, year=None, years=None, sync=False, force=False):
+        """
+        Queue every workbook of a zip archive as a job of one ImportBatch.
+
+        Entries are read one by one, the archive as a whole is never loaded in memory.
+        Entries over MAX_ARCHIVE_ENTRY_SIZE become failed jobs; an archive whose other
+        workbooks add up to more than MAX_ARCHIVE_SIZE is rejected before anything is read.
+        The year of an entry is taken from `years` ({entry path or file name: year}),
+        then from a Fit_YYYY folder in the entry path (as import_all_data does),
+        then falls back to `year`. Entries identical to an already imported file for
+        the same year are recorded as succeeded without being queued, unless force is set.
+        """
+        years = years or {}
+        try:
+            zf = zipfile.ZipFile(archive)
+        except zipfile.BadZipFile as e:
+            raise ValueError(f"Invalid archive: {e}")
+
+        with zf:
+            entries = [
+                info
+                for info in sorted(zf.infolist(), key=lambda i: i.filename)
+                if not (
+                    info.is_dir()
+                    or info.filename.startswith("__MACOSX/")
+                    or is_ignored_path(info.filename)
+                    or not is_workbook_name(os.path.basename(info.filename))
+                )
+            ]
+            # Sizes from the archive directory: zipfile never extracts more than the declared size
+            total_size = sum(info.file_size for info in entries if info.file_size <= cls.MAX_ARCHIVE_ENTRY_SIZE)
+            if total_size > cls.MAX_ARCHIVE_SIZE:
+                raise ValueError(f"Workbooks in the archive are larger than {cls.MAX_ARCHIVE_SIZE} bytes in total")
+
+            with transaction.atomic():
+                batch = ImportBatch.objects.create(original_name=archive.name[:255])
+
+                for info in entries:
+                    name = info.filename
+                    entry_year = years.get(name, years.get(os.path.basename(name)))
+                    if entry_year is None:
+                        entry_year = year_from_path(os.path.dirname(name))
+                    if entry_year is None:
+                        entry_year = year
+
+                    job = ImportJob(batch=batch, original_name=name[:255], year=entry_year, sync=sync)
+
+                    if info.file_size > cls.MAX_ARCHIVE_ENTRY_SIZE:
+                        job.state = ImportJob.STATE_FAILED
+                        job.error = f"File is larger than {cls.MAX_ARCHIVE_ENTRY_SIZE} bytes"
+                        job.save()
+                        continue
+
+                    with zf.open(info) as entry:
+                        chunks = iter(lambda: entry.read(cls.CHUNK_SIZE), b"")
+                        content, job.content_hash = cls.read(chunks)
+
+                    program = None if force else ImportTracker.find_program(job.content_hash, year=entry_year)
+                    if program is None:
+                        job.content = content
+                    else:
+                        job.state = ImportJob.STATE_SUCCEEDED
+                        job.program = program
+                        job.counts = {"inserted": 0, "updated": 0, "deleted": 0}
+                        job.started_at = job.finished_at = timezone.now()
+
+                    job.save()
+                    # Released before the next entry is read, not when it replaces this one
+                    del content
+
+        return batch
+
+    def fail_stale(self):
+        """
+        Fail running jobs started more than IMPORT_JOB_TIMEOUT seconds ago: their worker
+        crashed or was restarted and nothing else would ever finish them. Returns their number.
+        """
+        now = timezone.now()
+        return ImportJob.objects.filter(
+            state=ImportJob.STATE_RUNNING,
+            started_at__lt=now - timedelta(seconds=settings.IMPORT_JOB_TIMEOUT),
+        ).update(
+            state=ImportJob.STATE_FAILED,
+            finished_at=now,
+            error="The import worker stopped before finishing this job, upload the file again",
+        )
 
-        def get_cached_obj(model, name, cache):
-            if not name:
-                return None
-            if name not in cache:
-                obj, _ = model.objects.get_or_create(name=name)
-                cache[name] = obj
-            return cache[name]
-
-        for _, row in df.iterrows():
-            # Handle NaN values
-            row_data = {k: (v if pd.notnull(v) else None) for k, v in row.items()}
-
-            discipline_name = row_data.get(COL_DISCIPLINE_NAME)
-            if not discipline_name:
-                continue
-            
-            # Cleanup name
-            discipline_name = str(discipline_name).strip()
-
-            code = row_data.get(COL_CODE)
-            semester_name = row_data.get(COL_PERIOD)
-
-            # Check duplication tuple (semester_name, discipline_name, code)
-            # Note: code or semester might be None, so we handle that in the tuple
-            if (semester_name, discipline_name, code) in existing_disciplines:
-                continue
-
-            # Resolve related objects using cache
-            semester = get_cached_obj(Semester, semester_name, semesters_cache)
-            block = get_cached_obj(DisciplineBlock, row_data.get(COL_BLOCK), blocks_cache)
-            part = get_cached_obj(DisciplinePart, row_data.get(COL_PART), parts_cache)
-            module = get_cached_obj(DisciplineModule, row_data.get(COL_MODULE), modules_cache)
-            load_type = get_cached_obj(LoadType, row_data.get(COL_LOAD_TYPE), load_types_cache)
-            
-            # Get or create Catalog Discipline
-            discipline_obj = get_cached_obj(Discipline, discipline_name, discipline_catalog_cache)
-
-            # Create ProgramDiscipline instance (but don't save yet)
-            pd_obj = ProgramDiscipline(
-                program=program,
-                discipline=discipline_obj,
-                semester=semester,
-                block=block,
-                part=part,
-                module=module,
-                load_type=load_type,
-                code=code,
-                amount=row_data.get(COL_AMOUNT),
-                measurement_unit=row_data.get(COL_MEASUREMENT_UNIT),
-                zet=row_data.get(COL_ZET),
+    def claim_next(self):
+        """Mark the oldest pending job as running and return it, or None if the queue is empty"""
+        self.fail_stale()
+        with transaction.atomic():
+            job = (
+                ImportJob.objects.select_for_update(skip_locked=True)
+                .filter(state=ImportJob.STATE_PENDING)
+                # Loaded by process() only
+                .defer("content")
+                .order_by("created_at", "pk")
+                .first()
             )
-            new_program_disciplines.append(pd_obj)
-
-            # Add to existing set to prevent duplicates within the same file import
-            existing_disciplines.add((semester_name, discipline_name, code))
+            if job is None:
+                return None
 
-        if new_program_disciplines:
-            ProgramDiscipline.objects.bulk_create(new_program_disciplines)
-            created_count = len(new_program_disciplines)
+            job.state = ImportJob.STATE_RUNNING
+            job.started_at = timezone.now()
+            job.save(update_fields=["state", "started_at"])
+        return job
 
-        return created_count
+    def process(self, job):
+        """
+        Import the job's file and store the outcome on the job. The job always ends up
+        succeeded or failed, also when the bookkeeping after the import fails.
+        """
+        fields = ["state", "finished_at", "error", "program", "created", "counts", "run"]
+        source = None
+        # Lookup rows renamed or deleted (e.g. in the admin) since the previous job must not be
+        # reused: the registry only lives for one job of a long-running worker
+        self.importer.registry.clear()
+        try:
+            source = self._open(job)
+            program, created, error, counts = self.importer.import_from_uploaded_file(
+                source, year=job.year, sync=job.sync
+            )
+        except Exception as e:
+            program, created, error, counts = None, False, str(e), None
+
+        job.finished_at = timezone.now()
+        job.run = self.importer.last_run
+        if error:
+            job.state = ImportJob.STATE_FAILED
+            job.error = error
+        else:
+            job.state = ImportJob.STATE_SUCCEEDED
+            job.program = program
+            job.created = created
+            job.counts = counts
+            try:
+                self._finish_upload(job, source, program)
+                fields.append("content")
+            except Exception as e:
+                # The program is imported and committed, only the upload bookkeeping failed
+                job.error = f"Imported, but finishing the upload failed: {e}"
+
+        job.save(update_fields=fields)
+        return job
+
+    @staticmethod
+    def _open(job):
+        """
+        The job's workbook: a named file object with the stored content (the name tells
+        .xls from .xlsx), or the path of a job queued when uploads were kept on disk.
+        """
+        if job.file_path:
+            return job.file_path
+        content = ImportJob.objects.filter(pk=job.pk).values_list("content", flat=True).get()
+        if content is None:
+            raise ValueError("The job has no file")
+        source = io.BytesIO(bytes(content))
+        source.name = job.original_name
+        return source
+
+    @staticmethod
+    def _finish_upload(job, source, program):
+        if job.content_hash:
+            size = os.path.getsize(source) if job.file_path else source.getbuffer().nbytes
+            ImportTracker.record_upload(job.content_hash, size, program, year=job.year)
+        # The file is only kept around for failed jobs, to be able to inspect them
+        if job.file_path:
+            os.remove(job.file_path)
+        job.content = None
+
+    def run_pending(self):
+        """Process jobs until the queue is empty; returns the number of processed jobs"""
+        processed = 0
+        while True:
+            job = self.claim_next()
+            if job is None:
+                return processed
+            self.process(job)
+            processed += 1
@@ -1,15 +1,71 @@
+from django.db.models import Q
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.cache import cache
-from .models import EducationalProgram
+from .caching import invalidate_on_commit
+from .dictionaries import Dictionaries
+from .models import EducationalProgram, ProgramDiscipline, Faculty, Direction, Semester, Discipline
+from .search import rebuild_search_documents
+
+# Lookup -> (program field, discipline field) of the rows whose search_document shows its name
+SEARCH_DOCUMENT_LOOKUPS = {
+    Faculty: ("faculty", None),
+    Direction: ("direction", None),
+    Semester: (None, "semester"),
+    Discipline: (None, "discipline"),
+}
 
 @receiver(post_save, sender=EducationalProgram)
 @receiver(post_delete, sender=EducationalProgram)
-def clear_program_cache(sender, instance, **kwargs):
+def invalidate_program_cache(sender, instance, **kwargs):
+    """
+    Make the cached responses of this program and of the program list stale once the
+    change is committed (bumping earlier would let readers re-cache the old rows).
+    Imports bump explicitly as well, see ProgramImporter._import.
+    """
+    invalidate_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=ProgramDiscipline)
+def invalidate_discipline_cache(sender, instance, **kwargs):
+    """
+    A discipline row saved outside an import (imports write them in bulk, without
+    signals): its program's detail, disciplines and totals change, and so does the list.
+    No post_delete receiver: it would turn the bulk deletes of imports and program
+    cascades into a query and a signal per row. Deletions bump explicitly
+    (ProgramImporter, ProgramDisciplineAdmin).
+    """
+    invalidate_on_commit([instance.program_id])
+
+
+def invalidate_lookup_cache(sender, instance, created=False, **kwargs):
+    """
+    A faculty, semester, ... was added, renamed or removed outside an import: the cached
+    dictionaries and the list pages follow the list version. A renamed or removed row may
+    be shown by any program, so the lookup version in every program's keys changes too;
+    a new one is not referenced by anything cached yet.
+    """
+    invalidate_on_commit([], lookups=not created)
+
+
+def refresh_search_documents(sender, instance, created=False, **kwargs):
     """
-    Clear the cache when an EducationalProgram is saved or deleted.
-    Since we use cache_page, we might need to clear the entire cache 
-    or use specific keys/prefixes if configured.
-    For now, we clear the default cache to ensure fresh data.
+    A faculty, direction, semester or discipline saved outside an import (imports only
+    add names, in bulk): the search_document of the rows showing it follows a rename.
     """
-    cache.clear()
+    if created:
+        return
+    program_field, discipline_field = SEARCH_DOCUMENT_LOOKUPS[sender]
+    rebuild_search_documents(
+        EducationalProgram,
+        ProgramDiscipline,
+        programs=Q(**{program_field: instance}) if program_field else None,
+        disciplines=Q(**{discipline_field: instance}) if discipline_field else None,
+    )
+
+
+for _model in SEARCH_DOCUMENT_LOOKUPS:
+    post_save.connect(refresh_search_documents, sender=_model)
+
+for _model, _columns in Dictionaries.TABLES.values():
+    post_save.connect(invalidate_lookup_cache, sender=_model)
+    post_delete.connect(invalidate_lookup_cache, sender=_model)
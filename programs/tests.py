@@ -1,3 +1,1165 @@
-# from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import tempfile
+import time
+import warnings
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
+import pandas as pd
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.db.models.signals import post_delete
+from django.http import JsonResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core.paginator import UnorderedObjectListWarning
+from django.utils import timezone
+from rest_framework.request import Request
+from openpyxl import Workbook
+from .constants import (
+    COL_EDUCATION_TYPE,
+    COL_EDUCATION_LEVEL,
+    COL_DIRECTION,
+    COL_QUALIFICATION,
+    COL_PROFILE,
+    COL_STANDARD_TYPE,
+    COL_FACULTY,
+    COL_BLOCK,
+    COL_CODE,
+    COL_PART,
+    COL_MODULE,
+    COL_RECORD_TYPE,
+    COL_DISCIPLINE_NAME,
+    COL_PERIOD,
+    COL_LOAD_TYPE,
+    COL_AMOUNT,
+    COL_MEASUREMENT_UNIT,
+    COL_ZET,
+)
+from .models import (
+    EducationalProgram,
+    ProgramDiscipline,
+    ImportJob,
+    Faculty,
+    Direction,
+    EducationLevel,
+    EducationType,
+    Qualification,
+    Discipline,
+    Semester,
+    LoadType,
+)
+from . import caching
+from .admin import ProgramDisciplineAdmin
+from .autocomplete import AutocompleteIndex, AutocompleteService
+from visualizer.routers import ReplicaStickinessMiddleware, use_replica
+from .dictionaries import Dictionaries
+from .export import ProgramExport
+from .pagination import DisciplinePagination, KeysetCursorPagination
+from .search import RankedSearchFilter
+from .serializers import ProgramDisciplineRows, ProgramDisciplineSerializer
+from .services import ExcelParser, ProgramImporter, ImportQueue, ImportTracker
+from .workbook_cache import ParsedWorkbookCache
 
-# Create your tests here.
+# Tests do not need Redis: the default cache in memory, "tiered" in front of it
+TEST_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+    "tiered": {"BACKEND": "common.cache.TwoTierCache", "LOCATION": "default"},
+}
+
+PROGRAM_HEADER = {
+    COL_EDUCATION_TYPE: "Высшее",
+    COL_EDUCATION_LEVEL: "Бакалавриат",
+    COL_DIRECTION: "09.03.03 Прикладная информатика",
+    COL_QUALIFICATION: "Бакалавр",
+    COL_PROFILE: "Корпоративные информационные системы",
+    COL_STANDARD_TYPE: "ФГОС3++",
+    COL_FACULTY: "ФИТ",
+}
+
+DISCIPLINE_HEADER = [
+    COL_BLOCK,
+    COL_CODE,
+    COL_PART,
+    COL_MODULE,
+    COL_RECORD_TYPE,
+    COL_DISCIPLINE_NAME,
+    COL_PERIOD,
+    COL_LOAD_TYPE,
+    COL_AMOUNT,
+    COL_MEASUREMENT_UNIT,
+    COL_ZET,
+]
+
+DISCIPLINE_ROWS = [
+    ["Блок 1", "Б1.О.01", "Обязательная часть", "Модуль 1", "Дисциплина", "Математика", "Семестр 1", "Лекции", 36, "Часы", 2],
+    ["Блок 1", "Б1.О.01", "Обязательная часть", "Модуль 1", "Дисциплина", "Математика", "Семестр 1", "Практика", None, "Часы", "3,5"],
+    ["Блок 1", "Б1.В.02", None, None, "Дисциплина", "Программирование", "Семестр 2", "Экзамен", 108, "Часы", None],
+    ["Блок 2", "Б2.О.01", None, "Модуль 2", "Практика", "Учебная практика", None, None, 72, "Часы", 3],
+]
+
+
+def make_workbook(path, rows=DISCIPLINE_ROWS, header=PROGRAM_HEADER):
+    """Two-sheet workbook laid out like the university's curriculum exports"""
+    workbook = Workbook()
+    program_sheet = workbook.active
+    for item in header.items():
+        program_sheet.append(list(item))
+    disciplines_sheet = workbook.create_sheet()
+    # A column the importer ignores
+    disciplines_sheet.append(DISCIPLINE_HEADER + ["Комментарий"])
+    for row in rows:
+        disciplines_sheet.append(row + ["x"])
+    workbook.save(path)
+    return path
+
+
+class ExcelParserTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = make_workbook(os.path.join(cls.tmp.name, "program.xlsx"))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+        super().tearDownClass()
+
+    def read(self, streaming):
+        parser = ExcelParser(use_cache=False)
+        with parser.open_workbook(self.path, streaming=streaming) as (program_data, discipline_rows):
+            return program_data, parser.to_string_frame(discipline_rows)
+
+    def test_streaming_reader_matches_pandas(self):
+        streamed_header, streamed = self.read(streaming=True)
+        pandas_header, frame = self.read(streaming=False)
+
+        self.assertEqual(streamed_header, pandas_header)
+        self.assertEqual(list(streamed.columns), list(frame.columns))
+        self.assertEqual(streamed.values.tolist(), frame.values.tolist())
+
+    def test_integer_column_with_gaps_is_rendered_as_float(self):
+        # pandas upcasts the column to float because of the empty cell, the streaming path must follow
+        for streaming in (True, False):
+            with self.subTest(streaming=streaming):
+                _, frame = self.read(streaming)
+                self.assertEqual(frame[COL_AMOUNT].tolist(), ["36.0", None, "108.0", "72.0"])
+                self.assertEqual(frame[COL_ZET].tolist(), ["2", "3,5", None, "3"])
+                self.assertIsNone(frame[COL_PERIOD].tolist()[3])
+
+    def test_cache_write_error_does_not_fail_the_read(self):
+        parser = ExcelParser(use_cache=False)
+        parser.cache = ParsedWorkbookCache(os.path.join(self.tmp.name, "cache"))
+        with mock.patch.object(parser.cache, "put", side_effect=OSError("No space left on device")):
+            with self.assertLogs("programs.services", "WARNING"):
+                program_data, frame = parser.read_workbook(self.path)
+        self.assertEqual(program_data, self.read(streaming=True)[0])
+        self.assertEqual(len(frame), 4)
+
+
+class ParsedWorkbookCacheTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cache = ParsedWorkbookCache(tmp.name)
+        self.cache.put("a" * 64, {"Профиль": "Тест"}, pd.DataFrame({"x": ["1"]}))
+
+    def write_tmp(self, name, age):
+        path = os.path.join(self.cache.directory, name + self.cache.TMP_SUFFIX)
+        with open(path, "wb") as f:
+            f.write(b"x" * 100)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_files_being_written_are_not_entries(self):
+        self.write_tmp("writing", age=0)
+        self.assertEqual([os.path.basename(path) for path, _, _ in self.cache.entries()], ["a" * 64 + self.cache.suffix])
+
+    def test_prune_removes_only_abandoned_files_being_written(self):
+        writing = self.write_tmp("writing", age=0)
+        abandoned = self.write_tmp("abandoned", age=self.cache.STALE_TMP_AGE + 1)
+        size = self.cache.total_size()
+
+        self.assertEqual(self.cache.prune(size), (1, 100))
+        self.assertTrue(os.path.exists(writing))
+        self.assertFalse(os.path.exists(abandoned))
+        self.assertEqual(self.cache.total_size(), size)
+
+
+def create_program(profile, direction=("09.03.03", "Прикладная информатика"), faculty="ФИТ", year=2024):
+    code, name = direction
+    return EducationalProgram.objects.create(
+        education_type=EducationType.objects.get_or_create(name="Высшее")[0],
+        education_level=EducationLevel.objects.get_or_create(name="Бакалавриат")[0],
+        direction=Direction.objects.get_or_create(code=code, name=name)[0],
+        qualification=Qualification.objects.get_or_create(name="Бакалавр")[0],
+        faculty=Faculty.objects.get_or_create(name=faculty)[0],
+        profile=profile,
+        year=year,
+    )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SyncImportTests(TestCase):
+    ROWS = [
+        ["Блок 1", "Б1.О.01", "Обязательная часть", "Модуль 1", "Дисциплина", "Математика", "Семестр 1", "Лекции", 36, "Часы", 1],
+        ["Блок 1", "Б1.О.02", "Обязательная часть", "Модуль 1", "Дисциплина", "Физика", "Семестр 1", "Практика", 72, "Часы", 2],
+        ["Блок 1", "Б1.В.03", None, None, "Дисциплина", "Программирование", "Семестр 2", "Экзамен", 108, "Часы", 3],
+        # No semester: not covered by the unique constraint (NULLs are distinct)
+        ["Блок 2", "Б2.О.01", None, "Модуль 2", "Практика", "Учебная практика", None, None, 72, "Часы", 2],
+    ]
+
+    def import_rows(self, rows, sync=True):
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        frame = pd.DataFrame(rows, columns=DISCIPLINE_HEADER)
+        program, created, error, counts = importer.import_parsed(PROGRAM_HEADER, frame, year=2024, sync=sync)
+        self.assertIsNone(error)
+        return program, counts
+
+    def stored(self, program):
+        return {
+            (name, semester): amount
+            for name, semester, amount in ProgramDiscipline.objects.filter(program=program).values_list(
+                "discipline__name", "semester__name", "amount"
+            )
+        }
+
+    def test_sync_reimport_inserts_updates_and_deletes(self):
+        program, counts = self.import_rows(self.ROWS)
+        self.assertEqual(counts, {"inserted": 4, "updated": 0, "deleted": 0})
+
+        rows = [list(row) for row in self.ROWS]
+        rows[0][8] = 40  # changed amount
+        del rows[2]  # gone from the file
+        rows.append(["Блок 1", "Б1.О.04", None, None, "Дисциплина", "Химия", "Семестр 3", "Лекции", 36, "Часы", 1])
+        same_program, counts = self.import_rows(rows)
+
+        self.assertEqual(same_program.pk, program.pk)
+        self.assertEqual(counts, {"inserted": 1, "updated": 1, "deleted": 1})
+        self.assertEqual(
+            self.stored(program),
+            {
+                ("Математика", "Семестр 1"): "40",
+                ("Физика", "Семестр 1"): "72",
+                ("Учебная практика", None): "72",
+                ("Химия", "Семестр 3"): "36",
+            },
+        )
+        self.assertEqual(EducationalProgram.objects.count(), 1)
+
+    def test_row_without_semester_is_not_duplicated(self):
+        program, _ = self.import_rows(self.ROWS)
+        for sync in (True, False):
+            with self.subTest(sync=sync):
+                _, counts = self.import_rows(self.ROWS, sync=sync)
+                self.assertEqual(counts, {"inserted": 0, "updated": 0, "deleted": 0})
+                self.assertEqual(ProgramDiscipline.objects.filter(program=program).count(), 4)
+                self.assertEqual(
+                    ProgramDiscipline.objects.filter(program=program, semester__isnull=True).count(), 1
+                )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProgramDisciplineRowsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rows = SyncImportTests.ROWS + [
+            # No block, part, module, semester or load type at all
+            [None, "ФТД.01", None, None, "Дисциплина", "Факультатив", None, None, 18, "Часы", None],
+        ]
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        frame = pd.DataFrame(rows, columns=DISCIPLINE_HEADER)
+        cls.program, _, error, _ = importer.import_parsed(PROGRAM_HEADER, frame, year=2024)
+        assert error is None, error
+
+    def test_rows_match_the_model_serializer(self):
+        queryset = self.program.disciplines.order_by("id")
+        rows = ProgramDisciplineRows.serialize(queryset)
+
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows, ProgramDisciplineSerializer(queryset, many=True).data)
+        self.assertEqual(
+            {key: rows[-1][key] for key in ("block", "part", "module", "semester", "load_type")},
+            dict.fromkeys(("block", "part", "module", "semester", "load_type")),
+        )
+
+    def test_attached_rows_match_the_model_serializer(self):
+        ProgramDisciplineRows.attach([self.program], ordering=("id",))
+        expected = ProgramDisciplineSerializer(self.program.disciplines.order_by("id"), many=True).data
+        self.assertEqual(self.program.discipline_rows, expected)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProgramDisciplineSaveTests(TestCase):
+    def test_numeric_copies_follow_the_text(self):
+        row = ProgramDiscipline.objects.create(
+            program=create_program("Искусственный интеллект"),
+            discipline=Discipline.objects.create(name="Математика"),
+            amount="108.0",
+            zet="3,5",
+        )
+        row.refresh_from_db()
+        self.assertEqual((row.amount_value, row.zet_value), (Decimal("108.00"), Decimal("3.50")))
+
+        row.zet = "4"
+        row.amount = "нет"
+        row.save(update_fields=["zet", "amount"])
+        row.refresh_from_db()
+        self.assertEqual((row.amount_value, row.zet_value), (None, Decimal("4.00")))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ImportQueueTests(TestCase):
+    def setUp(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with open(make_workbook(os.path.join(tmp, "source.xlsx")), "rb") as f:
+                self.upload = SimpleUploadedFile("program.xlsx", f.read())
+        self.queue = ImportQueue(ProgramImporter(ExcelParser(use_cache=False), record_runs=False))
+
+    def test_worker_imports_the_file_stored_in_the_job(self):
+        # No shared disk: the upload travels in the database row
+        job = ImportQueue.enqueue(self.upload, year=2024)
+        self.assertEqual(job.file_path, "")
+        self.upload.seek(0)
+        self.assertEqual(bytes(ImportJob.objects.get(pk=job.pk).content), self.upload.read())
+
+        self.queue.process(self.queue.claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, ImportJob.STATE_SUCCEEDED, job.error)
+        # The two Математика rows share (semester, name, code), the importer keeps one
+        self.assertEqual(job.program.disciplines.count(), len(DISCIPLINE_ROWS) - 1)
+        # Kept for failed jobs only
+        self.assertIsNone(job.content)
+
+    def test_failed_bookkeeping_still_finishes_the_job(self):
+        ImportQueue.enqueue(self.upload, year=2024)
+        job = self.queue.claim_next()
+        with mock.patch.object(ImportTracker, "record_upload", side_effect=RuntimeError("manifest is locked")):
+            self.queue.process(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, ImportJob.STATE_SUCCEEDED)
+        self.assertIsNotNone(job.program)
+        self.assertIn("manifest is locked", job.error)
+
+    def test_lookups_changed_between_jobs_are_not_reused(self):
+        ImportQueue.enqueue(self.upload, year=2024)
+        self.queue.process(self.queue.claim_next())
+        # Renamed and then deleted in the admin while the worker keeps running
+        Semester.objects.filter(name="Семестр 2").update(name="Весенний семестр")
+        LoadType.objects.filter(name="Экзамен").delete()
+
+        self.upload.seek(0)
+        job = ImportQueue.enqueue(self.upload, year=2025)
+        self.queue.process(self.queue.claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, ImportJob.STATE_SUCCEEDED, job.error)
+        self.assertEqual(
+            set(job.program.disciplines.values_list("semester__name", "load_type__name")),
+            {("Семестр 1", "Лекции"), ("Семестр 2", "Экзамен"), (None, None)},
+        )
+
+    def test_abandoned_running_job_is_failed(self):
+        job = ImportQueue.enqueue(self.upload, year=2024)
+        ImportJob.objects.filter(pk=job.pk).update(
+            state=ImportJob.STATE_RUNNING, started_at=timezone.now() - timedelta(hours=2)
+        )
+        self.assertIsNone(self.queue.claim_next())
+
+        job.refresh_from_db()
+        self.assertEqual(job.state, ImportJob.STATE_FAILED)
+        self.assertIsNotNone(job.finished_at)
+
+    def archive(self, *names, padded=()):
+        """A zip of the test workbook under every name; `padded` entries are a few bytes larger"""
+        buffer = io.BytesIO()
+        self.upload.seek(0)
+        content = self.upload.read()
+        with zipfile.ZipFile(buffer, "w") as zf:
+            for name in names:
+                zf.writestr(name, content + b"\0" * 10 * (name in padded))
+        return SimpleUploadedFile("curricula.zip", buffer.getvalue()), len(content)
+
+    def test_archive_entries_are_queued_within_the_size_limits(self):
+        archive, size = self.archive("Fit_2023/a.xlsx", "Fit_2024/b.xlsx", "big.xlsx", "notes.txt", padded=["big.xlsx"])
+        # big.xlsx is over the per-file limit and does not count towards the archive limit
+        with mock.patch.object(ImportQueue, "MAX_ARCHIVE_ENTRY_SIZE", size), mock.patch.object(
+            ImportQueue, "MAX_ARCHIVE_SIZE", 2 * size
+        ):
+            batch = ImportQueue.enqueue_archive(archive)
+
+        jobs = {job.original_name: job for job in batch.jobs.all()}
+        self.assertEqual(set(jobs), {"Fit_2023/a.xlsx", "Fit_2024/b.xlsx", "big.xlsx"})
+        self.assertEqual(jobs["big.xlsx"].state, ImportJob.STATE_FAILED)
+        self.upload.seek(0)
+        self.assertEqual(bytes(jobs["Fit_2023/a.xlsx"].content), self.upload.read())
+        self.assertEqual((jobs["Fit_2023/a.xlsx"].year, jobs["Fit_2024/b.xlsx"].year), (2023, 2024))
+
+    def test_archive_over_the_total_size_is_rejected(self):
+        archive, size = self.archive("a.xlsx", "b.xlsx", "c.xlsx")
+        with mock.patch.object(ImportQueue, "MAX_ARCHIVE_SIZE", 3 * size - 1):
+            with self.assertRaisesMessage(ValueError, "in total"):
+                ImportQueue.enqueue_archive(archive)
+        self.assertFalse(ImportJob.objects.exists())
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ai = create_program("Искусственный интеллект")
+        cls.volumes = create_program("Объёмные вычисления", direction=("09.03.04", "Программная инженерия"))
+
+    def search(self, text, model=EducationalProgram):
+        request = Request(RequestFactory().get("/api/programs/", {"search": text}))
+        view = SimpleNamespace(search_document_field="search_document")
+        queryset = RankedSearchFilter().filter_queryset(request, model.objects.all(), view)
+        return set(queryset.values_list("pk", flat=True))
+
+    def add_discipline(self, program, name, semester="Семестр 1"):
+        return ProgramDiscipline.objects.create(
+            program=program,
+            discipline=Discipline.objects.get_or_create(name=name)[0],
+            semester=Semester.objects.get_or_create(name=semester)[0],
+            code="Б1.О.01",
+        )
+
+    def test_every_word_must_match_in_any_case(self):
+        self.assertEqual(self.search("ПРИКЛАДНАЯ   Интеллект"), {self.ai.pk})
+        self.assertEqual(self.search("фит 09.03.04"), {self.volumes.pk})
+        self.assertEqual(self.search("прикладная вычисления"), set())
+
+    def test_yo_matches_ye(self):
+        self.assertEqual(self.search("объемные"), {self.volumes.pk})
+        self.assertEqual(self.search("ОБЪЁМНЫЕ"), {self.volumes.pk})
+
+    def test_rows_saved_outside_an_import_are_found(self):
+        row = self.add_discipline(self.ai, "Машинное обучение")
+        self.assertEqual(self.search("машинное семестр 1 интеллект", ProgramDiscipline), {row.pk})
+
+        row.code = "Б1.В.07"
+        row.save(update_fields=["code"])
+        self.assertEqual(self.search("б1.в.07", ProgramDiscipline), {row.pk})
+
+    def test_renames_refresh_the_documents_showing_the_name(self):
+        row = self.add_discipline(self.ai, "Машинное обучение")
+        other = self.add_discipline(self.volumes, "Физика", semester="Семестр 2")
+
+        faculty = self.ai.faculty
+        faculty.name = "Институт ИИ"
+        faculty.save()
+        self.assertEqual(self.search("институт"), {self.ai.pk, self.volumes.pk})
+
+        semester = row.semester
+        semester.name = "Осенний семестр"
+        semester.save()
+        discipline = row.discipline
+        discipline.name = "Глубокое обучение"
+        discipline.save()
+        self.assertEqual(self.search("глубокое осенний", ProgramDiscipline), {row.pk})
+
+        program = EducationalProgram.objects.get(pk=self.volumes.pk)
+        program.profile = "Суперкомпьютерные вычисления"
+        program.save()
+        self.assertEqual(self.search("суперкомпьютерные физика", ProgramDiscipline), {other.pk})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProgramFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.programs = [create_program(f"Профиль {number}", year=2020 + number) for number in range(3)]
+
+    def test_trimmed_list_keeps_a_stable_order(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UnorderedObjectListWarning)
+            response = self.client.get("/api/programs/", {"fields": "id,profile"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [{"id": program.pk, "profile": program.profile} for program in self.programs],
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class CacheInvalidationTests(TestCase):
+    def setUp(self):
+        caching.tiered_cache().clear()
+        # Committed, as far as the cache is concerned
+        with self.captureOnCommitCallbacks(execute=True):
+            self.program = create_program("Искусственный интеллект")
+            self.other = create_program("Анализ данных", faculty="ФЭМ")
+
+    def keys(self):
+        request = RequestFactory().get("/api/programs/")
+        return {
+            "list": caching.ResponseCache.key(request),
+            "program": caching.ResponseCache.key(request, self.program.pk),
+            "other": caching.ResponseCache.key(request, self.other.pk),
+        }
+
+    def changed_keys(self, change):
+        before = self.keys()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        after = self.keys()
+        return {name for name in before if before[name] != after[name]}
+
+    def import_program(self):
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            program, _, _, _ = importer.import_parsed(
+                PROGRAM_HEADER, pd.DataFrame(SyncImportTests.ROWS, columns=DISCIPLINE_HEADER), year=2024
+            )
+        return program
+
+    def test_discipline_edit_invalidates_its_program(self):
+        program = self.import_program()
+        self.program = program
+        discipline = program.disciplines.first()
+
+        def edit():
+            discipline.amount = "144"
+            discipline.save()
+
+        self.assertEqual(self.changed_keys(edit), {"list", "program"})
+
+        model_admin = ProgramDisciplineAdmin(ProgramDiscipline, admin.site)
+        request = RequestFactory().post("/admin/")
+        self.assertEqual(self.changed_keys(lambda: model_admin.delete_model(request, discipline)), {"list", "program"})
+        queryset = program.disciplines.all()
+        self.assertEqual(self.changed_keys(lambda: model_admin.delete_queryset(request, queryset)), {"list", "program"})
+
+    def test_one_bump_per_transaction(self):
+        program = self.import_program()
+        # No delete receivers: bulk deletes and cascades load only ids and send no signal per row
+        self.assertFalse(post_delete.has_listeners(ProgramDiscipline))
+        pk = program.pk
+
+        with mock.patch.object(caching, "_bump", wraps=caching._bump) as bump:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                with transaction.atomic():
+                    for discipline in program.disciplines.all():
+                        discipline.save()
+                    program.delete()
+                    self.other.faculty.save()
+
+        self.assertEqual(len(callbacks), 1)
+        bump.assert_called_once()
+        self.assertCountEqual(
+            bump.call_args.args[0],
+            [caching.LOOKUP_VERSION_KEY, caching.PROGRAM_VERSION_KEY.format(pk), caching.LIST_VERSION_KEY],
+        )
+
+    def test_lookup_rename_invalidates_every_program(self):
+        def rename():
+            faculty = Faculty.objects.get(name="ФИТ")
+            faculty.name = "Факультет информационных технологий"
+            faculty.save()
+
+        self.assertEqual(self.changed_keys(rename), {"list", "program", "other"})
+
+    def test_new_lookup_invalidates_the_list_only(self):
+        self.assertEqual(self.changed_keys(lambda: Faculty.objects.create(name="ФП")), {"list"})
+
+    def test_deferred_lookup_change_is_applied_once(self):
+        before = self.keys()
+        with caching.deferred_invalidation():
+            caching.invalidate_programs([], lookups=True)
+            caching.invalidate_programs([])
+            self.assertEqual(self.keys(), before)
+        after = self.keys()
+        self.assertTrue(all(before[name] != after[name] for name in before))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        caching.tiered_cache().clear()
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.program, _, _, _ = importer.import_parsed(
+                PROGRAM_HEADER, pd.DataFrame(SyncImportTests.ROWS, columns=DISCIPLINE_HEADER), year=2024
+            )
+        self.urls = [
+            "/api/programs/",
+            f"/api/programs/{self.program.pk}/",
+            f"/api/programs/{self.program.pk}/disciplines/",
+        ]
+
+    def etags(self):
+        etags = {}
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header("Last-Modified"))
+            etags[url] = response["ETag"]
+        return etags
+
+    def assert_not_modified(self, etags):
+        for url, etag in etags.items():
+            # Answered from the cache versions alone
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304, url)
+
+    def assert_all_changed(self, change):
+        before = self.etags()
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+        after = self.etags()
+        for url in self.urls:
+            self.assertNotEqual(before[url], after[url], url)
+        self.assert_not_modified(after)
+
+    def test_unchanged_resources_are_not_modified(self):
+        self.assert_not_modified(self.etags())
+
+    def test_discipline_edit_changes_the_etags(self):
+        discipline = self.program.disciplines.first()
+        discipline.amount = "144"
+        self.assert_all_changed(discipline.save)
+
+    def test_lookup_rename_changes_the_etags(self):
+        faculty = self.program.faculty
+        faculty.name = "Факультет информационных технологий"
+        self.assert_all_changed(faculty.save)
+
+    def test_evicted_version_does_not_repeat(self):
+        before = self.etags()
+        caching.tiered_cache().delete_many([caching.LIST_VERSION_KEY, caching.LOOKUP_VERSION_KEY])
+        after = self.etags()
+        for url in self.urls:
+            self.assertNotEqual(before[url], after[url], url)
+
+    def test_if_modified_since(self):
+        for url in self.urls:
+            modified = self.client.get(url)["Last-Modified"]
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+            self.assertEqual(response.status_code, 304, url)
+
+    def test_last_modified_follows_the_versions(self):
+        before = caching.last_modified(self.program.pk)
+        discipline = self.program.disciplines.first()
+        discipline.amount = "144"
+        with self.captureOnCommitCallbacks(execute=True):
+            discipline.save()
+        self.assertGreater(caching.last_modified(self.program.pk), before)
+        self.assertGreater(caching.last_modified(), before)
+
+    def test_numeric_ids_and_lists_are_cached(self):
+        for url in self.urls:
+            self.assertEqual(self.client.get(url)["X-Cache"], "MISS", url)
+            self.assertEqual(self.client.get(url)["X-Cache"], "HIT", url)
+        self.assertFalse(self.client.get("/api/programs/abc/").has_header("X-Cache"))
+
+    def test_unknown_ids_create_no_version_keys(self):
+        for pk in ("abc", "999999"):
+            response = self.client.get(f"/api/programs/{pk}/")
+            self.assertEqual(response.status_code, 404)
+            if pk == "abc":
+                self.assertFalse(response.has_header("ETag"))
+            self.assertIsNone(caching.tiered_cache().get(caching.PROGRAM_VERSION_KEY.format(pk)))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        caching.tiered_cache().clear()
+        self.response_cache = caching.ResponseCache(60)
+        self.request = RequestFactory().get("/api/programs/", {"page": 2}, HTTP_ACCEPT="application/json")
+        self.lock_key = f"{caching.ResponseCache.key(self.request)}:lock"
+
+    def build(self, body=None):
+        return mock.Mock(return_value=JsonResponse(body or {"results": []}))
+
+    def stored(self, **changes):
+        """Update the stored entry, e.g. to move its expiry"""
+        key = caching.ResponseCache.key(self.request)
+        entry = caching.tiered_cache().get(key)
+        entry.update(changes)
+        caching.tiered_cache().set(key, entry)
+
+    def test_hit_replays_the_stored_response(self):
+        build = self.build({"results": [1, 2]})
+        first = self.response_cache.get_or_build(self.request, build)
+        second = self.response_cache.get_or_build(self.request, build)
+
+        build.assert_called_once()
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second["Content-Type"], "application/json")
+        # Another query string is another entry
+        other = RequestFactory().get("/api/programs/", {"page": 3}, HTTP_ACCEPT="application/json")
+        self.assertEqual(self.response_cache.get_or_build(other, build)["X-Cache"], "MISS")
+
+    def test_waiter_is_served_the_entry_built_by_the_lock_holder(self):
+        cache.add(self.lock_key, 1)
+        other_worker = caching.ResponseCache(60)
+        key = caching.ResponseCache.key(self.request)
+
+        def finish_build(_):
+            other_worker._build(key, self.lock_key, self.build({"built": "elsewhere"}), self.request, "miss")
+
+        build = self.build()
+        with mock.patch.object(caching.time, "sleep", side_effect=finish_build):
+            response = self.response_cache.get_or_build(self.request, build)
+
+        build.assert_not_called()
+        self.assertEqual(response["X-Cache"], "WAIT")
+        self.assertEqual(json.loads(response.content), {"built": "elsewhere"})
+
+    def test_waiter_gives_up_after_lock_wait(self):
+        cache.add(self.lock_key, 1)
+        build = self.build()
+        clock = iter(range(100))
+        with mock.patch.object(caching.time, "sleep"), mock.patch.object(
+            caching.time, "monotonic", side_effect=lambda: next(clock)
+        ):
+            response = self.response_cache.get_or_build(self.request, build)
+
+        build.assert_called_once()
+        self.assertNotIn("X-Cache", response)
+        # Built without the lock: storing the entry is left to the lock holder
+        self.assertIsNone(caching.tiered_cache().get(caching.ResponseCache.key(self.request)))
+
+    def test_entry_is_refreshed_early_with_probability_growing_with_build_time(self):
+        build = self.build()
+        self.response_cache.get_or_build(self.request, build)
+        with mock.patch.object(caching.random, "random", return_value=0.9):
+            # -delta * ln(0.1) ~ 2.3 * delta seconds early
+            self.stored(expires=time.time() + 10, delta=1)
+            self.assertEqual(self.response_cache.get_or_build(self.request, build)["X-Cache"], "HIT")
+            self.stored(expires=time.time() + 10, delta=5)
+            self.assertEqual(self.response_cache.get_or_build(self.request, build)["X-Cache"], "REBUILD")
+        self.assertEqual(build.call_count, 2)
+        self.assertIsNone(cache.get(self.lock_key))
+
+    def test_stale_entry_is_served_while_another_worker_refreshes_it(self):
+        build = self.build()
+        self.response_cache.get_or_build(self.request, build)
+        self.stored(expires=time.time() - 1)
+        cache.add(self.lock_key, 1)
+
+        self.assertEqual(self.response_cache.get_or_build(self.request, build)["X-Cache"], "STALE")
+        build.assert_called_once()
+
+    def replay(self, accept_encoding, body):
+        request = RequestFactory().get(
+            "/api/programs/", {"page": 2}, HTTP_ACCEPT="application/json", HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+        return self.response_cache.get_or_build(request, self.build(body))
+
+    def test_compressed_bodies_are_served_as_the_client_accepts(self):
+        body = {"results": ["Математика"] * 50}
+        identity = json.dumps(body).encode()
+        # Stands in for the optional brotli package
+        fake_brotli = SimpleNamespace(compress=lambda content, quality: b"br:" + content)
+        with mock.patch.object(caching, "brotli", fake_brotli):
+            self.replay("", body)
+
+        for accept_encoding, encoding in [
+            ("gzip, deflate", "gzip"),
+            ("*", "gzip"),
+            ("br, gzip", "br"),
+            ("br;q=0, gzip", "gzip"),
+            ("", None),
+            ("gzip;q=0", None),
+        ]:
+            with self.subTest(accept_encoding=accept_encoding):
+                response = self.replay(accept_encoding, body)
+                self.assertEqual(response["X-Cache"], "HIT")
+                self.assertEqual(response.get("Content-Encoding"), encoding)
+                self.assertIn("Accept-Encoding", response["Vary"])
+                self.assertEqual(response["Content-Length"], str(len(response.content)))
+                content = {
+                    "gzip": gzip.decompress,
+                    "br": lambda content: content.removeprefix(b"br:"),
+                    None: lambda content: content,
+                }[encoding](response.content)
+                self.assertEqual(content, identity)
+
+    def test_brotli_clients_get_gzip_or_identity_without_the_package(self):
+        body = {"results": ["Математика"] * 50}
+        with mock.patch.object(caching, "brotli", None):
+            self.replay("", body)
+            self.assertEqual(self.replay("br, gzip", body)["Content-Encoding"], "gzip")
+            self.assertNotIn("Content-Encoding", self.replay("br", body))
+
+    def test_small_bodies_are_stored_as_they_are(self):
+        response = self.replay("gzip", {"results": []})
+        self.assertNotIn("Content-Encoding", response)
+        self.assertNotIn("Vary", response)
+        self.assertEqual(response.content, b'{"results": []}')
+
+    def test_waiter_builds_as_soon_as_an_uncacheable_build_releases_the_lock(self):
+        # Another worker is building a 404: it releases the lock and stores nothing
+        cache.add(self.lock_key, 1)
+        build = mock.Mock(return_value=JsonResponse({"detail": "Not found."}, status=404))
+        with mock.patch.object(caching.time, "sleep", side_effect=lambda _: cache.delete(self.lock_key)) as sleep:
+            response = self.response_cache.get_or_build(self.request, build)
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(sleep.call_count, 1)
+        build.assert_called_once()
+
+    def test_outcomes_are_counted_in_process_memory(self):
+        caching.response_cache_stats(reset=True)
+        build = mock.Mock(return_value=JsonResponse({"results": []}))
+        with mock.patch.object(caching, "cache", mock.Mock(wraps=cache)) as shared:
+            with mock.patch.object(caching, "STATS_FLUSH_INTERVAL", 60):
+                for _ in range(3):
+                    self.response_cache.get_or_build(self.request, build)
+        shared.incr.assert_not_called()
+
+        stats = caching.response_cache_stats()
+        self.assertEqual((stats["miss"], stats["hit"]), (1, 2))
+
+    def test_entries_are_built_from_the_primary(self):
+        # A lagging replica must not fill the entry stored under the new version
+        def build():
+            return JsonResponse({"read": EducationalProgram.objects.all().db})
+
+        def view(request):
+            with use_replica():
+                outside.append(EducationalProgram.objects.all().db)
+                return self.response_cache.get_or_build(request, build)
+
+        outside = []
+        with mock.patch("visualizer.routers.replica_configured", return_value=True):
+            response = ReplicaStickinessMiddleware(view)(self.request)
+
+        self.assertEqual(outside, ["replica"])
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(json.loads(response.content), {"read": "default"})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DictionariesTests(TestCase):
+    def setUp(self):
+        caching.tiered_cache().clear()
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.import_parsed(
+                PROGRAM_HEADER, pd.DataFrame(SyncImportTests.ROWS, columns=DISCIPLINE_HEADER), year=2024
+            )
+            Semester.objects.create(name="Семестр 10")
+
+    def get(self, **headers):
+        response = self.client.get("/api/dictionaries/", HTTP_ACCEPT="application/json", **headers)
+        self.assertIn(response.status_code, (200, 304))
+        return response
+
+    def test_every_lookup_table_in_one_response(self):
+        with self.assertNumQueries(len(Dictionaries.TABLES)):
+            data = self.get().json()
+        # Then from memory
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().json(), data)
+
+        self.assertEqual(set(data), set(Dictionaries.TABLES))
+        self.assertEqual(data["faculties"], [{"id": Faculty.objects.get().pk, "name": "ФИТ"}])
+        self.assertEqual(
+            [(row["code"], row["name"]) for row in data["directions"]], [("09.03.03", "Прикладная информатика")]
+        )
+        # Numbers in names are compared as numbers
+        self.assertEqual([row["name"] for row in data["semesters"]], ["Семестр 1", "Семестр 2", "Семестр 10"])
+
+    def test_etag_changes_with_the_lookups(self):
+        etag = self.get()["ETag"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        faculty = Faculty.objects.get()
+        faculty.name = "Факультет информационных технологий"
+        with self.captureOnCommitCallbacks(execute=True):
+            faculty.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["faculties"][0]["name"], "Факультет информационных технологий")
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            LoadType.objects.create(name="Зачёт")
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Зачёт", [row["name"] for row in response.json()["load_types"]])
+
+    def test_payload_is_computed_from_the_primary(self):
+        # Even when built inside a read-only view that uses the replica
+        compute = Dictionaries.compute
+
+        def compute_and_report():
+            reads.append(Faculty.objects.all().db)
+            return compute()
+
+        def view(request):
+            with use_replica():
+                return JsonResponse(Dictionaries.get()["data"])
+
+        reads = []
+        with mock.patch("visualizer.routers.replica_configured", return_value=True), mock.patch.object(
+            Dictionaries, "compute", side_effect=compute_and_report
+        ):
+            ReplicaStickinessMiddleware(view)(RequestFactory().get("/api/dictionaries/"))
+
+        self.assertEqual(reads, ["default"])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ProgramExportTests(TestCase):
+    def setUp(self):
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        frame = pd.DataFrame(SyncImportTests.ROWS, columns=DISCIPLINE_HEADER)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.programs = [
+                importer.import_parsed({**PROGRAM_HEADER, COL_PROFILE: profile}, frame, year=2024)[0]
+                for profile in ("Первый", "Второй")
+            ]
+            self.programs.append(create_program("Без дисциплин"))
+
+    def export(self, **kwargs):
+        return ProgramExport(EducationalProgram.objects.all(), chunk_size=2, **kwargs)
+
+    def test_ndjson(self):
+        lines = [json.loads(line) for line in self.export().ndjson()]
+
+        self.assertEqual([line["id"] for line in lines], [program.pk for program in self.programs])
+        self.assertEqual([len(line["disciplines"]) for line in lines], [4, 4, 0])
+        self.assertEqual(lines[0]["direction"], "09.03.03 Прикладная информатика")
+        self.assertEqual(lines[0]["disciplines"][0]["name"], "Математика")
+        self.assertEqual(
+            {discipline["id"] for discipline in lines[1]["disciplines"]},
+            set(self.programs[1].disciplines.values_list("pk", flat=True)),
+        )
+
+    def test_csv(self):
+        export = self.export()
+        text = b"".join(export.csv()).decode()
+
+        self.assertTrue(text.startswith("\ufeff"))
+        rows = list(csv.reader(io.StringIO(text[1:])))
+        self.assertEqual(rows[0], export.header())
+        first, second, empty = (str(program.pk) for program in self.programs)
+        self.assertEqual([row[0] for row in rows[1:]], [first] * 4 + [second] * 4 + [empty])
+        # A program without disciplines is one row with empty discipline columns
+        self.assertEqual(rows[-1][len(export.PROGRAM_COLUMNS) - 1:], [""] * len(ProgramDisciplineRows.COLUMNS))
+        self.assertEqual((export.count, export.position), (3, self.programs[2].pk))
+
+    def test_program_deleted_between_the_cursors(self):
+        deleted = self.programs[0]
+        program_table = EducationalProgram._meta.db_table
+        done = []
+
+        def delete_first(execute, sql, params, many, context):
+            # The programs cursor opens after the disciplines one: delete the program in between
+            if not done and f'FROM "{program_table}"' in sql and "discipline" not in sql:
+                done.append(deleted.pk)
+                with context["connection"].cursor() as cursor:
+                    cursor.execute(f'DELETE FROM "{program_table}" WHERE "id" = %s', [deleted.pk])
+            return execute(sql, params, many, context)
+
+        with transaction.atomic():
+            with connection.execute_wrapper(delete_first):
+                exported = [(program["id"], len(rows)) for program, rows in self.export()]
+            # The rows referencing the deleted program would fail the constraint check
+            transaction.set_rollback(True)
+
+        self.assertEqual(exported, [(self.programs[1].pk, 4), (self.programs[2].pk, 0)])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class DisciplinePaginationTests(TestCase):
+    URL = "/api/disciplines/"
+
+    def setUp(self):
+        caching.tiered_cache().clear()
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        frame = pd.DataFrame(SyncImportTests.ROWS, columns=DISCIPLINE_HEADER)
+        with self.captureOnCommitCallbacks(execute=True):
+            for profile in ("Первый", "Второй"):
+                importer.import_parsed({**PROGRAM_HEADER, COL_PROFILE: profile}, frame, year=2024)
+        self.ids = sorted(ProgramDiscipline.objects.values_list("pk", flat=True))
+        # Three pages of 3, 3 and 2 rows
+        for paginator in (DisciplinePagination, KeysetCursorPagination):
+            patcher = mock.patch.object(paginator, "page_size", 3)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.counted = any("COUNT(" in query["sql"] for query in queries.captured_queries)
+        return response.json()
+
+    def walk(self, **params):
+        """Ids of every page, following the next links"""
+        pages = []
+        data = self.get(self.URL, **params)
+        while True:
+            pages.append([row["id"] for row in data["results"]])
+            if data["next"] is None:
+                return pages, data
+            data = self.get(data["next"])
+
+    def test_cursor_pages_walk_every_row_once_without_counting(self):
+        pages, last = self.walk(cursor="")
+        self.assertEqual(pages, [self.ids[:3], self.ids[3:6], self.ids[6:]])
+        self.assertNotIn("count", last)
+        self.assertFalse(self.counted)
+
+        previous = self.get(last["previous"])
+        self.assertEqual([row["id"] for row in previous["results"]], self.ids[3:6])
+
+    def test_cursor_pages_in_descending_order(self):
+        pages, _ = self.walk(cursor="", ordering="-id")
+        self.assertEqual(sum(pages, []), self.ids[::-1])
+
+    def test_cursor_rejects_non_unique_ordering(self):
+        response = self.client.get(self.URL, {"cursor": "", "ordering": "code"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("ordering", response.json())
+
+    def test_cursor_pages_count_on_request(self):
+        data = self.get(self.URL, cursor="", count="exact")
+        self.assertEqual((data["count"], data["count_estimated"]), (8, False))
+
+    def test_uncounted_pages(self):
+        pages, last = self.walk(count="none")
+        self.assertEqual(pages, [self.ids[:3], self.ids[3:6], self.ids[6:]])
+        self.assertNotIn("count", last)
+        self.assertFalse(self.counted)
+
+        self.assertEqual(self.get(last["previous"])["previous"], f"http://testserver{self.URL}?count=none")
+        response = self.client.get(self.URL, {"count": "none", "page": 4})
+        self.assertEqual(response.status_code, 404)
+
+    def test_estimated_count(self):
+        # Not PostgreSQL here: the "estimate" is exact
+        data = self.get(self.URL, count="estimate")
+        self.assertEqual((data["count"], data["count_estimated"]), (8, True))
+        self.assertEqual(len(data["results"]), 3)
+
+    def test_page_numbers_stay_the_default(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", UnorderedObjectListWarning)
+            data = self.get(self.URL, page=2)
+        self.assertEqual(data["count"], 8)
+        self.assertNotIn("count_estimated", data)
+        self.assertEqual([row["id"] for row in data["results"]], self.ids[3:6])
+
+    def test_unknown_count_mode_is_rejected(self):
+        response = self.client.get(self.URL, {"count": "fast"})
+        self.assertEqual(response.status_code, 400)
+
+
+class AutocompleteIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = AutocompleteIndex(
+            [
+                ("discipline", 1, "Математика", 3),
+                ("discipline", 2, "Дискретная математика", 10),
+                ("discipline", 3, "Прикладная математика", 2),
+                ("discipline", 4, "Биоматематика", 50),
+                ("discipline", 5, "Бухгалтерский учёт", 2),
+                ("direction", 6, "01.03.04 Прикладная математика", 2),
+                ("profile", None, "Математическое моделирование", 3),
+            ]
+        )
+
+    def names(self, query, **kwargs):
+        return [result["name"] for result in self.index.search(query, **kwargs)]
+
+    def test_text_prefix_then_word_prefix_then_substring(self):
+        self.assertEqual(
+            self.names("МАТЕМ"),
+            [
+                # Most used first, then by name
+                "Математика",
+                "Математическое моделирование",
+                "Дискретная математика",
+                "01.03.04 Прикладная математика",
+                "Прикладная математика",
+                "Биоматематика",
+            ],
+        )
+
+    def test_short_queries_match_word_prefixes(self):
+        self.assertEqual(
+            self.names("ма", limit=3),
+            ["Математика", "Математическое моделирование", "Дискретная математика"],
+        )
+        self.assertNotIn("Биоматематика", self.names("ма", limit=50))
+
+    def test_limit_and_types(self):
+        self.assertEqual(self.names("матем", limit=1), ["Математика"])
+        self.assertEqual(self.names("прикладная", types={"direction"}), ["01.03.04 Прикладная математика"])
+        self.assertEqual(self.names("матем", limit=0), [])
+        self.assertEqual(self.names("   "), [])
+
+    def test_e_and_yo_are_the_same_letter(self):
+        self.assertEqual(
+            self.index.search("учет"), [{"type": "discipline", "id": 5, "name": "Бухгалтерский учёт", "programs": 2}]
+        )
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AutocompleteViewTests(TestCase):
+    URL = "/api/disciplines/autocomplete/"
+
+    def setUp(self):
+        caching.tiered_cache().clear()
+        AutocompleteService.reset()
+        self.addCleanup(AutocompleteService.reset)
+        patcher = mock.patch.object(AutocompleteService, "VERSION_CHECK_INTERVAL", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.import_program("Первый")
+
+    def import_program(self, profile):
+        importer = ProgramImporter(ExcelParser(use_cache=False), record_runs=False)
+        frame = pd.DataFrame(SyncImportTests.ROWS, columns=DISCIPLINE_HEADER)
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.import_parsed({**PROGRAM_HEADER, COL_PROFILE: profile}, frame, year=2024)
+
+    def search(self, **params):
+        response = self.client.get(self.URL, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["results"]
+
+    def test_catalog_with_program_counts_and_rebuild_after_import(self):
+        mathematics = Discipline.objects.get(name="Математика")
+        self.assertEqual(
+            self.search(q="матем"),
+            [{"type": "discipline", "id": mathematics.pk, "name": "Математика", "programs": 1}],
+        )
+        self.assertEqual([result["type"] for result in self.search(q="прикладная")], ["direction"])
+
+        self.import_program("Второй")
+        self.assertEqual(self.search(q="матем")[0]["programs"], 2)
+        self.assertEqual([result["name"] for result in self.search(q="втор", type="profile")], ["Второй"])
+
+    def test_index_is_served_from_memory(self):
+        self.search(q="мат")
+        with self.assertNumQueries(0):
+            self.search(q="физ")
+
+    def test_invalid_parameters(self):
+        for params in ({"q": "мат", "limit": "ten"}, {"q": "мат", "type": "discipline,faculty"}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get(self.URL, params).status_code, 400)
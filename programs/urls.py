@@ -1,6 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EducationalProgramViewSet, DisciplineViewSet, UploadProgramView
+from .views import (
+    EducationalProgramViewSet,
+    DisciplineViewSet,
+    UploadProgramView,
+    ImportJobStatusView,
+    UploadBatchView,
+    ImportBatchStatusView,
+    DictionariesView,
+)
 
 router = DefaultRouter()
 router.register(r"programs", EducationalProgramViewSet, basename="educationalprogram")
@@ -8,5 +16,13 @@ router.register(r"disciplines", DisciplineViewSet, basename="discipline")
 
 urlpatterns = [
     path("programs/upload/", UploadProgramView.as_view(), name="program-upload"),
+    path("programs/upload/<int:job_id>/", ImportJobStatusView.as_view(), name="program-upload-status"),
+    path("programs/upload/batch/", UploadBatchView.as_view(), name="program-upload-batch"),
+    path(
+        "programs/upload/batch/<int:batch_id>/",
+        ImportBatchStatusView.as_view(),
+        name="program-upload-batch-status",
+    ),
+    path("dictionaries/", DictionariesView.as_view(), name="dictionaries"),
     path("", include(router.urls)),
 ]
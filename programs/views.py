@@ -1,27 +1,46 @@
+import json
+import tempfile
 from rest_framework import viewsets, filters, status, views
 from rest_framework.parsers import MultiPartParser
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import Prefetch
 from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
-from .models import EducationalProgram, ProgramDiscipline, Semester
+from django.views.decorators.http import condition
+from django.http import FileResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from .models import EducationalProgram, ProgramDiscipline, Semester, ImportJob, ImportBatch
 from .serializers import (
     EducationalProgramListSerializer,
     EducationalProgramSerializer,
     ProgramDisciplineSerializer,
+    ProgramDisciplineRows,
+    ImportJobSerializer,
+    ImportBatchSerializer,
 )
 from .filters import ProgramFilter, DisciplineFilter
-from .services import ExcelParser, ProgramImporter
+from .services import ImportTracker, ImportQueue, file_content_hash
+from .analysis import ProgramTotals
+from .search import RankedSearchFilter
+from .autocomplete import AutocompleteIndex, AutocompleteService
+from .pagination import DisciplinePagination
+from .conditional import program_condition
+from .caching import CachedResponseMixin
+from .export import ExportRenderer, ProgramExport
+from .dictionaries import Dictionaries, dictionaries_etag
+from visualizer.routers import ReplicaReadMixin
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 
 
-class EducationalProgramViewSet(viewsets.ReadOnlyModelViewSet):
+class EducationalProgramViewSet(CachedResponseMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing educational programs.
     """
 
+    # Disciplines of the detail view are fetched as flat rows by the serializer (ProgramDisciplineRows)
     queryset = EducationalProgram.objects.select_related(
         "education_type",
         "education_level",
@@ -29,53 +48,168 @@ class EducationalProgramViewSet(viewsets.ReadOnlyModelViewSet):
         "qualification",
         "standard_type",
         "faculty",
-    ).prefetch_related(
-        Prefetch(
-            "disciplines",
-            queryset=ProgramDiscipline.objects.select_related(
-                "discipline", "semester", "block", "part", "module", "load_type"
-            ).order_by("semester__name", "discipline__name"),
-        )
     )
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_class = ProgramFilter
-    search_fields = ["profile", "direction__name", "direction__code", "faculty__name"]
+    # profile, direction code and name, faculty name
+    search_document_field = "search_document"
     ordering_fields = ["year", "direction__name", "profile"]
 
-    @method_decorator(cache_page(60 * 15))
-    @method_decorator(vary_on_cookie)
+    # Serializer field -> columns it reads, used to trim the query for ?fields=
+    RELATED_FIELD_COLUMNS = {
+        "education_type": ["education_type__name"],
+        "education_level": ["education_level__name"],
+        "direction": ["direction__code", "direction__name"],
+        "qualification": ["qualification__name"],
+        "standard_type": ["standard_type__name"],
+        "faculty": ["faculty__name"],
+    }
+    SUMMARY_FIELDS = {"total_zet", "discipline_count", "semester_count", "amount", "load_types"}
+    EXPANDABLE = {"disciplines"}
+
+    # Streamed files, not JSON
+    response_cache_skip_actions = ("export",)
+
+    # Conditional GET first: an unchanged resource is a 304 before the response cache is read
+    @method_decorator(program_condition)
     def dispatch(self, *args, **kwargs):
         return super().dispatch(*args, **kwargs)
 
+    def get_queryset(self):
+        # Pages need a stable order; ?ordering= and ?search= replace it
+        queryset = super().get_queryset().order_by("pk")
+        if self.action == "list":
+            # One query per page: summary totals come from ProgramSummary, not from the disciplines
+            queryset = queryset.select_related("summary")
+
+        fields = self.get_requested_fields()
+        if fields is None:
+            return queryset
+
+        # Join and load only what the requested fields read
+        relations = [name for name in self.RELATED_FIELD_COLUMNS if name in fields]
+        columns = ["id", *(name for name in ("profile", "year") if name in fields)]
+        for name in relations:
+            columns += self.RELATED_FIELD_COLUMNS[name]
+        if self.action == "list" and fields & self.SUMMARY_FIELDS:
+            relations.append("summary")
+            columns += [f"summary__{name}" for name in fields & self.SUMMARY_FIELDS]
+        queryset = queryset.select_related(None)
+        if relations:
+            # select_related() without arguments would follow every foreign key
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
     def get_serializer_class(self):
         if self.action == "list":
             return EducationalProgramListSerializer
         return EducationalProgramSerializer
 
+    def get_requested_fields(self):
+        """
+        Field names from ?fields=a,b (None when absent) for list and retrieve;
+        unknown names are a 400.
+        """
+        if self.action not in ("list", "retrieve") or "fields" not in self.request.query_params:
+            return None
+        fields = {name.strip() for name in self.request.query_params["fields"].split(",") if name.strip()}
+        allowed = set(self.get_serializer_class().Meta.fields)
+        unknown = fields - allowed
+        if unknown:
+            raise ValidationError({"fields": f"Unknown field: {', '.join(sorted(unknown))}"})
+        return fields
+
+    def get_requested_expand(self):
+        """Names from ?expand=disciplines"""
+        expand = {name.strip() for name in self.request.query_params.get("expand", "").split(",") if name.strip()}
+        unknown = expand - self.EXPANDABLE
+        if unknown:
+            raise ValidationError({"expand": f"Unknown expansion: {', '.join(sorted(unknown))}"})
+        return expand
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ("list", "retrieve"):
+            context["fields"] = self.get_requested_fields()
+            context["expand"] = self.get_requested_expand()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        programs = page if page is not None else list(queryset)
+
+        # ?expand=disciplines: the disciplines of the whole page in one query
+        fields = self.get_requested_fields()
+        if "disciplines" in self.get_requested_expand() and (fields is None or "disciplines" in fields):
+            ProgramDisciplineRows.attach(programs, ordering=EducationalProgramSerializer.DISCIPLINE_ORDERING)
+
+        serializer = self.get_serializer(programs, many=True)
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
+        return Response(serializer.data)
+
     @action(detail=True, methods=["get"])
     def disciplines(self, request, pk=None):
         """
         Get disciplines for a specific program, optionally filtered by semester.
         """
-        program = self.get_object()
-        disciplines = ProgramDiscipline.objects.filter(program=program).select_related(
-            "semester", "block", "part", "module", "load_type", "discipline"
-        )
+        program = get_object_or_404(EducationalProgram.objects.only("pk"), pk=pk)
+        disciplines = ProgramDiscipline.objects.filter(program=program)
 
         # Apply semester filter if provided via query params
         semester = request.query_params.get("semester")
         if semester:
             disciplines = disciplines.filter(semester__name__icontains=semester)
 
-        serializer = ProgramDisciplineSerializer(disciplines, many=True)
-        return Response(serializer.data)
+        return Response(ProgramDisciplineRows.serialize(disciplines))
+
+    @action(detail=True, methods=["get"])
+    def totals(self, request, pk=None):
+        """
+        ZET, discipline and hour totals of a program, overall and per semester, block and load type.
+        Aggregated in the database, the disciplines are not loaded.
+        """
+        program = get_object_or_404(EducationalProgram.objects.only("pk"), pk=pk)
+        return Response({"program": program.pk, **ProgramTotals().compute(program.pk)})
 
+    @action(detail=False, methods=["get"], renderer_classes=[JSONRenderer, ExportRenderer])
+    def export(self, request):
+        """
+        All programs matching the list filters with their disciplines, as one file.
+        Params: output (ndjson, csv, xlsx; default ndjson), after (program id to resume after).
+        ndjson and csv are streamed as they are read; xlsx is built in a temporary file first.
+        """
+        output = request.query_params.get("output", "ndjson")
+        if output not in ProgramExport.FORMATS:
+            raise ValidationError({"output": f"Must be one of: {', '.join(ProgramExport.FORMATS)}"})
+        after = request.query_params.get("after") or None
+        if after is not None:
+            try:
+                after = int(after)
+            except ValueError:
+                raise ValidationError({"after": "Must be a program id"})
 
-class DisciplineViewSet(viewsets.ReadOnlyModelViewSet):
+        export = ProgramExport(self.filter_queryset(self.get_queryset()), after=after)
+        content_type = ProgramExport.CONTENT_TYPES[output]
+        filename = f"programs.{output}"
+        if output == "xlsx":
+            file = tempfile.TemporaryFile()
+            export.xlsx(file)
+            file.seek(0)
+            return FileResponse(file, as_attachment=True, filename=filename, content_type=content_type)
+
+        response = StreamingHttpResponse(getattr(export, output)(), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
+class DisciplineViewSet(CachedResponseMixin, ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for viewing disciplines.
     """
 
+    # Page and ?count=none offsets need a stable order; ?ordering=, ?search= and ?cursor= replace it
     queryset = ProgramDiscipline.objects.select_related(
         "discipline",
         "program",
@@ -86,17 +220,66 @@ class DisciplineViewSet(viewsets.ReadOnlyModelViewSet):
         "part",
         "module",
         "load_type",
-    ).all()
+    ).order_by("pk")
     serializer_class = ProgramDisciplineSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    # ?cursor= for keyset pages, ?count=none|estimate to skip the exact COUNT(*)
+    pagination_class = DisciplinePagination
+    filter_backends = [DjangoFilterBackend, RankedSearchFilter, filters.OrderingFilter]
     filterset_class = DisciplineFilter
-    search_fields = ["discipline__name", "code", "program__profile", "semester__name"]
-    ordering_fields = ["discipline__name", "code", "semester__name"]
+    # discipline name, code, program profile, semester name
+    search_document_field = "search_document"
+    # "id" is the only ordering ?cursor= pages accept
+    ordering_fields = ["id", "discipline__name", "code", "semester__name"]
+
+    AUTOCOMPLETE_MAX_LIMIT = 50
+
+    # Rows span all programs: cached under the list version. Autocomplete answers from memory.
+    response_cache_program_kwarg = None
+    response_cache_skip_actions = ("autocomplete",)
+
+    @action(detail=False, methods=["get"])
+    def autocomplete(self, request):
+        """
+        Type-ahead over discipline names, directions and profiles from the in-process index.
+        Params: q, limit (default 10), type (comma-separated: discipline, direction, profile).
+        """
+        query = request.query_params.get("q", "")
+        try:
+            limit = min(int(request.query_params.get("limit", 10)), self.AUTOCOMPLETE_MAX_LIMIT)
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+        types = None
+        if request.query_params.get("type"):
+            types = set(request.query_params["type"].split(","))
+            unknown = types - set(AutocompleteIndex.TYPES)
+            if unknown:
+                return Response(
+                    {"error": f"Unknown type: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST
+                )
+
+        return Response({"query": query, "results": AutocompleteService.search(query, limit=limit, types=types)})
+
+
+class DictionariesView(ReplicaReadMixin, views.APIView):
+    """
+    All lookup tables (faculties, directions, levels, ... load types) for filter UIs,
+    cached until the next import, see Dictionaries.
+    """
+
+    @method_decorator(condition(etag_func=dictionaries_etag))
+    def dispatch(self, *args, **kwargs):
+        return super().dispatch(*args, **kwargs)
+
+    def get(self, request, format=None):
+        return Response(Dictionaries.get()["data"])
 
 
 class UploadProgramView(views.APIView):
     """
     View for uploading a program Excel file.
+    The file is stored and queued for run_import_worker; the response (202) points
+    to the job status endpoint.
     """
 
     parser_classes = [MultiPartParser]
@@ -106,18 +289,79 @@ class UploadProgramView(views.APIView):
         if not file_obj:
             return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
 
-        year = request.data.get("year")
+        year = request.data.get("year") or None
+        sync = str(request.data.get("sync", "")).lower() in ("1", "true", "yes")
+
+        try:
+            # An identical file was already imported for this year: nothing to do
+            content_hash = file_content_hash(file_obj)
+            if not request.data.get("force"):
+                program = ImportTracker.find_program(content_hash, year=year)
+                if program is not None:
+                    serializer = EducationalProgramSerializer(program)
+                    return Response(serializer.data, status=status.HTTP_200_OK)
+
+            job = ImportQueue.enqueue(file_obj, year=year, sync=sync)
+        except Exception as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        status_url = reverse("program-upload-status", kwargs={"job_id": job.pk})
+        data = ImportJobSerializer(job).data
+        data["status_url"] = request.build_absolute_uri(status_url)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": status_url})
+
+
+class ImportJobStatusView(views.APIView):
+    """
+    State, timings and errors of a queued upload.
+    """
 
-        parser = ExcelParser()
-        importer = ProgramImporter(parser)
+    def get(self, request, job_id, format=None):
+        job = get_object_or_404(ImportJob.objects.select_related("run").defer("content"), pk=job_id)
+        return Response(ImportJobSerializer(job).data)
+
+
+class UploadBatchView(views.APIView):
+    """
+    View for uploading a zip archive of program Excel files.
+    Every workbook in the archive is queued as a job of one batch; run_import_worker
+    processes them (several workers import concurrently).
+    """
+
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, format=None):
+        archive = request.FILES.get("file")
+        if not archive:
+            return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+        year = request.data.get("year") or None
+        sync = str(request.data.get("sync", "")).lower() in ("1", "true", "yes")
+        force = str(request.data.get("force", "")).lower() in ("1", "true", "yes")
 
         try:
-            program, created, error = importer.import_from_uploaded_file(file_obj, year=year)
-            if error:
-                return Response({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+            # Optional per-file years: {"Fit_2023/program.xlsx": 2023} or {"program.xlsx": 2023}
+            years = json.loads(request.data.get("years") or "{}")
+            if not isinstance(years, dict):
+                raise ValueError("years must be a JSON object")
 
-            serializer = EducationalProgramSerializer(program)
-            response_status = status.HTTP_201_CREATED if created else status.HTTP_200_OK
-            return Response(serializer.data, status=response_status)
+            batch = ImportQueue.enqueue_archive(archive, year=year, years=years, sync=sync, force=force)
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        status_url = reverse("program-upload-batch-status", kwargs={"batch_id": batch.pk})
+        data = ImportBatchSerializer(batch).data
+        data["status_url"] = request.build_absolute_uri(status_url)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={"Location": status_url})
+
+
+class ImportBatchStatusView(views.APIView):
+    """
+    Per-file results, total and per-file durations of an uploaded archive.
+    """
+
+    def get(self, request, batch_id, format=None):
+        batch = get_object_or_404(ImportBatch.objects.prefetch_related(
+                Prefetch("jobs", queryset=ImportJob.objects.select_related("run").defer("content"))
+            ), pk=batch_id)
+        return Response(ImportBatchSerializer(batch).data)
@@ -0,0 +1,166 @@
+import json
+import os
+import pickle
+import tempfile
+import time
+from django.conf import settings
+
+try:
+    import pyarrow
+    from pyarrow import feather
+except ImportError:
+    pyarrow = None
+    feather = None
+
+
+class ParsedWorkbookCache:
+    """
+    On-disk cache of parsed workbooks keyed by content hash.
+
+    Each entry holds the program header dict and the discipline table. With pyarrow
+    installed entries are Feather files (header stored in the schema metadata),
+    otherwise a pickle of both. Reading an entry is far cheaper than decoding the
+    workbook again. When the total size exceeds max_bytes the least recently used
+    entries are removed.
+    """
+
+    # Bump when the cached table layout changes, old entries are then ignored
+    FORMAT_VERSION = 1
+    FEATHER_SUFFIX = f".v{FORMAT_VERSION}.feather"
+    PICKLE_SUFFIX = f".v{FORMAT_VERSION}.pkl"
+    METADATA_KEY = b"program_data"
+    # Files being written by put(); left behind only by a killed process
+    TMP_SUFFIX = ".tmp"
+    STALE_TMP_AGE = 60 * 60
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_settings(cls):
+        """Cache configured by PARSED_WORKBOOK_CACHE_DIR, or None when caching is disabled"""
+        directory = getattr(settings, "PARSED_WORKBOOK_CACHE_DIR", None)
+        if not directory:
+            return None
+        return cls(directory, max_bytes=getattr(settings, "PARSED_WORKBOOK_CACHE_MAX_BYTES", None))
+
+    @property
+    def suffix(self):
+        return self.FEATHER_SUFFIX if feather is not None else self.PICKLE_SUFFIX
+
+    def _path(self, content_hash, suffix):
+        return os.path.join(self.directory, f"{content_hash}{suffix}")
+
+    def get(self, content_hash):
+        """Return (program_data, disciplines DataFrame) or None on a miss"""
+        for suffix in (self.FEATHER_SUFFIX, self.PICKLE_SUFFIX):
+            path = self._path(content_hash, suffix)
+            if not os.path.exists(path):
+                continue
+            if suffix == self.FEATHER_SUFFIX and feather is None:
+                continue
+
+            try:
+                entry = self._read(path, suffix)
+            except Exception:
+                # Truncated or foreign file: treat as a miss, it will be rewritten
+                self._remove(path)
+                continue
+
+            # Touch the entry so eviction keeps recently used workbooks
+            os.utime(path)
+            return entry
+        return None
+
+    def put(self, content_hash, program_data, frame):
+        os.makedirs(self.directory, exist_ok=True)
+        suffix = self.suffix
+
+        # Write to a temporary file and rename, so concurrent readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=self.TMP_SUFFIX)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                self._write(f, suffix, program_data, frame)
+            os.replace(tmp_path, self._path(content_hash, suffix))
+        except Exception:
+            self._remove(tmp_path)
+            raise
+
+        if self.max_bytes is not None:
+            self.prune(self.max_bytes)
+
+    def _write(self, f, suffix, program_data, frame):
+        if suffix == self.FEATHER_SUFFIX:
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[self.METADATA_KEY] = json.dumps(program_data, default=str).encode()
+            feather.write_feather(table.replace_schema_metadata(metadata), f)
+        else:
+            pickle.dump(
+                {"program_data": program_data, "disciplines": frame}, f, protocol=pickle.HIGHEST_PROTOCOL
+            )
+
+    def _read(self, path, suffix):
+        if suffix == self.FEATHER_SUFFIX:
+            table = feather.read_table(path)
+            program_data = json.loads(table.schema.metadata[self.METADATA_KEY])
+            return program_data, table.to_pandas()
+
+        with open(path, "rb") as f:
+            entry = pickle.load(f)
+        return entry["program_data"], entry["disciplines"]
+
+    def entries(self, temporary=False):
+        """
+        [(path, size, last used)] of every cache file, oldest first.
+        Files still being written by put() are left out, or listed alone with temporary=True.
+        """
+        if not os.path.isdir(self.directory):
+            return []
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(self.TMP_SUFFIX) != temporary:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def total_size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def prune(self, max_bytes=0):
+        """Remove least recently used entries until the cache fits in max_bytes; returns (files, bytes) removed"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed_files = 0
+        removed_bytes = 0
+
+        # Another put() may be writing right now, only abandoned files are removed
+        stale = time.time() - self.STALE_TMP_AGE
+        for path, size, modified in self.entries(temporary=True):
+            if modified < stale:
+                self._remove(path)
+                removed_files += 1
+                removed_bytes += size
+
+        for path, size, _ in entries:
+            if total <= max_bytes:
+                break
+            self._remove(path)
+            total -= size
+            removed_files += 1
+            removed_bytes += size
+
+        return removed_files, removed_bytes
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,121 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+REPLICA_ALIAS = "replica"
+# Cookie holding the time until which the client's reads stay on the primary
+STICKY_COOKIE = "primary_until"
+
+# Set while a view that may read from the replica is running
+_replica_reads = ContextVar("replica_reads", default=False)
+# Set once something was written during the current request
+_wrote_primary = ContextVar("wrote_primary", default=False)
+# Set inside use_primary(), wins over use_replica()
+_primary_reads = ContextVar("primary_reads", default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def use_replica():
+    """Let reads inside the block go to the replica (until something is written)"""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """
+    Keep reads inside the block on the primary, in read-only views too: for results that
+    outlive the request, such as shared cache entries stored under the current data
+    version, which a lagging replica could fill with the previous data.
+    """
+    token = _primary_reads.set(True)
+    try:
+        yield
+    finally:
+        _primary_reads.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads to the "replica" alias only inside use_replica() (see ReplicaReadMixin)
+    and outside use_primary(), everything else - writes, imports, auth, admin,
+    management commands - to "default".
+    After a write in the same request all reads go to the primary as well.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and not _primary_reads.get() and not _wrote_primary.get() and replica_configured():
+            return REPLICA_ALIAS
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        _wrote_primary.set(True)
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives the schema through replication
+        return db != REPLICA_ALIAS
+
+
+class ReplicaStickinessMiddleware:
+    """
+    Read-your-writes: after a request that wrote (or any unsafe method) the client gets a
+    cookie that keeps its reads on the primary for REPLICA_STICKY_SECONDS, covering the
+    replication lag. Also scopes the "wrote" flag of PrimaryReplicaRouter to one request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _wrote_primary.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = _wrote_primary.get()
+        finally:
+            _wrote_primary.reset(token)
+
+        if replica_configured() and (wrote or request.method not in SAFE_METHODS):
+            window = settings.REPLICA_STICKY_SECONDS
+            response.set_cookie(
+                STICKY_COOKIE,
+                str(int(time.time()) + window),
+                max_age=window,
+                httponly=True,
+                secure=settings.SESSION_COOKIE_SECURE,
+                samesite=settings.SESSION_COOKIE_SAMESITE,
+            )
+        return response
+
+
+def is_sticky(request):
+    """True while the client's recent write may not have reached the replica yet"""
+    try:
+        return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReplicaReadMixin:
+    """
+    For read-only views: safe requests read from the replica unless the client wrote recently.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in SAFE_METHODS and replica_configured() and not is_sticky(request):
+            with use_replica():
+                return super().dispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
@@ -86,6 +86,8 @@ REST_FRAMEWORK = {
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    # Outside SessionMiddleware so session writes also count as writes
+    "visualizer.routers.ReplicaStickinessMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -122,6 +124,17 @@ DATABASES = {
     "default": dj_database_url.config(default=os.environ.get("DATABASE_URL"), conn_max_age=600)
 }
 
+# Optional read replica: read-only API views read from it, everything else uses "default"
+if os.environ.get("DATABASE_REPLICA_URL"):
+    DATABASES["replica"] = dj_database_url.parse(os.environ["DATABASE_REPLICA_URL"], conn_max_age=600)
+    # Tests run against the test copy of "default"
+    DATABASES["replica"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_ROUTERS = ["visualizer.routers.PrimaryReplicaRouter"]
+
+# How long a client's reads stay on the primary after it wrote (replication lag allowance)
+REPLICA_STICKY_SECONDS = int(os.environ.get("REPLICA_STICKY_SECONDS", 10))
+
 # Caching
 CACHES = {
     "default": {
@@ -130,7 +143,18 @@ CACHES = {
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         },
-    }
+    },
+    # Per-process LRU in front of "default" for hot, versioned keys (see common/cache.py)
+    "tiered": {
+        "BACKEND": "common.cache.TwoTierCache",
+        "LOCATION": "default",
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.environ.get("TIERED_CACHE_MAX_ENTRIES", 500)),
+            "MAX_BYTES": int(os.environ.get("TIERED_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+            "LOCAL_TIMEOUT": 30,
+            "CHECK_INTERVAL": 1.0,
+        },
+    },
 }
 
 
@@ -171,3 +195,14 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
+
+# Seconds after which a job still marked running is failed (its worker crashed or restarted)
+IMPORT_JOB_TIMEOUT = int(os.environ.get("IMPORT_JOB_TIMEOUT", 60 * 60))
+
+# Cache of parsed workbooks keyed by content hash (Feather with pyarrow, pickle otherwise).
+# Disabled unless a directory is configured; prune with `manage.py prune_workbook_cache`.
+PARSED_WORKBOOK_CACHE_DIR = os.environ.get("PARSED_WORKBOOK_CACHE_DIR")
+PARSED_WORKBOOK_CACHE_MAX_BYTES = int(os.environ.get("PARSED_WORKBOOK_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+# Trace peak memory of every import with tracemalloc (slows imports down, off by default)
+IMPORT_TRACE_MEMORY = os.environ.get("IMPORT_TRACE_MEMORY", "").lower() in ("1", "true", "yes")
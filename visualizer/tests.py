@@ -0,0 +1,65 @@
+from unittest import mock
+from django.db import router
+from django.test import RequestFactory, TestCase
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from programs.models import Faculty
+from .routers import REPLICA_ALIAS, STICKY_COOKIE, ReplicaReadMixin, ReplicaStickinessMiddleware, use_primary
+
+
+class RoutedView(ReplicaReadMixin, APIView):
+    """Reports where reads go; ?write=1 saves a row first"""
+
+    def get(self, request):
+        if request.query_params.get("write"):
+            Faculty.objects.create(name="Записано из GET")
+        return Response({"read": Faculty.objects.all().db})
+
+    def post(self, request):
+        faculty = Faculty.objects.create(name="Записано из POST")
+        return Response({"read": Faculty.objects.all().db, "written": faculty._state.db})
+
+
+# "replica" is only configured with DATABASE_REPLICA_URL; routing decisions need no connection to it
+@mock.patch("visualizer.routers.replica_configured", return_value=True)
+class PrimaryReplicaRouterTests(TestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.view = ReplicaStickinessMiddleware(RoutedView.as_view())
+
+    def test_reads_of_read_only_views_go_to_the_replica(self, _):
+        response = self.view(self.factory.get("/"))
+        self.assertEqual(response.data["read"], REPLICA_ALIAS)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_reads_outside_read_only_views_stay_on_the_primary(self, _):
+        self.assertEqual(router.db_for_read(Faculty), "default")
+
+    def test_writes_go_to_the_primary(self, _):
+        response = self.view(self.factory.post("/"))
+        self.assertEqual(response.data["written"], "default")
+        self.assertEqual(response.data["read"], "default")
+        self.assertTrue(Faculty.objects.using("default").filter(name="Записано из POST").exists())
+
+    def test_reads_after_a_write_in_the_same_request_go_to_the_primary(self, _):
+        response = self.view(self.factory.get("/", {"write": 1}))
+        self.assertEqual(response.data["read"], "default")
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+    def test_sticky_cookie_pins_reads_to_the_primary(self, _):
+        cookie = self.view(self.factory.post("/")).cookies[STICKY_COOKIE]
+
+        request = self.factory.get("/")
+        request.COOKIES[STICKY_COOKIE] = cookie.value
+        self.assertEqual(self.view(request).data["read"], "default")
+
+        # Once the window is over the replica is used again
+        request = self.factory.get("/")
+        request.COOKIES[STICKY_COOKIE] = "0"
+        self.assertEqual(self.view(request).data["read"], REPLICA_ALIAS)
+
+    def test_use_primary_wins_over_read_only_views(self, _):
+        view = ReplicaStickinessMiddleware(RoutedView.as_view())
+        with use_primary():
+            response = view(self.factory.get("/"))
+        self.assertEqual(response.data["read"], "default")